@@ -0,0 +1,81 @@
+"""Benchmark the conversion of hourly wind speeds to power for many wind farms.
+
+Times the former per-cell loop of
+:func:`prereise.gather.winddata.hrrr.calculations.calculate_pout_blended`, which
+calls :func:`prereise.gather.winddata.power_curves.get_power` once per (hour, farm),
+against :func:`prereise.gather.winddata.power_curves.get_power_by_curve_group`. The
+per-cell loop is timed on a sample of hours and extrapolated to the full range.
+
+Usage::
+
+    python -m benchmarks.power_curves --hours 8784 --farms 1000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from prereise.gather.winddata.power_curves import (
+    get_power,
+    get_power_by_curve_group,
+    get_turbine_power_curves,
+)
+
+
+def per_cell(turbine_power_curves, state_power_curves, wind_speed_data, curve_keys):
+    return [
+        [
+            get_power(
+                turbine_power_curves,
+                state_power_curves,
+                wind_speed_data.loc[dt, w],
+                curve_keys.loc[w],
+            )
+            for w in wind_speed_data.columns
+        ]
+        for dt in wind_speed_data.index
+    ]
+
+
+def main(n_hours, n_farms, sample_hours, seed=0):
+    rng = np.random.default_rng(seed)
+    turbine_power_curves = get_turbine_power_curves()
+    state_power_curves = pd.DataFrame()
+    curve_keys = pd.Series(
+        rng.choice(turbine_power_curves.columns, size=n_farms), index=range(n_farms)
+    )
+    dts = pd.date_range("2016-01-01", periods=n_hours, freq="H")
+    wind_speed_data = pd.DataFrame(
+        rng.uniform(0, 30, size=(n_hours, n_farms)), index=dts, columns=range(n_farms)
+    )
+
+    start = time.perf_counter()
+    grouped = get_power_by_curve_group(
+        wind_speed_data.to_numpy(),
+        curve_keys.tolist(),
+        lambda wspd, key: get_power(
+            turbine_power_curves, state_power_curves, wspd, key
+        ),
+    )
+    grouped_seconds = time.perf_counter() - start
+
+    sample = wind_speed_data.iloc[:sample_hours]
+    start = time.perf_counter()
+    expected = per_cell(turbine_power_curves, state_power_curves, sample, curve_keys)
+    per_cell_seconds = (time.perf_counter() - start) * n_hours / len(sample)
+
+    assert np.array_equal(grouped[: len(sample)], np.array(expected))
+    print(f"{n_hours} hours x {n_farms} farms, {curve_keys.nunique()} power curves")
+    print(f"per-cell loop: {per_cell_seconds:.1f} s (from {len(sample)} hours)")
+    print(f"grouped: {grouped_seconds:.2f} s")
+    print(f"speedup: {per_cell_seconds / grouped_seconds:.0f}x, identical results")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--hours", type=int, default=8784)
+    parser.add_argument("--farms", type=int, default=1000)
+    parser.add_argument("--sample-hours", type=int, default=100)
+    args = parser.parse_args()
+    main(args.hours, args.farms, args.sample_hours)
@@ -0,0 +1,84 @@
+"""Benchmark the reshaping of long format profiles into REISE wide data frames.
+
+Times :func:`prereise.gather.solardata.helpers.to_reise`, built on
+:func:`prereise.gather.helpers.long_to_wide`, on a full year of hourly profiles for
+thousands of plants, against the former loop which filtered the long data frame and
+concatenated one row per timestamp. The former loop grows quadratically with the
+number of hours, so it is timed on a sample of hours and extrapolated.
+
+Usage::
+
+    python -m benchmarks.to_reise --hours 8784 --plants 5000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from prereise.gather.solardata.helpers import to_reise
+
+
+def loop_to_reise(data):
+    ts = data["ts"].unique()
+    plant_id = data[data.ts_id == 1].plant_id.values
+
+    profile = None
+    for i in range(1, max(data.ts_id) + 1):
+        data_tmp = pd.DataFrame(
+            {"Pout": data[data.ts_id == i].Pout.values}, index=plant_id
+        )
+        if i == 1:
+            profile = data_tmp.T
+        else:
+            profile = pd.concat([profile, data_tmp.T], sort=False, ignore_index=True)
+
+    profile.set_index(ts, inplace=True)
+    profile.index.name = "UTC"
+
+    return profile
+
+
+def long_profile(n_hours, n_plants, rng):
+    ts = pd.date_range("2016-01-01", periods=n_hours, freq="H")
+    return pd.DataFrame(
+        {
+            "Pout": rng.uniform(0, 1, n_hours * n_plants).astype(np.float32),
+            "plant_id": np.tile(np.arange(n_plants, dtype=np.int32), n_hours),
+            "ts": np.repeat(ts.to_numpy(), n_plants),
+            "ts_id": np.repeat(np.arange(1, n_hours + 1, dtype=np.int32), n_plants),
+        }
+    )
+
+
+def main(n_hours, n_plants, sample_hours, seed=0):
+    rng = np.random.default_rng(seed)
+    data = long_profile(n_hours, n_plants, rng)
+
+    start = time.perf_counter()
+    profile = to_reise(data)
+    seconds = time.perf_counter() - start
+
+    sample = data[data.ts_id <= sample_hours]
+    start = time.perf_counter()
+    expected = loop_to_reise(sample)
+    sample_seconds = time.perf_counter() - start
+    loop_seconds = sample_seconds * (n_hours / sample_hours) ** 2
+
+    assert np.array_equal(profile.iloc[:sample_hours].to_numpy(), expected.to_numpy())
+    print(f"{n_hours} hours x {n_plants} plants, {profile.dtypes.iloc[0]} values")
+    print(
+        f"former loop: {sample_seconds:.1f} s for {sample_hours} hours, "
+        f"~{loop_seconds:.0f} s extrapolated (quadratic)"
+    )
+    print(f"to_reise: {seconds:.2f} s")
+    print(f"speedup: ~{loop_seconds / seconds:.0f}x, identical values")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--hours", type=int, default=8784)
+    parser.add_argument("--plants", type=int, default=5000)
+    parser.add_argument("--sample-hours", type=int, default=500)
+    args = parser.parse_args()
+    main(args.hours, args.plants, args.sample_hours)
@@ -0,0 +1,71 @@
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+# Census cartographic boundary file, also used to compose the BA map. Available at
+# https://www2.census.gov/geo/tiger/GENZ2020/shp/cb_2020_us_county_500k.zip
+default_county_shapefile = os.path.join(
+    os.path.dirname(__file__),
+    "data",
+    "remap_ba_area",
+    "cb_2020_us_county_500k.zip",
+)
+
+
+def read_counties(county_shapefile=None):
+    """Read county boundaries.
+
+    :param str county_shapefile: path to a county shapefile (or zipped shapefile)
+        with the *'NAME'*, *'STUSPS'* and *'GEOID'* attributes of the Census
+        cartographic boundary files. Defaults to :data:`default_county_shapefile`.
+    :return: (*geopandas.GeoDataFrame*) -- data frame with *'county'*, *'state'*,
+        *'fips'* and *'geometry'* as columns, in the EPSG:4326 coordinate system.
+    :raises FileNotFoundError: if the shapefile doesn't exist.
+    """
+    if county_shapefile is None:
+        county_shapefile = default_county_shapefile
+    if not os.path.isfile(county_shapefile):
+        raise FileNotFoundError(f"county shapefile not found: {county_shapefile}")
+    counties = gpd.read_file(county_shapefile)[["NAME", "STUSPS", "GEOID", "geometry"]]
+    counties = counties.rename(
+        columns={"NAME": "county", "STUSPS": "state", "GEOID": "fips"}
+    )
+    counties["fips"] = counties["fips"].astype(int)
+    return counties.to_crs("EPSG:4326")
+
+
+def find_counties(lat, lon, counties):
+    """Find the county each point belongs to, in a single spatial join.
+
+    :param iterable lat: latitudes of the points.
+    :param iterable lon: longitudes of the points.
+    :param geopandas.GeoDataFrame counties: county boundaries as returned by
+        :func:`read_counties`.
+    :return: (*pandas.DataFrame*) -- data frame with *'county'*, *'state'* and
+        *'fips'* as columns and one row per point, in the order of the points.
+        Values are missing for points outside of all counties. Points on the
+        border of several counties are assigned to one of them.
+    :raises ValueError: if ``lat`` and ``lon`` have different lengths.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if lat.shape != lon.shape:
+        raise ValueError("lat and lon must have the same length")
+    points = gpd.GeoDataFrame(
+        geometry=gpd.points_from_xy(lon, lat), crs="EPSG:4326"
+    ).to_crs(counties.crs)
+    joined = gpd.sjoin(
+        points, counties[["county", "state", "fips", "geometry"]], how="left"
+    )
+    joined = joined[~joined.index.duplicated(keep="first")].sort_index()
+    found = pd.DataFrame(
+        {
+            "county": joined["county"].to_numpy(dtype=object),
+            "state": joined["state"].to_numpy(dtype=object),
+            "fips": joined["fips"].to_numpy(dtype=float),
+        }
+    )
+    found["fips"] = found["fips"].astype("Int64")
+    return found
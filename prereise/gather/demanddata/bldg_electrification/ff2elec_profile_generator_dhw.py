@@ -4,6 +4,7 @@ import numpy as np
 import pandas as pd
 
 from prereise.gather.demanddata.bldg_electrification import const
+from prereise.gather.demanddata.bldg_electrification.helper import read_puma_weather
 
 
 def func_dhw_cop(temp_c, model):
@@ -106,9 +107,7 @@ def generate_dhw_profiles(
         # Load and subset relevant data for the state
         puma_data_it = const.puma_data.query("state == @state")
 
-        temps_pumas_it = pd.read_csv(
-            f"https://besciences.blob.core.windows.net/datasets/bldg_el/pumas/{yr_temps}/temps/temps_pumas_{state}_{yr_temps}.csv"
-        )
+        temps_pumas_it = read_puma_weather("temps", state, yr_temps)
 
         hours = pd.date_range(
             f"{yr_temps}-01-01", periods=len(temps_pumas_it), freq="H", tz="UTC"
@@ -4,6 +4,7 @@ import numpy as np
 import pandas as pd
 
 from prereise.gather.demanddata.bldg_electrification import const
+from prereise.gather.demanddata.bldg_electrification.helper import read_puma_weather
 
 
 def calculate_cop(temp_c, model):
@@ -131,9 +132,7 @@ def generate_htg_profiles(
         # Load and subset relevant data for the state
         puma_data_it = const.puma_data.query("state == @state")
         puma_slopes_it = puma_slopes.query("state == @state")
-        temps_pumas_it = pd.read_csv(
-            f"https://besciences.blob.core.windows.net/datasets/bldg_el/pumas/{yr_temps}/temps/temps_pumas_{state}_{yr_temps}.csv"
-        )
+        temps_pumas_it = read_puma_weather("temps", state, yr_temps)
 
         # Compute electric HP loads from fossil fuel conversion
         elec_htg_ff2hp_puma_mw_it_ref_temp = temps_pumas_it.applymap(
@@ -5,6 +5,7 @@ import pandas as pd
 from scipy.optimize import least_squares
 
 from prereise.gather.demanddata.bldg_electrification import const
+from prereise.gather.demanddata.bldg_electrification.helper import read_puma_weather
 
 
 def calculate_r2(endogenous, residuals):
@@ -69,9 +70,7 @@ def calculate_state_slopes(puma_data, year=const.base_year):
         puma_data_it = puma_data.query("state == @state")
 
         # Load puma temperatures
-        temps_pumas = temps_pumas = pd.read_csv(
-            f"https://besciences.blob.core.windows.net/datasets/bldg_el/pumas/{year}/temps/temps_pumas_{state}_{year}.csv"
-        )
+        temps_pumas = read_puma_weather("temps", state, year)
         temps_pumas_transpose = temps_pumas.T
 
         for clas in const.classes:
@@ -303,9 +302,7 @@ def adjust_puma_slopes(
 
     for state in const.state_list:
         # Load puma temperatures
-        temps_pumas = pd.read_csv(
-            f"https://besciences.blob.core.windows.net/datasets/bldg_el/pumas/{year}/temps/temps_pumas_{state}_{year}.csv"
-        )
+        temps_pumas = read_puma_weather("temps", state, year)
         # Hourly temperature difference below const.temp_ref_res/com for each puma
         for clas in classes:
             temp_diff = temps_pumas.applymap(lambda x: max(const.temp_ref[clas] - x, 0))
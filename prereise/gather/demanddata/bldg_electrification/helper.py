@@ -1,11 +1,16 @@
 import io
 import os
+import tempfile
 import zipfile
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 import requests
 
+puma_weather_url = "https://besciences.blob.core.windows.net/datasets/bldg_el/pumas"
+weather_cache_dir = os.path.join(os.path.dirname(__file__), "weather_cache")
+
 
 def read_shapefile(url):
     """Read shape files for overlay
@@ -29,6 +34,44 @@ def read_shapefile(url):
     return shapefile_df
 
 
+def read_puma_weather(variable, state, year, pumas=None, cache_dir=None):
+    """Read hourly weather data of the pumas of a state. The csv file is downloaded
+    once and cached locally with one array per puma, so that later reads only load
+    the requested pumas.
+
+    :param str variable: weather variable, e.g. *'temps'*, *'temps_wetbulb'* or
+        *'dark_frac'*.
+    :param str state: abbrev. of state.
+    :param int year: year of weather data.
+    :param iterable pumas: pumas to load. Pumas that are not in the state are
+        ignored. Default to all the pumas of the state.
+    :param str cache_dir: directory of the cache. Default to ``weather_cache_dir``.
+    :return: (*pandas.DataFrame*) -- hourly values with pumas as columns, in the
+        order of the csv file.
+    """
+    cache_dir = weather_cache_dir if cache_dir is None else cache_dir
+    path = os.path.join(cache_dir, variable, str(year), f"{state}.npz")
+    if not os.path.isfile(path):
+        data = pd.read_csv(
+            f"{puma_weather_url}/{year}/{variable}/{variable}_pumas_{state}_{year}.csv"
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".npz")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **{puma: data[puma].to_numpy() for puma in data.columns})
+        os.replace(tmp_path, path)
+
+    with np.load(path) as columns:
+        names = columns.files
+        if pumas is not None:
+            pumas = set(pumas)
+            names = [puma for puma in names if puma in pumas]
+        n_hours = len(columns[columns.files[0]]) if len(columns.files) > 0 else 0
+        return pd.DataFrame(
+            {puma: columns[puma] for puma in names}, index=pd.RangeIndex(n_hours)
+        )
+
+
 def zone_shp_overlay(zone_name_shp, zone_shp, pumas_shp):
     """Select pumas within a zonal load area
 
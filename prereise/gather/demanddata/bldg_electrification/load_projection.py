@@ -19,6 +19,7 @@ from prereise.gather.demanddata.bldg_electrification.helper import (
     zone_shp_overlay,
 )
 from prereise.gather.demanddata.bldg_electrification.zone_profile_generator import (
+    hourly_energy_terms,
     zonal_data,
 )
 
@@ -121,6 +122,49 @@ def temp_to_energy(temp_series, hourly_fits_df, db_wb_fit, base_scen, hp_heat_co
     return [base_eng, hp_eng, resist_eng, max(cool_eng, 0) + max(mid_cool_eng, 0)]
 
 
+def hourly_energy(temp_df, hourly_fits_df, db_wb_fit, base_scen, hp_heat_cop):
+    """Compute baseload, heating, and cooling electricity for all the hours at once
+    under model base year scenario, as :py:func:`temp_to_energy` does for a single
+    hour.
+
+    :param pandas.DataFrame temp_df: hourly data, one row per hour.
+    :param pandas.DataFrame hourly_fits_df: hourly and week/weekend breakpoints and
+        coefficients for electricity use equations.
+    :param numpy.array db_wb_fit: least-square estimators of the quadratic
+        relationship between WBT and DBT
+    :param load_projection_scenario.LoadProjectionScenario base_scen: reference
+        scenario instance
+    :param pandas.DataFrame hp_heat_cop: heat pump COP against DBT with
+        a 0.1 degree C interval
+    :return: (*pandas.DataFrame*) -- energy for baseload, heat pump heating,
+        resistance heating, and cooling, indexed like ``temp_df``.
+    """
+    base_eng, heat_eng, cool_eng, heating = hourly_energy_terms(
+        temp_df, hourly_fits_df, db_wb_fit
+    )
+
+    # Separate resistance heat and heat pump energy by COP
+    temp = temp_df["temp_c"].to_numpy(dtype=float)
+    cop_hp = np.ones(len(temp))
+    cop_hp[heating] = hp_heat_cop.loc[np.round(temp[heating], 1), "cop"].to_numpy()
+    hp_frac = base_scen.hp_heat_frac / cop_hp
+    denominator = base_scen.resist_heat_frac + hp_frac
+    hp_eng = np.where(heating, heat_eng * hp_frac / denominator, 0)
+    resist_eng = np.where(
+        heating, heat_eng * (base_scen.resist_heat_frac) / denominator, 0
+    )
+
+    return pd.DataFrame(
+        {
+            "base_load_mw": base_eng,
+            "heat_hp_load_mw": hp_eng,
+            "heat_resist_load_mw": resist_eng,
+            "cool_load_mw": cool_eng,
+        },
+        index=temp_df.index,
+    )
+
+
 def scale_energy(
     base_energy,
     temp_df,
@@ -464,22 +508,15 @@ def predict_scenario(
         {"hour_utc": hours_utc_weather_years}
     )
 
-    energy_list = zone_profile_refload_MWh.hour_utc.apply(
-        lambda x: temp_to_energy(
-            temp_df.loc[x], hourly_fits_df, db_wb_fit, base_scen, base_hp_heat_cop
-        )
+    energy = hourly_energy(
+        temp_df.loc[zone_profile_refload_MWh.hour_utc],
+        hourly_fits_df,
+        db_wb_fit,
+        base_scen,
+        base_hp_heat_cop,
     )
-
-    (
-        zone_profile_refload_MWh["base_load_mw"],
-        zone_profile_refload_MWh["heat_hp_load_mw"],
-        zone_profile_refload_MWh["heat_resist_load_mw"],
-        zone_profile_refload_MWh["cool_load_mw"],
-    ) = (
-        energy_list.apply(lambda x: x[0]),
-        energy_list.apply(lambda x: x[1]),
-        energy_list.apply(lambda x: x[2]),
-        energy_list.apply(lambda x: x[3]),
+    zone_profile_refload_MWh = pd.concat(  # noqa: N806
+        [zone_profile_refload_MWh, energy.reset_index(drop=True)], axis=1
     )
     zone_profile_refload_MWh.set_index("hour_utc", inplace=True)
 
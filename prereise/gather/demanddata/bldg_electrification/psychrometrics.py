@@ -0,0 +1,89 @@
+import numpy as np
+
+# Psychrometric equations of the ASHRAE Handbook - Fundamentals (2017) ch. 1, in SI
+# units, as implemented by psychrolib
+min_hum_ratio = 1e-7
+triple_point_water = 0.01
+freezing_point_water = 0.0
+zero_celsius_as_kelvin = 273.15
+
+
+def sat_vap_pres(t_drybulb):
+    """Compute saturation vapor pressure
+
+    :param numpy.ndarray t_drybulb: drybulb temperatures, C
+    :return: (*numpy.ndarray*) -- saturation vapor pressures, Pa
+    """
+    t = np.asarray(t_drybulb, dtype=float) + zero_celsius_as_kelvin
+    ln_pws = np.where(
+        t_drybulb <= triple_point_water,
+        -5.6745359e03 / t
+        + 6.3925247
+        - 9.677843e-03 * t
+        + 6.2215701e-07 * t**2
+        + 2.0747825e-09 * np.power(t, 3)
+        - 9.484024e-13 * np.power(t, 4)
+        + 4.1635019 * np.log(t),
+        -5.8002206e03 / t
+        + 1.3914993
+        - 4.8640239e-02 * t
+        + 4.1764768e-05 * t**2
+        - 1.4452093e-08 * np.power(t, 3)
+        + 6.5459673 * np.log(t),
+    )
+    return np.exp(ln_pws)
+
+
+def hum_ratio_from_vap_pres(vap_pres, pressure):
+    """Compute humidity ratio
+
+    :param numpy.ndarray vap_pres: partial pressures of water vapor, Pa
+    :param numpy.ndarray pressure: atmospheric pressures, Pa
+    :return: (*numpy.ndarray*) -- humidity ratios, kg_H2O/kg_air
+    """
+    return np.maximum(0.621945 * vap_pres / (pressure - vap_pres), min_hum_ratio)
+
+
+def hum_ratio_from_t_wetbulb(t_drybulb, t_wetbulb, pressure):
+    """Compute humidity ratio
+
+    :param numpy.ndarray t_drybulb: drybulb temperatures, C
+    :param numpy.ndarray t_wetbulb: wetbulb temperatures, C
+    :param numpy.ndarray pressure: atmospheric pressures, Pa
+    :return: (*numpy.ndarray*) -- humidity ratios, kg_H2O/kg_air
+    """
+    ws_star = hum_ratio_from_vap_pres(sat_vap_pres(t_wetbulb), pressure)
+    hum_ratio = np.where(
+        t_wetbulb >= freezing_point_water,
+        ((2501.0 - 2.326 * t_wetbulb) * ws_star - 1.006 * (t_drybulb - t_wetbulb))
+        / (2501.0 + 1.86 * t_drybulb - 4.186 * t_wetbulb),
+        ((2830.0 - 0.24 * t_wetbulb) * ws_star - 1.006 * (t_drybulb - t_wetbulb))
+        / (2830.0 + 1.86 * t_drybulb - 2.1 * t_wetbulb),
+    )
+    return np.maximum(hum_ratio, min_hum_ratio)
+
+
+def t_wetbulb_from_t_dewpoint(t_drybulb, t_dewpoint, pressure, n_iter=40):
+    """Compute wetbulb temperature by bisection between dewpoint and drybulb
+    temperatures. All values are updated together for a fixed number of iterations,
+    each one halving the bracket of the solution.
+
+    :param numpy.ndarray t_drybulb: drybulb temperatures, C
+    :param numpy.ndarray t_dewpoint: dewpoint temperatures, C. Values above drybulb
+        temperatures are capped to them.
+    :param numpy.ndarray pressure: atmospheric pressures, Pa
+    :param int n_iter: number of bisection iterations.
+    :return: (*numpy.ndarray*) -- wetbulb temperatures, C
+    """
+    t_drybulb = np.asarray(t_drybulb, dtype=float)
+    t_dewpoint = np.minimum(t_drybulb, t_dewpoint)
+    hum_ratio = hum_ratio_from_vap_pres(sat_vap_pres(t_dewpoint), pressure)
+
+    t_inf, t_sup = t_dewpoint, t_drybulb
+    t_wetbulb = (t_inf + t_sup) / 2
+    for _ in range(n_iter):
+        above = hum_ratio_from_t_wetbulb(t_drybulb, t_wetbulb, pressure) > hum_ratio
+        t_sup = np.where(above, t_wetbulb, t_sup)
+        t_inf = np.where(above, t_inf, t_wetbulb)
+        t_wetbulb = (t_inf + t_sup) / 2
+    return t_wetbulb
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+
+def lon_lat_to_cartesian(lon, lat):
+    """Convert longitudes and latitudes to cartesian coordinates
+
+    :param numpy.array lon: longitudes, in degrees.
+    :param numpy.array lat: latitudes, in degrees.
+    :return: (*tuple*) -- x, y and z coordinates, in km.
+    """
+    # WGS 84 reference coordinate system parameters
+    a = 6378.137  # major axis [km]
+    e2 = 6.69437999014e-3  # eccentricity squared
+
+    lon_rad = np.radians(lon)
+    lat_rad = np.radians(lat)
+    # convert to cartesian coordinates
+    r_n = a / (np.sqrt(1 - e2 * (np.sin(lat_rad) ** 2)))
+    x = r_n * np.cos(lat_rad) * np.cos(lon_rad)
+    y = r_n * np.cos(lat_rad) * np.sin(lon_rad)
+    z = r_n * (1 - e2) * np.sin(lat_rad)
+    return x, y, z
+
+
+def _tract_pumas(tract_data):
+    return tract_data.dropna(subset=["puma"])
+
+
+def puma_weights(lats, lons, tract_data, k=4):
+    """Build the matrix mapping gridded values to population weighted puma values.
+    Tract values are interpolated from the ``k`` nearest grid cells with inverse
+    distance-squared weighting, then averaged over the tracts of each puma with
+    population weighting.
+
+    :param numpy.array lats: latitudes of the grid.
+    :param numpy.array lons: longitudes of the grid.
+    :param pandas.DataFrame tract_data: data frame, indexed by tract, with columns
+        "lat", "lon", "pop_2010" and "puma". Tracts without puma are ignored.
+    :param int k: number of grid cells used to interpolate tract values.
+    :return: (*tuple*) -- sparse matrix (*scipy.sparse.csr_matrix*) of shape
+        (number of pumas, number of grid cells), grid cells being ordered as the
+        flattened (latitude, longitude) grid, and puma names (*pandas.Index*) of its
+        rows, sorted.
+    """
+    tract_data = _tract_pumas(tract_data)
+    lons_2d, lats_2d = np.meshgrid(lons, lats)
+    tree = cKDTree(
+        np.column_stack(lon_lat_to_cartesian(lons_2d.ravel(), lats_2d.ravel()))
+    )
+    d, inds = tree.query(
+        np.column_stack(
+            lon_lat_to_cartesian(
+                tract_data["lon"].to_numpy(dtype=float),
+                tract_data["lat"].to_numpy(dtype=float),
+            )
+        ),
+        k=k,
+    )
+    d, inds = d.reshape(len(tract_data), k), inds.reshape(len(tract_data), k)
+    # Tracts on a grid cell take its value
+    with np.errstate(divide="ignore"):
+        w = np.where(d[:, :1] == 0, (d == 0).astype(float), 1.0 / d**2)
+    w /= w.sum(axis=1, keepdims=True)
+
+    pumas, tract_puma = np.unique(tract_data["puma"].to_numpy(), return_inverse=True)
+    pop = tract_data["pop_2010"].to_numpy(dtype=float)
+    pop_frac = pop / np.bincount(tract_puma, weights=pop)[tract_puma]
+
+    # Tracts sharing a grid cell within a puma are summed by the conversion to csr
+    weights = sparse.coo_matrix(
+        ((w * pop_frac[:, None]).ravel(), (np.repeat(tract_puma, k), inds.ravel())),
+        shape=(len(pumas), lats_2d.size),
+    ).tocsr()
+    weights.eliminate_zeros()
+    return weights, pd.Index(pumas, name="puma")
+
+
+def cached_puma_weights(lats, lons, tract_data, cache_dir, k=4):
+    """Load the matrix built by :func:`puma_weights` from a cache directory, building
+    and saving it first if the grid or the tracts have not been seen before.
+
+    :param numpy.array lats: latitudes of the grid.
+    :param numpy.array lons: longitudes of the grid.
+    :param pandas.DataFrame tract_data: see :func:`puma_weights`.
+    :param str cache_dir: directory of the cache.
+    :param int k: see :func:`puma_weights`.
+    :return: (*tuple*) -- see :func:`puma_weights`.
+    """
+    tracts = _tract_pumas(tract_data)
+    key = hashlib.sha1(str(k).encode())
+    key.update(np.asarray(lats, dtype=float).tobytes())
+    key.update(np.asarray(lons, dtype=float).tobytes())
+    key.update(tracts[["lat", "lon", "pop_2010"]].to_numpy(dtype=float).tobytes())
+    key.update("\n".join(tracts["puma"].astype(str)).encode())
+    path = os.path.join(cache_dir, f"puma_weights_{key.hexdigest()}.npz")
+
+    if os.path.isfile(path):
+        pumas = np.unique(tracts["puma"].to_numpy())
+        return sparse.load_npz(path), pd.Index(pumas, name="puma")
+
+    weights, pumas = puma_weights(lats, lons, tracts, k=k)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".npz")
+    with os.fdopen(fd, "wb") as f:
+        sparse.save_npz(f, weights)
+    os.replace(tmp_path, path)
+    return weights, pumas
+
+
+def regrid(weights, values, chunk_size=744):
+    """Apply regridding weights to hourly gridded values, a chunk of hours at a time
+    so that only one chunk of gridded values is held in memory.
+
+    :param scipy.sparse.csr_matrix weights: matrix built by :func:`puma_weights`.
+    :param numpy.ndarray/xarray.DataArray values: values of shape (hours, latitudes,
+        longitudes). Lazily loaded data arrays are read one chunk at a time.
+    :param int chunk_size: number of hours per chunk.
+    :return: (*numpy.ndarray*) -- array of shape (hours, pumas).
+    """
+    n_hours = values.shape[0]
+    regridded = np.empty((n_hours, weights.shape[0]))
+    for start in range(0, n_hours, chunk_size):
+        block = np.asarray(values[start : start + chunk_size], dtype=float)
+        block = block.reshape(len(block), -1)
+        regridded[start : start + len(block)] = (weights @ block.T).T
+    return regridded
@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from prereise.gather.demanddata.bldg_electrification import helper
+from prereise.gather.demanddata.bldg_electrification.helper import read_puma_weather
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    temps = pd.DataFrame(
+        np.random.default_rng(0).normal(10, 5, size=(48, 3)),
+        columns=["puma_0100100", "puma_0100200", "puma_0100300"],
+    )
+    path = tmp_path / "source" / "2018" / "temps" / "temps_pumas_AL_2018.csv"
+    os.makedirs(path.parent)
+    temps.to_csv(path, index=False)
+    monkeypatch.setattr(helper, "puma_weather_url", str(tmp_path / "source"))
+    return path, pd.read_csv(path)
+
+
+def test_read_puma_weather(source, tmp_path):
+    _, expected = source
+    data = read_puma_weather("temps", "AL", 2018, cache_dir=tmp_path / "cache")
+    pd.testing.assert_frame_equal(data, expected)
+    assert (tmp_path / "cache" / "temps" / "2018" / "AL.npz").is_file()
+
+
+def test_read_puma_weather_pumas(source, tmp_path):
+    _, expected = source
+    pumas = ["puma_0100300", "puma_0100100", "puma_3600100"]
+    data = read_puma_weather("temps", "AL", 2018, pumas, cache_dir=tmp_path / "cache")
+    pd.testing.assert_frame_equal(data, expected[["puma_0100100", "puma_0100300"]])
+
+
+def test_read_puma_weather_uses_cache(source, tmp_path):
+    path, expected = source
+    read_puma_weather("temps", "AL", 2018, cache_dir=tmp_path / "cache")
+    os.remove(path)
+    data = read_puma_weather("temps", "AL", 2018, cache_dir=tmp_path / "cache")
+    pd.testing.assert_frame_equal(data, expected)
+
+
+def test_read_puma_weather_concurrent(source, tmp_path):
+    _, expected = source
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(
+                lambda _: read_puma_weather(
+                    "temps", "AL", 2018, cache_dir=tmp_path / "cache"
+                ),
+                range(16),
+            )
+        )
+    for data in results:
+        pd.testing.assert_frame_equal(data, expected)
+    assert os.listdir(tmp_path / "cache" / "temps" / "2018") == ["AL.npz"]
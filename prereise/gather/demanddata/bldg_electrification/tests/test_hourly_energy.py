@@ -0,0 +1,100 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from prereise.gather.demanddata.bldg_electrification import (
+    load_projection,
+    zone_profile_generator,
+)
+
+
+def _temp_df(n=24 * 60, seed=0):
+    rng = np.random.default_rng(seed)
+    hours_local = pd.date_range("2019-01-01", periods=n, freq="H", tz="UTC").tz_convert(
+        "US/Central"
+    )
+    temp = rng.uniform(-30, 40, n)
+    temp[5] = np.nan
+    return pd.DataFrame(
+        {
+            "temp_c": temp,
+            "temp_c_wb": temp - rng.uniform(0, 8, n),
+            "date_local": hours_local,
+            "hour_local": hours_local.hour,
+            "weekday": hours_local.weekday,
+            "holiday": rng.random(n) < 0.05,
+            "hourly_dark_frac": rng.random(n),
+        }
+    )
+
+
+def _hourly_fits_df(seed=1):
+    rng = np.random.default_rng(seed)
+    fits = {}
+    for wk_wknd in ["wk", "wknd"]:
+        fits[f"t.bpc.{wk_wknd}.c"] = rng.uniform(5, 15, 24)
+        fits[f"t.bph.{wk_wknd}.c"] = fits[f"t.bpc.{wk_wknd}.c"] + rng.uniform(2, 8, 24)
+        fits[f"i.heat.{wk_wknd}"] = rng.uniform(100, 200, 24)
+        fits[f"s.heat.{wk_wknd}"] = rng.uniform(-5, -1, 24)
+        fits[f"s.dark.{wk_wknd}"] = rng.uniform(0, 20, 24)
+        fits[f"i.cool.{wk_wknd}"] = rng.uniform(-100, 0, 24)
+        fits[f"s.cool.{wk_wknd}.db"] = rng.uniform(1, 10, 24)
+        fits[f"s.cool.{wk_wknd}.wb"] = rng.uniform(0, 5, 24)
+    return pd.DataFrame(fits)
+
+
+def test_hourly_energy_terms_matches_temp_to_energy():
+    temp_df = _temp_df()
+    hourly_fits_df = _hourly_fits_df()
+    db_wb_fit = np.array([0.01, 0.8, -2.0])
+
+    expected = temp_df.index.to_series().apply(
+        lambda x: zone_profile_generator.temp_to_energy(
+            temp_df.loc[x], hourly_fits_df, db_wb_fit
+        )
+    )
+    base_eng, heat_eng, cool_eng, heating = zone_profile_generator.hourly_energy_terms(
+        temp_df, hourly_fits_df, db_wb_fit
+    )
+    for i, values in enumerate([base_eng, heat_eng, cool_eng]):
+        assert np.array_equal(values, expected.apply(lambda x: x[i]))
+    assert np.array_equal(
+        base_eng + heat_eng + cool_eng, expected.apply(lambda x: sum(x))
+    )
+    assert heating.sum() == (heat_eng > 0).sum()
+
+
+def test_hourly_energy_matches_temp_to_energy():
+    temp_df = _temp_df(seed=2)
+    temp_df.index = pd.date_range("2019-01-01", periods=len(temp_df), freq="H")
+    hourly_fits_df = _hourly_fits_df(seed=3)
+    db_wb_fit = np.array([0.01, 0.8, -2.0])
+    base_scen = SimpleNamespace(hp_heat_frac=0.3, resist_heat_frac=0.5)
+    hp_heat_cop = pd.read_csv(
+        os.path.join(
+            os.path.dirname(load_projection.__file__),
+            "data",
+            "cop_temp_htg_midperfhp.csv",
+        )
+    )
+    hp_heat_cop.index = hp_heat_cop["temp"]
+
+    expected = temp_df.index.to_series().apply(
+        lambda x: load_projection.temp_to_energy(
+            temp_df.loc[x], hourly_fits_df, db_wb_fit, base_scen, hp_heat_cop
+        )
+    )
+    energy = load_projection.hourly_energy(
+        temp_df, hourly_fits_df, db_wb_fit, base_scen, hp_heat_cop
+    )
+    assert energy.index.equals(temp_df.index)
+    assert energy.columns.tolist() == [
+        "base_load_mw",
+        "heat_hp_load_mw",
+        "heat_resist_load_mw",
+        "cool_load_mw",
+    ]
+    for i, column in enumerate(energy.columns):
+        assert np.array_equal(energy[column], expected.apply(lambda x: x[i]))
@@ -0,0 +1,67 @@
+import numpy as np
+import psychrolib
+import pytest
+
+from prereise.gather.demanddata.bldg_electrification.psychrometrics import (
+    hum_ratio_from_t_wetbulb,
+    sat_vap_pres,
+    t_wetbulb_from_t_dewpoint,
+)
+
+
+@pytest.fixture
+def si_psychrolib(monkeypatch):
+    psychrolib.SetUnitSystem(psychrolib.SI)
+    monkeypatch.setattr(psychrolib, "PSYCHROLIB_TOLERANCE", 1e-9)
+    return psychrolib
+
+
+@pytest.fixture
+def weather():
+    rng = np.random.default_rng(0)
+    t_drybulb = rng.uniform(-40, 45, 500)
+    t_dewpoint = t_drybulb - rng.uniform(0, 40, 500)
+    pressure = rng.uniform(60000, 104000, 500)
+    return t_drybulb, t_dewpoint, pressure
+
+
+def test_sat_vap_pres(si_psychrolib):
+    t = np.linspace(-60, 60, 241)
+    expected = [si_psychrolib.GetSatVapPres(x) for x in t]
+    assert np.allclose(sat_vap_pres(t), expected, rtol=1e-12)
+
+
+def test_hum_ratio_from_t_wetbulb(si_psychrolib, weather):
+    t_drybulb, t_dewpoint, pressure = weather
+    t_wetbulb = (t_drybulb + t_dewpoint) / 2
+    expected = [
+        si_psychrolib.GetHumRatioFromTWetBulb(*args)
+        for args in zip(t_drybulb, t_wetbulb, pressure)
+    ]
+    assert np.allclose(
+        hum_ratio_from_t_wetbulb(t_drybulb, t_wetbulb, pressure), expected, rtol=1e-12
+    )
+
+
+def test_t_wetbulb_from_t_dewpoint(si_psychrolib, weather):
+    t_drybulb, t_dewpoint, pressure = weather
+    expected = [
+        si_psychrolib.GetTWetBulbFromTDewPoint(*args)
+        for args in zip(t_drybulb, t_dewpoint, pressure)
+    ]
+    result = t_wetbulb_from_t_dewpoint(t_drybulb, t_dewpoint, pressure)
+    assert np.allclose(result, expected, rtol=0, atol=1e-6)
+
+
+def test_t_wetbulb_from_t_dewpoint_shape():
+    t_drybulb = np.array([[20.0, 30.0], [-5.0, 10.0]])
+    result = t_wetbulb_from_t_dewpoint(t_drybulb, t_drybulb - 5, 101325)
+    assert result.shape == (2, 2)
+    assert (result <= t_drybulb).all()
+    assert (result >= t_drybulb - 5).all()
+
+
+def test_t_wetbulb_from_t_dewpoint_saturated():
+    t_drybulb = np.array([-10.0, 0.0, 25.0])
+    result = t_wetbulb_from_t_dewpoint(t_drybulb, t_drybulb + 3, 101325)
+    assert np.allclose(result, t_drybulb)
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from prereise.gather.demanddata.bldg_electrification.regrid import (
+    cached_puma_weights,
+    puma_weights,
+    regrid,
+)
+
+lats = np.arange(40, 35, -0.5)
+lons = np.arange(-100, -94, 0.5)
+
+
+@pytest.fixture
+def tract_data():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "lat": rng.uniform(36, 39, 30),
+            "lon": rng.uniform(-99, -95, 30),
+            "pop_2010": rng.integers(100, 5000, 30),
+            "puma": [f"puma_{i}" for i in rng.integers(0, 5, 29)] + [np.nan],
+        }
+    )
+
+
+def test_puma_weights(tract_data):
+    weights, pumas = puma_weights(lats, lons, tract_data)
+    assert weights.shape == (5, len(lats) * len(lons))
+    assert pumas.tolist() == [f"puma_{i}" for i in range(5)]
+    assert np.allclose(weights.sum(axis=1), 1)
+    assert (weights.getnnz(axis=1) >= 4).all()
+
+
+def test_puma_weights_constant_field(tract_data):
+    weights, _ = puma_weights(lats, lons, tract_data)
+    values = np.full((3, len(lats), len(lons)), 7.5)
+    assert np.allclose(regrid(weights, values), 7.5)
+
+
+def test_puma_weights_single_tract():
+    tract_data = pd.DataFrame(
+        {"lat": [38.0], "lon": [-97.0], "pop_2010": [10], "puma": ["puma_0"]}
+    )
+    weights, _ = puma_weights(lats, lons, tract_data, k=1)
+    assert np.isfinite(weights.data).all()
+    cell = np.flatnonzero(weights.toarray()[0])
+    assert cell.tolist() == [4 * len(lons) + 6]
+    assert weights[0, 4 * len(lons) + 6] == 1.0
+
+
+def test_puma_weights_tract_on_grid_cell():
+    tract_data = pd.DataFrame(
+        {
+            "lat": [38.0, 37.3],
+            "lon": [-97.0, -96.2],
+            "pop_2010": [10, 30],
+            "puma": ["puma_0", "puma_1"],
+        }
+    )
+    weights, _ = puma_weights(lats, lons, tract_data)
+    assert np.isfinite(weights.data).all()
+    assert weights[0, 4 * len(lons) + 6] == 1.0
+    assert weights[0].nnz == 1
+    assert np.allclose(weights.sum(axis=1), 1)
+
+
+def test_regrid(tract_data):
+    weights, pumas = puma_weights(lats, lons, tract_data)
+    values = np.random.default_rng(1).normal(280, 10, (50, len(lats), len(lons)))
+    expected = np.stack([weights @ v.ravel() for v in values])
+    assert np.allclose(regrid(weights, values, chunk_size=7), expected)
+
+
+def test_cached_puma_weights(tract_data, tmp_path):
+    weights, pumas = cached_puma_weights(lats, lons, tract_data, tmp_path)
+    assert len(os.listdir(tmp_path)) == 1
+    cached, cached_pumas = cached_puma_weights(lats, lons, tract_data, tmp_path)
+    assert (cached != weights).nnz == 0
+    assert cached_pumas.equals(pumas)
+
+    cached_puma_weights(lats[1:], lons, tract_data, tmp_path)
+    assert len(os.listdir(tmp_path)) == 2
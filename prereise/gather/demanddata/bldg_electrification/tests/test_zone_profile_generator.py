@@ -0,0 +1,248 @@
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+
+from prereise.gather.demanddata.bldg_electrification import zone_profile_generator
+from prereise.gather.demanddata.bldg_electrification.zone_profile_generator import (
+    bkpt_scale,
+    hourly_load_fit,
+    stacked_ols,
+)
+
+
+def _load_temp_df(n=24 * 120, seed=0):
+    rng = np.random.default_rng(seed)
+    hours_local = pd.date_range("2019-01-01", periods=n, freq="H", tz="UTC").tz_convert(
+        "US/Central"
+    )
+    day = np.arange(n) / 24
+    temp = (
+        12
+        - 15 * np.cos(2 * np.pi * day / 120)
+        + 6 * np.sin(2 * np.pi * (hours_local.hour - 9) / 24)
+        + rng.normal(0, 3, n)
+    )
+    dark = np.clip(
+        0.5 + 0.5 * np.cos(2 * np.pi * hours_local.hour / 24) + rng.normal(0, 0.2, n),
+        0,
+        1,
+    )
+    load = (
+        1000
+        + 30 * np.maximum(12 - temp, 0)
+        + 40 * np.maximum(temp - 20, 0)
+        + 100 * dark
+        + rng.normal(0, 20, n)
+    )
+    return pd.DataFrame(
+        {
+            "temp_c": temp,
+            "temp_c_wb": temp - rng.uniform(1, 6, n),
+            "date_local": hours_local,
+            "hour_local": hours_local.hour,
+            "weekday": hours_local.weekday,
+            "holiday": rng.random(n) < 0.03,
+            "hourly_dark_frac": dark,
+            "load_mw": load,
+        }
+    )
+
+
+def _fallback_load_temp_df(n=24 * 120, seed=1):
+    """Hourly load and temperature data whose heating fits take a different branch
+    of the fallback cascade of :py:func:`hourly_load_fit` depending on the hour."""
+    load_temp_df = _load_temp_df(n, seed)
+    rng = np.random.default_rng(seed)
+    hour = load_temp_df["hour_local"].to_numpy()
+    temp = load_temp_df["temp_c"].to_numpy()
+    # Heating slope, darkness slope and darkness range of each hour
+    s_heat = np.select([hour < 6, hour < 12, hour < 18], [-30, 20, -30], 20)
+    s_dark = np.select([hour < 6, hour < 12, hour < 18], [100, 100, -100], 0)
+    dark_range = np.select([hour < 6, hour < 12, hour < 18], [1, 1, 1], 0.2)
+    dark = 0.5 + dark_range * rng.uniform(-0.5, 0.5, n)
+    dark[hour == 20] = 0.5
+    load_temp_df["hourly_dark_frac"] = dark
+    load_temp_df["load_mw"] = (
+        1000
+        + s_heat * np.minimum(temp - 12, 0)
+        + 40 * np.maximum(temp - 20, 0)
+        + s_dark * dark
+        + rng.normal(0, 20, n)
+    )
+    return load_temp_df
+
+
+def _reference_fit(df, numpoints, db_wb_fit):
+    """Fit the heating and cooling models of one (hour, week/weekend) group one
+    statsmodels model at a time."""
+
+    def ols(y, *columns):
+        return sm.OLS(
+            np.asarray(y), np.column_stack(columns + (np.ones(len(y)),))
+        ).fit()
+
+    heat, t_bpc = bkpt_scale(df, numpoints, 10, "heat")
+    cool, t_bph = bkpt_scale(df, numpoints, 18.3, "cool")
+    branches = []
+
+    lm_heat = ols(heat["load_mw"], heat["temp_c"], heat["hourly_dark_frac"])
+    s_heat, s_dark, i_heat = lm_heat.params
+    s_heat_stderr, s_dark_stderr = lm_heat.bse[:2]
+    n_heat, r2_heat = lm_heat.nobs, lm_heat.rsquared
+    if s_heat > 0:
+        branches.append("no_heat")
+        lm_heat = ols(heat["load_mw"], heat["hourly_dark_frac"])
+        s_heat, (s_dark, i_heat) = 0, lm_heat.params
+    dark_range = heat["hourly_dark_frac"].max() - heat["hourly_dark_frac"].min()
+    if s_dark < 0 or dark_range < 0.3:
+        branches.append("no_dark" if s_dark < 0 else "narrow_dark")
+        lm_heat = ols(heat["load_mw"], heat["temp_c"])
+        s_dark, (s_heat, i_heat) = 0, lm_heat.params
+        s_heat_stderr, s_dark_stderr = lm_heat.bse[0], 0
+        n_heat, r2_heat = lm_heat.nobs, lm_heat.rsquared
+        if s_heat > 0:
+            branches.append("constant")
+            lm_heat = sm.OLS(heat["load_mw"].to_numpy(), np.ones(len(heat))).fit()
+            s_heat, i_heat = 0, lm_heat.params[0]
+
+    cool_load = (
+        cool["load_mw"] - (s_heat * t_bph + i_heat) - s_dark * cool["hourly_dark_frac"]
+    )
+    wb_diff = cool["temp_c_wb"] - np.polyval(db_wb_fit, cool["temp_c"])
+    lm_cool = ols(cool_load, cool["temp_c"], wb_diff)
+    s_cool_db, s_cool_wb, i_cool = lm_cool.params
+    fit = {
+        "t.bpc.{}.c": t_bpc,
+        "t.bph.{}.c": max(t_bph, -i_cool / s_cool_db),
+        "i.heat.{}": i_heat,
+        "s.heat.{}": s_heat,
+        "s.dark.{}": s_dark,
+        "i.cool.{}": i_cool,
+        "s.cool.{}.db": s_cool_db,
+        "s.cool.{}.wb": s_cool_wb,
+        "s.heat.stderr.{}": s_heat_stderr,
+        "s.dark.stderr.{}": s_dark_stderr,
+        "n.heat.{}": n_heat,
+        "s.cool.db.stderr.{}": lm_cool.bse[0],
+        "s.cool.wb.stderr.{}": lm_cool.bse[1],
+        "n.cool.{}": lm_cool.nobs,
+        "r2.heat.{}": r2_heat,
+        "r2.cool.{}": lm_cool.rsquared,
+    }
+    return fit, branches
+
+
+def test_stacked_ols():
+    rng = np.random.default_rng(0)
+    x = np.stack(
+        [rng.normal(size=(3, 30)), rng.normal(size=(3, 30)), np.ones((3, 30))], axis=-1
+    )
+    x[2, :, 1] = 0.5  # rank deficient
+    y = rng.normal(size=(3, 30))
+    mask = np.ones((3, 30), dtype=bool)
+    mask[0, 20:] = False
+    mask[1, ::3] = False
+
+    params, bse, nobs, rsquared = stacked_ols(x, y, mask)
+    for m in range(3):
+        lm = sm.OLS(y[m, mask[m]], x[m, mask[m]]).fit()
+        assert np.allclose(params[m], lm.params, rtol=1e-10, atol=1e-12)
+        assert np.allclose(bse[m], lm.bse, rtol=1e-10)
+        assert nobs[m] == lm.nobs
+        assert rsquared[m] == pytest.approx(lm.rsquared, rel=1e-10)
+
+
+def test_hourly_load_fit():
+    load_temp_df = _load_temp_df()
+    hourly_fits_df, db_wb_fit = hourly_load_fit(load_temp_df)
+    assert hourly_fits_df.index.tolist() == list(range(24))
+    assert len(hourly_fits_df.columns) == 38
+    assert hourly_fits_df.columns[0] == "t.bpc.wk.c"
+    assert hourly_fits_df.columns[-1] == "r2.cool.wknd"
+
+    # Reference fit of a single hour of week days
+    hour = 6
+    df = load_temp_df[
+        (load_temp_df["hour_local"] == hour)
+        & (load_temp_df["weekday"] < 5)
+        & ~load_temp_df["holiday"]
+    ].reset_index()
+    heat, t_bpc = bkpt_scale(df, 50, 10, "heat")
+    cool, t_bph = bkpt_scale(df, 50, 18.3, "cool")
+    lm_heat = sm.OLS(
+        heat["load_mw"], np.column_stack([heat["temp_c"], heat["hourly_dark_frac"]])
+    )
+    lm_heat = sm.OLS(lm_heat.endog, sm.add_constant(lm_heat.exog, prepend=False)).fit()
+    s_heat, s_dark, i_heat = lm_heat.params
+    assert s_heat < 0 and s_dark > 0
+
+    cool_load = (
+        cool["load_mw"] - (s_heat * t_bph + i_heat) - s_dark * cool["hourly_dark_frac"]
+    )
+    wb_diff = cool["temp_c_wb"] - np.polyval(db_wb_fit, cool["temp_c"])
+    lm_cool = sm.OLS(
+        cool_load.to_numpy(),
+        np.column_stack([cool["temp_c"], wb_diff, np.ones(len(cool))]),
+    ).fit()
+
+    fit = hourly_fits_df.loc[hour]
+    assert fit["t.bpc.wk.c"] == t_bpc
+    expected = {
+        "s.heat.wk": s_heat,
+        "s.dark.wk": s_dark,
+        "i.heat.wk": i_heat,
+        "s.heat.stderr.wk": lm_heat.bse[0],
+        "r2.heat.wk": lm_heat.rsquared,
+        "n.heat.wk": lm_heat.nobs,
+        "s.cool.wk.db": lm_cool.params[0],
+        "s.cool.wk.wb": lm_cool.params[1],
+        "i.cool.wk": lm_cool.params[2],
+        "r2.cool.wk": lm_cool.rsquared,
+        "n.cool.wk": lm_cool.nobs,
+    }
+    for column, value in expected.items():
+        assert fit[column] == pytest.approx(value, rel=1e-8), column
+    assert fit["t.bph.wk.c"] == pytest.approx(
+        max(t_bph, -lm_cool.params[2] / lm_cool.params[0]), rel=1e-8
+    )
+
+
+def test_hourly_load_fit_plot(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        zone_profile_generator, "plot_hourly_fits", lambda *args: calls.append(args)
+    )
+    load_temp_df = _load_temp_df()
+    hourly_fits_df, _ = hourly_load_fit(load_temp_df, True, "zone", 2016)
+    assert len(calls) == 1
+    assert calls[0][1] is hourly_fits_df
+    assert calls[0][3:] == ("zone", 2016)
+
+
+def test_hourly_load_fit_not_enough_points():
+    load_temp_df = _load_temp_df(n=24 * 7)
+    load_temp_df["temp_c"] += 20
+    with pytest.raises(ValueError):
+        hourly_load_fit(load_temp_df)
+
+
+def test_hourly_load_fit_fallbacks():
+    load_temp_df = _fallback_load_temp_df()
+    hourly_fits_df, db_wb_fit = hourly_load_fit(load_temp_df)
+
+    wk = (load_temp_df["weekday"] < 5) & ~load_temp_df["holiday"]
+    taken = set()
+    for hour in range(24):
+        for wk_wknd, rows, numpoints in [("wk", wk, 50), ("wknd", ~wk, 20)]:
+            df = load_temp_df[(load_temp_df["hour_local"] == hour) & rows]
+            expected, branches = _reference_fit(df.reset_index(), numpoints, db_wb_fit)
+            taken.update(branches)
+            fit = hourly_fits_df.loc[hour]
+            for column, value in expected.items():
+                column = column.format(wk_wknd)
+                assert fit[column] == pytest.approx(value, rel=1e-8, abs=1e-8), (
+                    column,
+                    branches,
+                )
+    assert taken == {"no_heat", "no_dark", "narrow_dark", "constant"}
@@ -5,19 +5,24 @@
 # https://confluence.ecmwf.int/display/CKB/How+to+download+ERA5
 
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 import cdsapi
 import numpy as np
 import pandas as pd
-import psychrolib
 import xarray as xr
 from dateutil import tz
-from scipy.spatial import cKDTree
 from suntime import Sun
 
 from prereise.gather.demanddata.bldg_electrification import const
-
-psychrolib.SetUnitSystem(psychrolib.SI)
+from prereise.gather.demanddata.bldg_electrification.psychrometrics import (
+    t_wetbulb_from_t_dewpoint,
+)
+from prereise.gather.demanddata.bldg_electrification.regrid import (
+    cached_puma_weights,
+    regrid,
+)
 
 variable_names = {
     "temp": {"era5": "2m_temperature", "nc": "t2m"},
@@ -97,7 +102,13 @@ def era5_download(years, directory, variable="temp"):
 
 
 def create_era5_pumas(
-    years, tract_puma_mapping, tract_pop, tract_lat_lon, directory, variable="temp"
+    years,
+    tract_puma_mapping,
+    tract_pop,
+    tract_lat_lon,
+    directory,
+    variable="temp",
+    chunk_size=744,
 ):
     """Create {variable}s_pumas_{state}_{year}.csv or dewpt_pumas_{state}_{year} for all
         CONUS states and input year(s)
@@ -112,25 +123,11 @@ def create_era5_pumas(
         temp {Default} -- dry bulb temperataure, corresponds to ERA5 variable "2m_temperature"
         dewpt -- dew point temperature, corresponds to ERA5 variable "2m_dewpoint_temperature"
         pres -- surface pressure, corresponds to ERA5 variable "surface_pressure"
+    :param int chunk_size: number of hours of ERA5 data regridded at once.
     :raises ValueError: if the ``variable`` name is invalid.
     :raises FileNotFoundError: if not all required files are present.
     """
 
-    # Function to convert latitude and longitude to cartesian coordinates
-    def lon_lat_to_cartesian(lon, lat):
-        # WGS 84 reference coordinate system parameters
-        a = 6378.137  # major axis [km]
-        e2 = 6.69437999014e-3  # eccentricity squared
-
-        lon_rad = np.radians(lon)
-        lat_rad = np.radians(lat)
-        # convert to cartesian coordinates
-        r_n = a / (np.sqrt(1 - e2 * (np.sin(lat_rad) ** 2)))
-        x = r_n * np.cos(lat_rad) * np.cos(lon_rad)
-        y = r_n * np.cos(lat_rad) * np.sin(lon_rad)
-        z = r_n * (1 - e2) * np.sin(lat_rad)
-        return x, y, z
-
     # Check variable input and get associated ERA5 variable name
     try:
         variable_era5 = variable_names[variable]["era5"]
@@ -163,6 +160,8 @@ def create_era5_pumas(
     # Filter to census tracts with building area data in included states
     tract_data = tract_data[tract_data["state"].isin(const.state_list)]
 
+    state_pumas = const.puma_data.groupby("state")
+
     # Loop through input years
     for year in years:
         print(f"Processing puma-level {variable} time series for {year}")
@@ -171,45 +170,28 @@ def create_era5_pumas(
             os.path.join(directory, variable, f"{variable}s_era5_{year}.nc")
         )
 
-        # Get latitude and longitude from ERA5 dataset and make 2D arrays
-        lats_era5 = ds_era5.variables["latitude"][:]
-        lons_era5 = ds_era5.variables["longitude"][:]
-        lons_era5_2d, lats_era5_2d = np.meshgrid(lons_era5, lats_era5)
-
-        x_era5, y_era5, z_era5 = lon_lat_to_cartesian(
-            lons_era5_2d.flatten(), lats_era5_2d.flatten()
+        # Interpolation weights with inverse distance-squared weighting for 4 nearest
+        # neighbors combined with tract population weights, shared by all years on
+        # the same grid
+        weights, pumas = cached_puma_weights(
+            ds_era5["latitude"].values,
+            ds_era5["longitude"].values,
+            tract_data,
+            os.path.join(directory, "pumas", "weights"),
         )
-        x_tracts, y_tracts, z_tracts = lon_lat_to_cartesian(
-            tract_data["lon"], tract_data["lat"]
+        weighted_values = pd.DataFrame(
+            regrid(weights, ds_era5[variable_nc][:8760], chunk_size=chunk_size),
+            columns=pumas,
         )
+        ds_era5.close()
 
-        # Create KD-tree from ERA5 dataset coordinates
-        tree_era5 = cKDTree(np.column_stack((x_era5, y_era5, z_era5)))
-
-        # Create tracts values time series data frame with interpoltion using inverse distance-squared weighting for 4 nearest neighbors
-        d, inds = tree_era5.query(np.column_stack((x_tracts, y_tracts, z_tracts)), k=4)
-        w = 1.0 / d**2
-        vals_tracts = pd.Series(range(0, 8760)).apply(
-            lambda x: pd.Series(
-                (w * ds_era5[variable_nc][x].values.flatten()[inds]).sum(axis=1)
-                / w.sum(axis=1),
-                index=tract_data.index,
-            )
-        )
-
-        state_pumas = const.puma_data.groupby("state")
-
-        weighted_values = tract_data.groupby("puma").apply(
-            lambda x: (vals_tracts[x.index] * x["pop_2010"]).sum(axis=1)
-            / x["pop_2010"].sum()
-        )
         # Convert units if needed (Kelvin to Celsius)
         if variable in {"temp", "dewpt"}:
             weighted_values -= 273.15
         # Loop through states
         for state in const.state_list:
-            state_values = weighted_values.loc[state_pumas.get_group(state).index]
-            state_values.T.to_csv(
+            state_values = weighted_values[state_pumas.get_group(state).index]
+            state_values.to_csv(
                 os.path.join(
                     directory,
                     "pumas",
@@ -323,25 +305,53 @@ def generate_dark_fracs(year, directory):
 def t_to_twb(temp_values, dwpt_values, press_values):
     """Compute wetbulb temperature from drybulb, dewpoint, and pressure
 
-    :param list temp_values: drybulb temperatures, C
-    :param list dwpt_values: dewpoint temperatures, C
-    :param list press_values: pressures, Pa
+    :param numpy.ndarray temp_values: drybulb temperatures, C
+    :param numpy.ndarray dwpt_values: dewpoint temperatures, C
+    :param numpy.ndarray press_values: pressures, Pa
 
-    :return: (*list*) -- wetbulb temperatures
+    :return: (*numpy.ndarray*) -- wetbulb temperatures
     """
-    return [
-        psychrolib.GetTWetBulbFromTDewPoint(
-            temp_values[i], min(temp_values[i], dwpt_values[i]), press_values[i]
-        )
-        for i in range(len(dwpt_values))
-    ]
+    return t_wetbulb_from_t_dewpoint(
+        np.asarray(temp_values, dtype=float),
+        np.asarray(dwpt_values, dtype=float),
+        np.asarray(press_values, dtype=float),
+    )
+
+
+def _generate_state_wetbulb_temps(state, year, directory):
+    temps = pd.read_csv(
+        f"https://besciences.blob.core.windows.net/datasets/bldg_el/pumas/temps/temps_pumas_{state}_{year}.csv"
+    )
+    dwpts = pd.read_csv(
+        f"https://besciences.blob.core.windows.net/datasets/bldg_el/pumas/dewpoints/dewpts_pumas_{state}_{year}.csv"
+    )
+    press = pd.read_csv(
+        f"https://besciences.blob.core.windows.net/datasets/bldg_el/pumas/press/press_pumas_{state}_{year}.csv"
+    )
 
+    temps_wetbulb = pd.DataFrame(
+        t_to_twb(temps, dwpts[temps.columns], press[temps.columns]),
+        columns=temps.columns,
+    )
+
+    temps_wetbulb.to_csv(
+        os.path.join(
+            directory,
+            "pumas",
+            "temps_wetbulb",
+            f"temps_wetbulb_pumas_{state}_{year}.csv",
+        ),
+        index=False,
+    )
 
-def generate_wetbulb_temps(year, directory):
+
+def generate_wetbulb_temps(year, directory, max_workers=1):
     """Generate puma level hourly time series of wetbulb temperatures for all pumas within a state
 
     :param int year: year of desired dark fractions
     :param str directory: path to local root directory for weather data
+    :param int max_workers: number of processes among which states are split. States
+        are processed one after another in the current process if 1.
 
     :export: (*csv*) -- statewide hourly wetbulb temperatures for every puma
     """
@@ -349,25 +359,17 @@ def generate_wetbulb_temps(year, directory):
     # Create folder to store dark_frac output if it doesn"t yet exist
     os.makedirs(os.path.join(directory, "pumas", "temps_wetbulb"), exist_ok=True)
 
-    for state in const.state_list:
-        temps = pd.read_csv(
-            f"https://besciences.blob.core.windows.net/datasets/bldg_el/pumas/temps/temps_pumas_{state}_{year}.csv"
-        )
-        dwpts = pd.read_csv(
-            f"https://besciences.blob.core.windows.net/datasets/bldg_el/pumas/dewpoints/dewpts_pumas_{state}_{year}.csv"
-        )
-        press = pd.read_csv(
-            f"https://besciences.blob.core.windows.net/datasets/bldg_el/pumas/press/press_pumas_{state}_{year}.csv"
-        )
-
-        temps_wetbulb = temps.apply(lambda x: t_to_twb(x, dwpts[x.name], press[x.name]))
-
-        temps_wetbulb.to_csv(
-            os.path.join(
-                directory,
-                "pumas",
-                "temps_wetbulb",
-                f"temps_wetbulb_pumas_{state}_{year}.csv",
-            ),
-            index=False,
+    if max_workers == 1:
+        for state in const.state_list:
+            _generate_state_wetbulb_temps(state, year, directory)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        list(
+            executor.map(
+                _generate_state_wetbulb_temps,
+                const.state_list,
+                repeat(year),
+                repeat(directory),
+            )
         )
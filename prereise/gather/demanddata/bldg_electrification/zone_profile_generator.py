@@ -1,10 +1,11 @@
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
 from pandas.tseries.holiday import USFederalHolidayCalendar as calendar  # noqa: N813
 
 from prereise.gather.demanddata.bldg_electrification import const
@@ -13,6 +14,7 @@ from prereise.gather.demanddata.bldg_electrification.const import (
     zone_names,
 )
 from prereise.gather.demanddata.bldg_electrification.helper import (
+    read_puma_weather,
     read_shapefile,
     zone_shp_overlay,
 )
@@ -191,33 +193,17 @@ def zonal_data(puma_data, hours_utc, year):
         ],
     )
 
-    puma_hourly_temps = pd.concat(
-        list(
-            pd.Series(data=zone_states).apply(
-                lambda x: pd.read_csv(
-                    f"https://besciences.blob.core.windows.net/datasets/bldg_el/pumas/{year}/temps/temps_pumas_{x}_{year}.csv"
-                ).T
-            )
-        )
-    )
-    puma_hourly_temps_wb = pd.concat(
-        list(
-            pd.Series(data=zone_states).apply(
-                lambda x: pd.read_csv(
-                    f"https://besciences.blob.core.windows.net/datasets/bldg_el/pumas/{year}/temps_wetbulb/temps_wetbulb_pumas_{x}_{year}.csv"
-                ).T
-            )
-        )
-    )
-    puma_hourly_dark_frac = pd.concat(
-        list(
-            pd.Series(data=zone_states).apply(
-                lambda x: pd.read_csv(
-                    f"https://besciences.blob.core.windows.net/datasets/bldg_el/pumas/{year}/dark_frac/dark_frac_pumas_{x}_{year}.csv"
-                ).T
-            )
+    def zone_weather(variable):
+        return pd.concat(
+            [
+                read_puma_weather(variable, state, year, pumas=puma_data.index).T
+                for state in zone_states
+            ]
         )
-    )
+
+    puma_hourly_temps = zone_weather("temps")
+    puma_hourly_temps_wb = zone_weather("temps_wetbulb")
+    puma_hourly_dark_frac = zone_weather("dark_frac")
 
     hours_local = hours_utc.tz_convert(timezone)
     is_holiday = pd.Series(hours_local).dt.date.isin(
@@ -230,351 +216,356 @@ def zonal_data(puma_data, hours_utc, year):
 
     temp_df = pd.DataFrame(
         {
-            "temp_c": puma_hourly_temps[puma_hourly_temps.index.isin(puma_data.index)]
-            .mul(puma_pop_weights, axis=0)
-            .sum(axis=0),
-            "temp_c_wb": puma_hourly_temps_wb[
-                puma_hourly_temps_wb.index.isin(puma_data.index)
-            ]
-            .mul(puma_pop_weights, axis=0)
-            .sum(axis=0),
+            "temp_c": puma_hourly_temps.mul(puma_pop_weights, axis=0).sum(axis=0),
+            "temp_c_wb": puma_hourly_temps_wb.mul(puma_pop_weights, axis=0).sum(axis=0),
             "date_local": hours_local,
             "hour_local": hours_local.hour,
             "weekday": hours_local.weekday,
             "holiday": is_holiday,
-            "hourly_dark_frac": puma_hourly_dark_frac[
-                puma_hourly_dark_frac.index.isin(puma_data.index)
-            ]
-            .mul(puma_pop_weights, axis=0)
-            .sum(axis=0),
+            "hourly_dark_frac": puma_hourly_dark_frac.mul(puma_pop_weights, axis=0).sum(
+                axis=0
+            ),
         }
     )
 
     return temp_df, stats
 
 
-def hourly_load_fit(load_temp_df, plot_boolean):
-    """Fit hourly heating, cooling, and baseload functions to load data
+t_bpc_start = 10
+t_bph_start = 18.3
+daily_points = 10
+fit_columns = [
+    "t.bpc.{}.c",
+    "t.bph.{}.c",
+    "i.heat.{}",
+    "s.heat.{}",
+    "s.dark.{}",
+    "i.cool.{}",
+    "s.cool.{}.db",
+    "s.cool.{}.wb",
+    "s.heat.stderr.{}",
+    "s.dark.stderr.{}",
+    "n.heat.{}",
+    "s.cool.db.stderr.{}",
+    "s.cool.wb.stderr.{}",
+    "n.cool.{}",
+    "mrae.heat.{}.mw",
+    "mrae.cool.{}.mw",
+    "mrae.mid.{}.mw",
+    "r2.heat.{}",
+    "r2.cool.{}",
+]
+
+
+def stacked_ols(x, y, mask):
+    """Fit ordinary least squares models in stacked form, as ``statsmodels`` OLS
+    does one model at a time with its default pseudo-inverse method.
+
+    :param numpy.ndarray x: design matrices, shape (models, rows, regressors). The
+        last regressor must be the constant.
+    :param numpy.ndarray y: responses, shape (models, rows).
+    :param numpy.ndarray mask: boolean array of the rows used by each model, shape
+        (models, rows).
+    :return: (*tuple*) -- parameters and their standard errors, shape (models,
+        regressors), number of observations and R², shape (models,).
+    """
+    x = np.where(mask[..., None], x, 0)
+    y = np.where(mask, y, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pinv = np.linalg.pinv(x, rcond=1e-15)
+        params = np.einsum("mkn,mn->mk", pinv, y)
+        resid = np.where(mask, y - np.einsum("mnk,mk->mn", x, params), 0)
+        ssr = (resid**2).sum(axis=1)
+        nobs = mask.sum(axis=1).astype(float)
+        scale = ssr / (nobs - np.linalg.matrix_rank(x))
+        cov = np.einsum("mkn,mjn->mkj", pinv, pinv)
+        bse = np.sqrt(np.diagonal(cov, axis1=1, axis2=2) * scale[:, None])
+        centered = np.where(mask, y - y.sum(axis=1, keepdims=True) / nobs[:, None], 0)
+        rsquared = 1 - ssr / (centered**2).sum(axis=1)
+    return params, bse, nobs, rsquared
+
+
+def _group_load_temp(load_temp_df):
+    """Split hourly load and temperature data by local hour and week/weekend, with
+    one padded row per (hour, week/weekend) group, and select the heating and
+    cooling points of each group as :py:func:`bkpt_scale` does.
+
+    :param pandas.DataFrame load_temp_df: hourly load and temperature data.
+    :return: (*dict*) -- arrays of shape (48, max group size) sorted by temperature
+        within each group: *'temp_c'*, *'temp_c_wb'*, *'hourly_dark_frac'*,
+        *'load_mw'* and the *'valid'*, *'heat'* and *'cool'* masks, and arrays of
+        shape (48,): the *'t_bpc'* and *'t_bph'* breakpoints. Group 2 * h is hour h
+        of week days, group 2 * h + 1 is hour h of weekends and holidays.
+    :raises ValueError: if a group has too few points to fit.
+    """
+    temp = load_temp_df["temp_c"].to_numpy(dtype=float)
+    wknd = ~(
+        (load_temp_df["weekday"].to_numpy() < 5)
+        & ~load_temp_df["holiday"].to_numpy(dtype=bool)
+    )
+    group = 2 * load_temp_df["hour_local"].to_numpy(dtype=int) + wknd
+    order = np.lexsort((temp, group))
+    size = np.bincount(group, minlength=48)
+    rank = np.arange(len(order)) - np.repeat(np.cumsum(size) - size, size)
+    numpoints = np.tile([daily_points * 5, daily_points * 2], 24)
+    if (size < numpoints).any():
+        raise ValueError("not enough data points to fit every hour")
+
+    index = np.zeros((48, size.max()), dtype=int)
+    valid = np.zeros((48, size.max()), dtype=bool)
+    index[group[order], rank] = order
+    valid[group[order], rank] = True
+    grouped = {
+        c: np.where(valid, load_temp_df[c].to_numpy(dtype=float)[index], np.nan)
+        for c in ["temp_c", "temp_c_wb", "hourly_dark_frac", "load_mw"]
+    }
+    temp = grouped["temp_c"]
+    m = np.arange(48)
+
+    # Heating uses the coldest points, cooling the warmest ones
+    heat = valid & (temp <= t_bpc_start)
+    enough = heat.sum(axis=1) >= numpoints
+    rank = np.arange(size.max())
+    heat = np.where(enough[:, None], heat, valid & (rank < numpoints[:, None]))
+    t_bpc = np.where(enough, t_bpc_start, temp[m, numpoints - 1])
+
+    cool = valid & (temp >= t_bph_start)
+    enough = cool.sum(axis=1) >= numpoints
+    first = size - numpoints
+    cool = np.where(enough[:, None], cool, valid & (rank >= first[:, None]))
+    t_bph = np.where(enough, t_bph_start, temp[m, first])
+
+    return {
+        **grouped,
+        "valid": valid,
+        "heat": heat,
+        "cool": cool,
+        "t_bpc": t_bpc,
+        "t_bph": t_bph,
+    }
+
+
+def _wb_diff(temp, temp_wb, db_wb_fit):
+    return temp_wb - (db_wb_fit[0] * temp**2 + db_wb_fit[1] * temp + db_wb_fit[2])
+
+
+def _fit_curves(grouped, fits, db_wb_fit):
+    """Evaluate the fitted heating, cooling and intermediate cooling load on the
+    points they are fitted to.
+
+    :param dict grouped: grouped data, see :py:func:`_group_load_temp`.
+    :param dict fits: fitted coefficients of each group, arrays of shape (48,).
+    :param numpy.array db_wb_fit: least-square estimators of the quadratic
+        relationship between WBT and DBT.
+    :return: (*dict*) -- *'heat'*, *'cool'* and *'mid'* tuples of mask of the points
+        and load of shape (48, max group size).
+    """
+    temp, temp_wb, dark = (
+        grouped["temp_c"],
+        grouped["temp_c_wb"],
+        grouped["hourly_dark_frac"],
+    )
+    t_bpc, t_bph, s_heat, s_dark, i_heat, s_cool_db, s_cool_wb, i_cool = (
+        fits[k][:, None]
+        for k in [
+            "t_bpc",
+            "t_bph",
+            "s_heat",
+            "s_dark",
+            "i_heat",
+            "s_cool_db",
+            "s_cool_wb",
+            "i_cool",
+        ]
+    )
+    wb_diff = _wb_diff(temp, temp_wb, db_wb_fit)
 
-    :param pandas.DataFrame load_temp_df: hourly load and temperature data
-    :param boolean plot_boolean: whether or not create profile plots.
+    heat_eqn = temp * s_heat + dark * s_dark + i_heat
 
-    :return: (*pandas.DataFrame*) hourly_fits_df -- hourly and week/weekend breakpoints and coefficients for electricity use equations
-    :return: (*float*) s_wb_db, i_wb_db -- slope and intercept of fit between dry and wet bulb temperatures of zone
-    """
+    cool = temp * s_cool_db + wb_diff * s_cool_wb + i_cool
+    cool_eqn = np.where(cool < 0, 0, cool) + t_bph * s_heat + dark * s_dark + i_heat
 
-    def make_hourly_series(load_temp_df, i):
-        daily_points = 10
-        result = {}
-        for wk_wknd in ["wk", "wknd"]:
-            if wk_wknd == "wk":
-                load_temp_hr = load_temp_df[
-                    (load_temp_df["hour_local"] == i)
-                    & (load_temp_df["weekday"] < 5)
-                    & ~load_temp_df["holiday"]  # boolean column
-                ].reset_index()
-                numpoints = daily_points * 5
-            elif wk_wknd == "wknd":
-                load_temp_hr = load_temp_df[
-                    (load_temp_df["hour_local"] == i)
-                    & (
-                        (load_temp_df["weekday"] >= 5)
-                        | load_temp_df["holiday"]  # boolean column
-                    )
-                ].reset_index()
-                numpoints = daily_points * 2
-
-            load_temp_hr_heat, t_bpc = bkpt_scale(
-                load_temp_hr, numpoints, t_bpc_start, "heat"
-            )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mid = ((temp - t_bpc) / (t_bph - t_bpc)) ** 2 * (
+            t_bph * s_cool_db + wb_diff * s_cool_wb + i_cool
+        )
+    mid_eqn = np.where(mid < 0, 0, mid) + temp * s_heat + dark * s_dark + i_heat
 
-            load_temp_hr_cool, t_bph = bkpt_scale(
-                load_temp_hr, numpoints, t_bph_start, "cool"
-            )
+    return {
+        "heat": (grouped["heat"], heat_eqn),
+        "cool": (grouped["cool"] & (temp >= t_bph), cool_eqn),
+        "mid": (grouped["valid"] & (temp < t_bph) & (temp > t_bpc), mid_eqn),
+    }
 
-            lm_heat = sm.OLS(
-                load_temp_hr_heat["load_mw"],
-                np.array(
-                    [
-                        [
-                            load_temp_hr_heat["temp_c"][j],
-                            load_temp_hr_heat["hourly_dark_frac"][j],
-                            1,
-                        ]
-                        for j in range(len(load_temp_hr_heat))
-                    ]
-                ),
-            ).fit()
-
-            s_heat, s_dark, i_heat = (
-                lm_heat.params[0],
-                lm_heat.params[1],
-                lm_heat.params[2],
-            )
-            s_heat_stderr, s_dark_stderr, n_heat, r_squared_heat = (
-                lm_heat.bse[0],
-                lm_heat.bse[1],
-                lm_heat.nobs,
-                lm_heat.rsquared,
-            )
 
-            if s_heat > 0:
-                lm_heat = sm.OLS(
-                    load_temp_hr_heat["load_mw"],
-                    np.array(
-                        [
-                            [load_temp_hr_heat["hourly_dark_frac"][j], 1]
-                            for j in range(len(load_temp_hr_heat))
-                        ]
-                    ),
-                ).fit()
-
-                s_heat, s_dark, i_heat = (0, lm_heat.params[0], lm_heat.params[1])
-
-            if (
-                s_dark < 0
-                or (
-                    max(load_temp_hr_heat["hourly_dark_frac"])
-                    - min(load_temp_hr_heat["hourly_dark_frac"])
-                )
-                < 0.3
-            ):
-                lm_heat = sm.OLS(
-                    load_temp_hr_heat["load_mw"],
-                    np.array(
-                        [
-                            [load_temp_hr_heat["temp_c"][j], 1]
-                            for j in range(len(load_temp_hr_heat))
-                        ]
-                    ),
-                ).fit()
-
-                s_dark, s_heat, i_heat = (0, lm_heat.params[0], lm_heat.params[1])
-                s_heat_stderr, s_dark_stderr, n_heat, r_squared_heat = (
-                    lm_heat.bse[0],
-                    0,
-                    lm_heat.nobs,
-                    lm_heat.rsquared,
-                )
-
-                if s_heat > 0:
-                    lm_heat = sm.OLS(
-                        load_temp_hr_heat["load_mw"],
-                        np.array([[1] for j in range(len(load_temp_hr_heat))]),
-                    ).fit()
-                    s_dark, s_heat, i_heat = (0, 0, lm_heat.params[0])
-
-            load_temp_hr_cool["cool_load_mw"] = [
-                load_temp_hr_cool["load_mw"][j]
-                - (s_heat * t_bph + i_heat)
-                - s_dark * load_temp_hr_cool["hourly_dark_frac"][j]
-                for j in range(len(load_temp_hr_cool))
-            ]
+def hourly_load_fit(load_temp_df, plot_boolean=False, zone_name=None, base_year=None):
+    """Fit hourly heating, cooling, and baseload functions to load data. The 48
+    (hour, week/weekend) models are fitted together in stacked form.
 
-            load_temp_hr_cool["temp_c_wb_diff"] = load_temp_hr_cool["temp_c_wb"] - (
-                db_wb_fit[0] * load_temp_hr_cool["temp_c"] ** 2
-                + db_wb_fit[1] * load_temp_hr_cool["temp_c"]
-                + db_wb_fit[2]
-            )
+    :param pandas.DataFrame load_temp_df: hourly load and temperature data
+    :param boolean plot_boolean: whether or not create profile plots, see
+        :py:func:`plot_hourly_fits`.
+    :param str zone_name: name of load zone, used in plots.
+    :param int base_year: data fitting year, used in plots.
 
-            lm_cool = sm.OLS(
-                load_temp_hr_cool["cool_load_mw"],
-                np.array(
-                    [
-                        [
-                            load_temp_hr_cool["temp_c"][i],
-                            load_temp_hr_cool["temp_c_wb_diff"][i],
-                            1,
-                        ]
-                        for i in range(len(load_temp_hr_cool))
-                    ]
-                ),
-            ).fit()
-
-            s_cool_db, s_cool_wb, i_cool = (
-                lm_cool.params[0],
-                lm_cool.params[1],
-                lm_cool.params[2],
-            )
+    :return: (*pandas.DataFrame*) hourly_fits_df -- hourly and week/weekend breakpoints and coefficients for electricity use equations
+    :return: (*numpy.array*) db_wb_fit -- least-square estimators of the quadratic relationship between WBT and DBT of zone
+    """
+    db_wb_regr_df = load_temp_df[load_temp_df["temp_c"] >= t_bpc_start]
 
-            s_cool_db_stderr = lm_cool.bse[0]
-            s_cool_wb_stderr = lm_cool.bse[1]
-            n_cool = lm_cool.nobs
-            r_squared_cool = lm_cool.rsquared
-
-            t_bph = -i_cool / s_cool_db if -i_cool / s_cool_db > t_bph else t_bph
-
-            #
-            if wk_wknd == "wk":
-                wk_graph = load_temp_df[
-                    (load_temp_df["hour_local"] == i)
-                    & (load_temp_df["weekday"] < 5)
-                    & ~load_temp_df["holiday"]  # boolean column
-                ]
-            else:
-                wk_graph = load_temp_df[
-                    (load_temp_df["hour_local"] == i)
-                    & (
-                        (load_temp_df["weekday"] >= 5)
-                        | load_temp_df["holiday"]  # boolean column
-                    )
-                ]
-
-            load_temp_hr_cool_func = wk_graph[
-                (wk_graph["temp_c"] < t_bph) & (wk_graph["temp_c"] > t_bpc)
-            ].reset_index()
-
-            heat_eqn = (
-                load_temp_hr_heat["temp_c"] * s_heat
-                + load_temp_hr_heat["hourly_dark_frac"] * s_dark
-                + i_heat
-            )
-            load_temp_hr_cool_plot = load_temp_hr_cool[
-                load_temp_hr_cool["temp_c"] >= t_bph
-            ]
-            load_temp_hr_cool_plot = load_temp_hr_cool_plot.reset_index(drop=True)
-
-            cool_eqn = [
-                max(
-                    load_temp_hr_cool_plot["temp_c"][i] * s_cool_db
-                    + (
-                        load_temp_hr_cool_plot["temp_c_wb"][i]
-                        - (
-                            db_wb_fit[0] * load_temp_hr_cool_plot["temp_c"][i] ** 2
-                            + db_wb_fit[1] * load_temp_hr_cool_plot["temp_c"][i]
-                            + db_wb_fit[2]
-                        )
-                    )
-                    * s_cool_wb
-                    + i_cool,
-                    0,
-                )
-                + t_bph * s_heat
-                + load_temp_hr_cool_plot["hourly_dark_frac"][i] * s_dark
-                + i_heat
-                for i in range(len(load_temp_hr_cool_plot))
-            ]
-            cool_func_eqn = [
-                max(
-                    ((load_temp_hr_cool_func["temp_c"][i] - t_bpc) / (t_bph - t_bpc))
-                    ** 2
-                    * (
-                        t_bph * s_cool_db
-                        + (
-                            load_temp_hr_cool_func["temp_c_wb"][i]
-                            - (
-                                db_wb_fit[0] * load_temp_hr_cool_func["temp_c"][i] ** 2
-                                + db_wb_fit[1] * load_temp_hr_cool_func["temp_c"][i]
-                                + db_wb_fit[2]
-                            )
-                        )
-                        * s_cool_wb
-                        + i_cool
-                    ),
-                    0,
-                )
-                + load_temp_hr_cool_func["temp_c"][i] * s_heat
-                + load_temp_hr_cool_func["hourly_dark_frac"][i] * s_dark
-                + i_heat
-                for i in range(len(load_temp_hr_cool_func))
-            ]
+    db_wb_fit = np.polyfit(db_wb_regr_df["temp_c"], db_wb_regr_df["temp_c_wb"], 2)
 
-            # Generate hourly fit plot
-            if plot_boolean:
-                plt.rcParams.update({"font.size": 20})
-                fig, ax = plt.subplots(figsize=(20, 10))
-
-                plt.scatter(wk_graph["temp_c"], wk_graph["load_mw"], color="black")
-
-                plt.scatter(load_temp_hr_heat["temp_c"], heat_eqn, color="red")
-                plt.scatter(load_temp_hr_cool_plot["temp_c"], cool_eqn, color="blue")
-                plt.scatter(
-                    load_temp_hr_cool_func["temp_c"], cool_func_eqn, color="green"
-                )
-
-                plt.title(
-                    f"zone {zone_name}, hour {i}, {wk_wknd} \n t_bpc = "
-                    + str(round(t_bpc, 2))
-                    + "  t_bph = "
-                    + str(round(t_bph, 2))
-                )
-                plt.xlabel("Temp (°C)")
-                plt.ylabel("Load (MW)")
-                os.makedirs(
-                    os.path.join(
-                        os.path.dirname(__file__), "dayhour_fits", "dayhour_fits_graphs"
-                    ),
-                    exist_ok=True,
-                )
-                plt.savefig(
-                    os.path.join(
-                        os.path.dirname(__file__),
-                        "dayhour_fits",
-                        "dayhour_fits_graphs",
-                        f"{zone_name}_hour_{i}_{wk_wknd}_{base_year}.png",
-                    )
-                )
-
-            mrae_heat = np.mean(
-                [
-                    np.abs(heat_eqn[i] - load_temp_hr_heat["load_mw"][i])
-                    / load_temp_hr_heat["load_mw"][i]
-                    for i in range(len(load_temp_hr_heat))
-                ]
-            )
-            mrae_cool = np.mean(
-                [
-                    np.abs(cool_eqn[i] - load_temp_hr_cool_plot["load_mw"][i])
-                    / load_temp_hr_cool_plot["load_mw"][i]
-                    for i in range(len(load_temp_hr_cool_plot))
-                ]
-            )
-            mrae_cool_func = np.mean(
-                [
-                    np.abs(cool_func_eqn[i] - load_temp_hr_cool_func["load_mw"][i])
-                    / load_temp_hr_cool_func["load_mw"][i]
-                    for i in range(len(load_temp_hr_cool_func))
-                ]
-            )
+    grouped = _group_load_temp(load_temp_df)
+    temp, dark, load = (
+        grouped["temp_c"],
+        grouped["hourly_dark_frac"],
+        grouped["load_mw"],
+    )
+    heat = grouped["heat"]
+    one = np.ones_like(temp)
 
-            result[wk_wknd] = {
-                f"t.bpc.{wk_wknd}.c": t_bpc,
-                f"t.bph.{wk_wknd}.c": t_bph,
-                f"i.heat.{wk_wknd}": i_heat,
-                f"s.heat.{wk_wknd}": s_heat,
-                f"s.dark.{wk_wknd}": s_dark,
-                f"i.cool.{wk_wknd}": i_cool,
-                f"s.cool.{wk_wknd}.db": s_cool_db,
-                f"s.cool.{wk_wknd}.wb": s_cool_wb,
-                f"s.heat.stderr.{wk_wknd}": s_heat_stderr,
-                f"s.dark.stderr.{wk_wknd}": s_dark_stderr,
-                f"n.heat.{wk_wknd}": n_heat,
-                f"s.cool.db.stderr.{wk_wknd}": s_cool_db_stderr,
-                f"s.cool.wb.stderr.{wk_wknd}": s_cool_wb_stderr,
-                f"n.cool.{wk_wknd}": n_cool,
-                f"mrae.heat.{wk_wknd}.mw": mrae_heat,
-                f"mrae.cool.{wk_wknd}.mw": mrae_cool,
-                f"mrae.mid.{wk_wknd}.mw": mrae_cool_func,
-                f"r2.heat.{wk_wknd}": r_squared_heat,
-                f"r2.cool.{wk_wknd}": r_squared_cool,
-            }
-
-        return pd.Series({**result["wk"], **result["wknd"]})
-
-    t_bpc_start = 10
-    t_bph_start = 18.3
+    # Heating: fall back to simpler models when slopes have the wrong sign or the
+    # darkness fraction does not vary enough
+    params, bse, n_heat, r_squared_heat = stacked_ols(
+        np.stack([temp, dark, one], axis=-1), load, heat
+    )
+    s_heat, s_dark, i_heat = params.T
+    s_heat_stderr, s_dark_stderr = bse[:, 0], bse[:, 1]
 
-    db_wb_regr_df = load_temp_df[load_temp_df["temp_c"] >= t_bpc_start]
+    params, _, _, _ = stacked_ols(np.stack([dark, one], axis=-1), load, heat)
+    no_heat = s_heat > 0
+    s_heat = np.where(no_heat, 0, s_heat)
+    s_dark = np.where(no_heat, params[:, 0], s_dark)
+    i_heat = np.where(no_heat, params[:, 1], i_heat)
 
-    db_wb_fit = np.polyfit(db_wb_regr_df["temp_c"], db_wb_regr_df["temp_c_wb"], 2)
+    dark_range = np.nanmax(np.where(heat, dark, np.nan), axis=1) - np.nanmin(
+        np.where(heat, dark, np.nan), axis=1
+    )
+    no_dark = (s_dark < 0) | (dark_range < 0.3)
+    params, bse, n, r2 = stacked_ols(np.stack([temp, one], axis=-1), load, heat)
+    s_dark = np.where(no_dark, 0, s_dark)
+    s_heat = np.where(no_dark, params[:, 0], s_heat)
+    i_heat = np.where(no_dark, params[:, 1], i_heat)
+    s_heat_stderr = np.where(no_dark, bse[:, 0], s_heat_stderr)
+    s_dark_stderr = np.where(no_dark, 0, s_dark_stderr)
+    n_heat = np.where(no_dark, n, n_heat)
+    r_squared_heat = np.where(no_dark, r2, r_squared_heat)
+
+    no_heat = no_dark & (s_heat > 0)
+    s_heat = np.where(no_heat, 0, s_heat)
+    i_heat = np.where(no_heat, np.nanmean(np.where(heat, load, np.nan), axis=1), i_heat)
+
+    # Cooling: fitted to the load left once baseload and heating are removed
+    t_bph = grouped["t_bph"]
+    cool_load = load - (s_heat * t_bph + i_heat)[:, None] - s_dark[:, None] * dark
+    wb_diff = _wb_diff(temp, grouped["temp_c_wb"], db_wb_fit)
+    params, bse, n_cool, r_squared_cool = stacked_ols(
+        np.stack([temp, wb_diff, one], axis=-1), cool_load, grouped["cool"]
+    )
+    s_cool_db, s_cool_wb, i_cool = params.T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_bph = np.where(-i_cool / s_cool_db > t_bph, -i_cool / s_cool_db, t_bph)
+
+    fits = {
+        "t_bpc": grouped["t_bpc"],
+        "t_bph": t_bph,
+        "i_heat": i_heat,
+        "s_heat": s_heat,
+        "s_dark": s_dark,
+        "i_cool": i_cool,
+        "s_cool_db": s_cool_db,
+        "s_cool_wb": s_cool_wb,
+        "s_heat_stderr": s_heat_stderr,
+        "s_dark_stderr": s_dark_stderr,
+        "n_heat": n_heat,
+        "s_cool_db_stderr": bse[:, 0],
+        "s_cool_wb_stderr": bse[:, 1],
+        "n_cool": n_cool,
+    }
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for name, (mask, eqn) in _fit_curves(grouped, fits, db_wb_fit).items():
+            fits[f"mrae_{name}"] = np.where(mask, np.abs(eqn - load) / load, 0).sum(
+                axis=1
+            ) / mask.sum(axis=1)
+    fits["r2_heat"] = r_squared_heat
+    fits["r2_cool"] = r_squared_cool
 
     hourly_fits_df = pd.DataFrame(
-        [make_hourly_series(load_temp_df, i) for i in range(24)]
+        {
+            column.format(wk_wknd): values[offset::2]
+            for offset, wk_wknd in enumerate(["wk", "wknd"])
+            for column, values in zip(fit_columns, fits.values())
+        }
     )
 
+    if plot_boolean:
+        plot_hourly_fits(load_temp_df, hourly_fits_df, db_wb_fit, zone_name, base_year)
+
     return hourly_fits_df, db_wb_fit
 
 
+def plot_hourly_fits(load_temp_df, hourly_fits_df, db_wb_fit, zone_name, base_year):
+    """Plot the load and the fitted heating and cooling load for every hour and
+    week/weekend.
+
+    :param pandas.DataFrame load_temp_df: hourly load and temperature data
+    :param pandas.DataFrame hourly_fits_df: hourly and week/weekend breakpoints and
+        coefficients, as returned by :py:func:`hourly_load_fit`.
+    :param numpy.array db_wb_fit: least-square estimators of the quadratic
+        relationship between WBT and DBT of zone
+    :param str zone_name: name of load zone.
+    :param int base_year: data fitting year.
+    """
+    grouped = _group_load_temp(load_temp_df)
+    coefficients = {
+        "t_bpc": "t.bpc.{}.c",
+        "t_bph": "t.bph.{}.c",
+        "i_heat": "i.heat.{}",
+        "s_heat": "s.heat.{}",
+        "s_dark": "s.dark.{}",
+        "i_cool": "i.cool.{}",
+        "s_cool_db": "s.cool.{}.db",
+        "s_cool_wb": "s.cool.{}.wb",
+    }
+    fits = {
+        k: np.column_stack(
+            [hourly_fits_df[c.format("wk")], hourly_fits_df[c.format("wknd")]]
+        ).ravel()
+        for k, c in coefficients.items()
+    }
+    curves = _fit_curves(grouped, fits, db_wb_fit)
+
+    directory = os.path.join(
+        os.path.dirname(__file__), "dayhour_fits", "dayhour_fits_graphs"
+    )
+    os.makedirs(directory, exist_ok=True)
+    plt.rcParams.update({"font.size": 20})
+    for g in range(48):
+        hour, wk_wknd = g // 2, ["wk", "wknd"][g % 2]
+        valid = grouped["valid"][g]
+        fig, ax = plt.subplots(figsize=(20, 10))
+        plt.scatter(
+            grouped["temp_c"][g, valid], grouped["load_mw"][g, valid], color="black"
+        )
+        for name, color in [("heat", "red"), ("cool", "blue"), ("mid", "green")]:
+            mask, eqn = curves[name]
+            plt.scatter(grouped["temp_c"][g, mask[g]], eqn[g, mask[g]], color=color)
+        plt.title(
+            f"zone {zone_name}, hour {hour}, {wk_wknd} \n t_bpc = "
+            + str(round(fits["t_bpc"][g], 2))
+            + "  t_bph = "
+            + str(round(fits["t_bph"][g], 2))
+        )
+        plt.xlabel("Temp (°C)")
+        plt.ylabel("Load (MW)")
+        plt.savefig(
+            os.path.join(
+                directory, f"{zone_name}_hour_{hour}_{wk_wknd}_{base_year}.png"
+            )
+        )
+        plt.close(fig)
+
+
 def temp_to_energy(temp_series, hourly_fits_df, db_wb_fit):
     """Compute baseload, heating, and cooling electricity for a certain hour of year
 
@@ -651,12 +642,81 @@ def temp_to_energy(temp_series, hourly_fits_df, db_wb_fit):
     return [base_eng, heat_eng, max(cool_eng, 0) + max(mid_cool_eng, 0)]
 
 
-def plot_profile(profile, actual, plot_boolean):
+def hourly_energy_terms(temp_df, hourly_fits_df, db_wb_fit):
+    """Compute baseload, heating, and cooling electricity for all the hours at once,
+    as :py:func:`temp_to_energy` does for a single hour. Coefficients are gathered
+    for every hour by local hour and week/weekend.
+
+    :param pandas.DataFrame temp_df: hourly data, one row per hour.
+    :param pandas.DataFrame hourly_fits_df: hourly and week/weekend breakpoints and
+        coefficients for electricity use equations.
+    :param numpy.array db_wb_fit: least-square estimators of the quadratic
+        relationship between WBT and DBT.
+    :return: (*tuple*) -- arrays of baseload, heating and cooling energy, and
+        boolean array of the hours at or below the heating breakpoint.
+    :raises KeyError: if a local hour is missing from ``hourly_fits_df``.
+    """
+    temp = temp_df["temp_c"].to_numpy(dtype=float)
+    temp_wb = temp_df["temp_c_wb"].to_numpy(dtype=float)
+    dark_frac = temp_df["hourly_dark_frac"].to_numpy(dtype=float)
+    wk = (temp_df["weekday"].to_numpy() < 5) & ~temp_df["holiday"].to_numpy(dtype=bool)
+    row = hourly_fits_df.index.get_indexer(temp_df["hour_local"])
+    if (row < 0).any():
+        raise KeyError("local hour missing from hourly fits")
+
+    def coefficient(name):
+        return np.where(
+            wk,
+            hourly_fits_df[name.format("wk")].to_numpy(dtype=float)[row],
+            hourly_fits_df[name.format("wknd")].to_numpy(dtype=float)[row],
+        )
+
+    t_bpc = coefficient("t.bpc.{}.c")
+    t_bph = coefficient("t.bph.{}.c")
+    i_heat = coefficient("i.heat.{}")
+    s_heat = coefficient("s.heat.{}")
+    s_dark = coefficient("s.dark.{}")
+    i_cool = coefficient("i.cool.{}")
+    s_cool_db = coefficient("s.cool.{}.db")
+    s_cool_wb = coefficient("s.cool.{}.wb")
+
+    # float_power rounds squares like the scalar ** of temp_to_energy
+    wb_term = s_cool_wb * (
+        temp_wb
+        - (db_wb_fit[0] * np.float_power(temp, 2) + db_wb_fit[1] * temp + db_wb_fit[2])
+    )
+
+    base_eng = s_heat * t_bph + s_dark * dark_frac + i_heat
+
+    heating = temp <= t_bph
+    heat_eng = np.where(heating, -s_heat * (t_bph - temp), 0)
+
+    cool_eng = np.where(temp >= t_bph, s_cool_db * temp + wb_term + i_cool, 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mid_cool_eng = np.where(
+            (temp > t_bpc) & (temp < t_bph),
+            np.float_power((temp - t_bpc) / (t_bph - t_bpc), 2)
+            * (s_cool_db * t_bph + wb_term + i_cool),
+            0,
+        )
+
+    # max(x, 0) keeps NaN
+    cool_eng = np.where(cool_eng < 0, 0, cool_eng) + np.where(
+        mid_cool_eng < 0, 0, mid_cool_eng
+    )
+
+    return base_eng, heat_eng, cool_eng, heating
+
+
+def plot_profile(profile, actual, plot_boolean, zone_name=None, year=None):
     """Plot profile vs. actual load
 
     :param pandas.Series profile: total profile hourly load
     :param pandas.Series actual: zonal hourly load data
     :param boolean plot_boolean: whether or not create profile plots.
+    :param str zone_name: name of load zone, used in plots.
+    :param int year: profile year, used in plots.
 
     :return: (*plot*)
     """
@@ -739,7 +799,9 @@ def main(zone_name, zone_name_shp, base_year, year, plot_boolean=False):
 
     temp_df_base_year["load_mw"] = zone_load
 
-    hourly_fits_df, db_wb_fit = hourly_load_fit(temp_df_base_year, plot_boolean)
+    hourly_fits_df, db_wb_fit = hourly_load_fit(
+        temp_df_base_year, plot_boolean, zone_name, base_year
+    )
     os.makedirs(os.path.join(os.path.dirname(__file__), "dayhour_fits"), exist_ok=True)
     hourly_fits_df.to_csv(
         os.path.join(
@@ -755,20 +817,15 @@ def main(zone_name, zone_name_shp, base_year, year, plot_boolean=False):
 
     temp_df, stats = zonal_data(puma_data_zone, hours_utc, year)
 
-    energy_list = zone_profile_load_MWh.hour_utc.apply(
-        lambda x: temp_to_energy(temp_df.loc[x], hourly_fits_df, db_wb_fit)
+    base_eng, heat_eng, cool_eng, _ = hourly_energy_terms(
+        temp_df.loc[zone_profile_load_MWh.hour_utc], hourly_fits_df, db_wb_fit
     )
     (
         zone_profile_load_MWh["base_load_mw"],
         zone_profile_load_MWh["heat_load_mw"],
         zone_profile_load_MWh["cool_load_mw"],
         zone_profile_load_MWh["total_load_mw"],
-    ) = (
-        energy_list.apply(lambda x: x[0]),
-        energy_list.apply(lambda x: x[1]),
-        energy_list.apply(lambda x: x[2]),
-        energy_list.apply(lambda x: sum(x)),
-    )
+    ) = (base_eng, heat_eng, cool_eng, base_eng + heat_eng + cool_eng)
     zone_profile_load_MWh.set_index("hour_utc", inplace=True)
     os.makedirs(os.path.join(os.path.dirname(__file__), "Profiles"), exist_ok=True)
     zone_profile_load_MWh.to_csv(
@@ -787,7 +844,13 @@ def main(zone_name, zone_name_shp, base_year, year, plot_boolean=False):
         stats["avg_actual_load_mw"],
         stats["max_profile_load_mw"],
         stats["max_actual_load_mw"],
-    ) = plot_profile(zone_profile_load_MWh["total_load_mw"], zone_load, plot_boolean)
+    ) = plot_profile(
+        zone_profile_load_MWh["total_load_mw"],
+        zone_load,
+        plot_boolean,
+        zone_name,
+        year,
+    )
 
     os.makedirs(
         os.path.join(os.path.dirname(__file__), "Profiles", "Profiles_stats"),
@@ -803,15 +866,53 @@ def main(zone_name, zone_name_shp, base_year, year, plot_boolean=False):
     )
 
 
-if __name__ == "__main__":
+def _set_shapefiles(zone_shapefile, pumas_shapefile):
+    """Set the shapefiles used by :py:func:`main` in a worker process.
+
+    :param geopandas.GeoDataFrame zone_shapefile: load zone shapefile.
+    :param geopandas.GeoDataFrame pumas_shapefile: pumas shapefile.
+    """
+    global zone_shp, pumas_shp
+    zone_shp, pumas_shp = zone_shapefile, pumas_shapefile
+
+
+def run_zones(
+    zone_names, zone_name_shps, base_year, year, plot_boolean=False, max_workers=None
+):
+    """Run profile generator for several zones in a pool of processes.
+
+    :param list zone_names: names of load zones used to save profiles.
+    :param list zone_name_shps: names of load zones within shapefile.
+    :param int base_year: data fitting year.
+    :param int year: profile year to calculate.
+    :param boolean plot_boolean: whether or not create profile plots.
+    :param int max_workers: number of processes. Default to the number of CPUs.
+    """
     # Reading Balancing Authority and Pumas shapefiles for overlaying
-    zone_shp = read_shapefile(
+    zone_shapefile = read_shapefile(
         "https://besciences.blob.core.windows.net/shapefiles/USA/balancing-authorities/ba_area/ba_area.zip"
     )
-    pumas_shp = read_shapefile(
+    pumas_shapefile = read_shapefile(
         "https://besciences.blob.core.windows.net/shapefiles/USA/pumas-overlay/pumas_overlay.zip"
     )
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_set_shapefiles,
+        initargs=(zone_shapefile, pumas_shapefile),
+    ) as executor:
+        list(
+            executor.map(
+                main,
+                zone_names,
+                zone_name_shps,
+                repeat(base_year),
+                repeat(year),
+                repeat(plot_boolean),
+            )
+        )
+
 
+if __name__ == "__main__":
     # Use base_year for model fitting
     base_year = const.base_year
 
@@ -821,9 +922,7 @@ if __name__ == "__main__":
     # If produce profile plots
     plot_boolean = False
 
-    for i in range(len(zone_names)):
-        zone_name, zone_name_shp = zone_names[i], zone_name_shps[i]
-        main(zone_name, zone_name_shp, base_year, year, plot_boolean)
+    run_zones(zone_names, zone_name_shps, base_year, year, plot_boolean)
 
     # Delete the tmp folder that holds the shapefiles localy after the script is run to completion
     shutil.rmtree(os.path.join("tmp"), ignore_errors=False, onerror=None)
@@ -2,24 +2,132 @@ import numpy as np
 import pandas as pd
 
 
-def fix_dataframe_outliers(demand):
+def fix_dataframe_outliers(demand, threshold=5, report=False):
     """Make a data frame of demand with outliers replaced with values interpolated
-    from the non-outlier edge points using :py:func:`slope_interpolate`.
+    from the non-outlier edge points, as in :py:func:`slope_interpolate`. All the BA
+    columns are processed at once.
 
     :param pandas.Dataframe demand: demand data frame with UTC timestamp as indicss
         and BA name as column name.
-    :return: (*pandas.DataFrame*) -- data frame with anomalous demand values replaced
-        by interpolated values.
+    :param int/float threshold: z-score of the demand slope above which a timestamp
+        is an outlier.
+    :param bool report: whether to also return the list of repaired runs.
+    :return: (*pandas.DataFrame* or *tuple*) -- data frame with anomalous demand
+        values replaced by interpolated values. If ``report`` is True, tuple whose
+        second element is a data frame with one row per repaired run of outliers,
+        see :py:func:`find_outlier_runs`.
     """
-    demand_fix_outliers = pd.DataFrame(index=demand.index)
-    for ba in demand.columns.to_list():
-        demand_ba = demand[ba]
-        outlier_output = slope_interpolate(pd.DataFrame(demand_ba))
-        demand_fix_outliers[ba] = outlier_output[ba]
-    return demand_fix_outliers
+    values = demand.to_numpy(dtype=float)
+    _, zscore = _slope_zscore(values)
+    runs = _outlier_runs(values, zscore, threshold)
+    demand_fix_outliers = pd.DataFrame(
+        _interpolate_runs(values, runs), index=demand.index, columns=demand.columns
+    )
+    if not report:
+        return demand_fix_outliers
+    return demand_fix_outliers, _runs_to_frame(demand, zscore, runs)
+
+
+def find_outlier_runs(demand, threshold=5):
+    """Find the runs of demand outliers repaired by :py:func:`fix_dataframe_outliers`.
+
+    :param pandas.Dataframe demand: demand data frame with UTC timestamp as indices
+        and BA name as column name.
+    :param int/float threshold: z-score of the demand slope above which a timestamp
+        is an outlier.
+    :return: (*pandas.DataFrame*) -- data frame with one row per run of outliers and
+        *'ba'*, *'start'* and *'end'* (first and last outlier timestamps), *'hours'*
+        (number of hours between the edge points) and *'max_zscore'*
+        as columns. Runs longer than 4 hours should be reviewed.
+    """
+    values = demand.to_numpy(dtype=float)
+    _, zscore = _slope_zscore(values)
+    return _runs_to_frame(demand, zscore, _outlier_runs(values, zscore, threshold))
 
 
-def slope_interpolate(ba_df):
+def _slope_zscore(values):
+    """Compute the demand slope and its z-score, column by column.
+
+    :param numpy.ndarray values: demand, shape (hours, BAs).
+    :return: (*tuple*) -- slope and absolute z-score of the slope, shape (hours,
+        BAs). The first hour is NaN.
+    """
+    delta = np.full_like(values, np.nan)
+    delta[1:] = values[1:] - values[:-1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        delta_mu = np.nanmean(delta, axis=0)
+        delta_sigma = np.nanstd(delta, axis=0, ddof=1)
+        zscore = np.abs((delta - delta_mu) / delta_sigma)
+    return delta, zscore
+
+
+def _outlier_runs(values, zscore, threshold):
+    """Group outliers into runs. Consecutive outliers belong to the same run, and so
+    does an outlier following a zero demand value, with every hour in between.
+
+    :param numpy.ndarray values: demand, shape (hours, BAs).
+    :param numpy.ndarray zscore: z-score of the slope, shape (hours, BAs).
+    :param int/float threshold: z-score above which a timestamp is an outlier.
+    :return: (*tuple*) -- column, first outlier and last outlier + 1 of each run.
+    """
+    with np.errstate(invalid="ignore"):
+        column, hour = np.nonzero((zscore > threshold).T)
+    first_in_column = np.ones(len(hour), dtype=bool)
+    first_in_column[1:] = column[1:] != column[:-1]
+    consecutive = np.zeros(len(hour), dtype=bool)
+    consecutive[1:] = hour[1:] == hour[:-1] + 1
+    after_zero = values[hour - 1, column] == 0
+    new_run = first_in_column | ~(consecutive | after_zero)
+    starts = np.flatnonzero(new_run)
+    stops = np.append(starts[1:], len(hour))[: len(starts)] - 1
+    return column[starts], hour[starts], hour[stops] + 1
+
+
+def _interpolate_runs(values, runs):
+    """Replace each run by a line joining its non-outlier edge points.
+
+    :param numpy.ndarray values: demand, shape (hours, BAs).
+    :param tuple runs: runs as returned by :py:func:`_outlier_runs`.
+    :return: (*numpy.ndarray*) -- repaired demand.
+    """
+    column, hour_save, next_save = runs
+    repaired = values.copy()
+    num = next_save - hour_save
+    start = values[hour_save - 1, column]
+    dee = (values[next_save - 1, column] - start) / num
+    # Each run is written from its first to its last edge point, both included
+    length = num + 1
+    run = np.repeat(np.arange(len(num)), length)
+    step = np.arange(length.sum()) - np.repeat(np.cumsum(length) - length, length)
+    with np.errstate(invalid="ignore"):
+        repaired[hour_save[run] - 1 + step, column[run]] = start[run] + step * dee[run]
+    return repaired
+
+
+def _runs_to_frame(demand, zscore, runs):
+    """Format runs of outliers.
+
+    :param pandas.Dataframe demand: demand data frame.
+    :param numpy.ndarray zscore: z-score of the slope, shape (hours, BAs).
+    :param tuple runs: runs as returned by :py:func:`_outlier_runs`.
+    :return: (*pandas.DataFrame*) -- see :py:func:`find_outlier_runs`.
+    """
+    column, hour_save, next_save = runs
+    max_zscore = [
+        np.nanmax(zscore[h:n, c]) for c, h, n in zip(column, hour_save, next_save)
+    ]
+    return pd.DataFrame(
+        {
+            "ba": demand.columns[column],
+            "start": demand.index[hour_save],
+            "end": demand.index[next_save - 1],
+            "hours": next_save - hour_save,
+            "max_zscore": max_zscore,
+        }
+    )
+
+
+def slope_interpolate(ba_df, threshold=5):
     """Look for demand outliers by applying a z-score threshold to the demand slope.
     Loop through all the outliers detected, determine the non-outlier edge points and
     then interpolate a line joining these 2 edge points. The line value at the
@@ -27,6 +135,8 @@ def slope_interpolate(ba_df):
 
     :param pandas.DataFrame ba_df: demand data frame with UTC timestamp as indices and
         BA name as column name.
+    :param int/float threshold: z-score of the demand slope above which a timestamp
+        is an outlier.
     :return: (*pandas.DataFrame*) -- data frame indexed with anomalous demand values
         replaced by interpolated values.
 
@@ -51,62 +161,64 @@ def slope_interpolate(ba_df):
     df = ba_df.copy()
     ba_name = df.columns[0]
 
-    df["delta"] = df[ba_name].diff()
-    delta_mu = df["delta"].describe().loc["mean"]
-    delta_sigma = df["delta"].describe().loc["std"]
-    df["delta_zscore"] = np.abs((df["delta"] - delta_mu) / delta_sigma)
-
-    # Find the outliers
-    outlier_index_list = df.loc[df["delta_zscore"] > 5].index
-
-    hour_save = -1
-    for i in outlier_index_list:
-        hour_index = df.index.get_loc(i)
-        if hour_save == -1:
-            hour_save = hour_index
-            next_save = hour_index + 1
-            continue
-        if hour_index == next_save:
-            next_save = hour_index + 1
-            continue
-
-        # Check for zeros: consecutive zeros, which don't have delta_zscore
-        # exceed threshold, will get extrapolated to the next non-zero value.
-        # This is fine for, say up to 5 hours; will not be appropriate
-        # otherwise since it may not capture the periodic patterns.
-        # Print a warning
-
-        if df.iloc[hour_index - 1][ba_name] == 0:
-            next_save = hour_index + 1
-            continue
-
-        num = next_save - hour_save
-
-        if num > 4:
-            print("Too many zeros near ", i, "! Review data!")
-
-        start = df.iloc[hour_save - 1][ba_name]
-        dee = (df.iloc[next_save - 1][ba_name] - start) / num
-        for j in range(hour_save - 1, next_save):
-            save_me = df.iloc[j][ba_name]
-            df.iloc[j][ba_name] = start + (j - hour_save + 1) * dee
-            print(j, save_me, df.iloc[j][ba_name])
-        hour_save = hour_index
-        next_save = hour_index + 1
-
-    if hour_save != -1:
-        num = next_save - hour_save
-        start = df.iloc[hour_save - 1][ba_name]
-        dee = (df.iloc[next_save - 1][ba_name] - start) / num
-        for j in range(hour_save - 1, next_save):
-            save_me = df.iloc[j][ba_name]
-            df.iloc[j][ba_name] = start + (j - hour_save + 1) * dee
-            print(j, save_me, df.iloc[j][ba_name])
+    values = df[[ba_name]].to_numpy(dtype=float)
+    delta, zscore = _slope_zscore(values)
+    runs = _outlier_runs(values, zscore, threshold)
+    df[ba_name] = _interpolate_runs(values, runs)[:, 0]
+    df["delta"] = delta[:, 0]
+    df["delta_zscore"] = zscore[:, 0]
+
+    # Consecutive zeros, which don't have delta_zscore exceed threshold, get
+    # extrapolated to the next non-zero value. This is fine for, say up to 5 hours;
+    # will not be appropriate otherwise since it may not capture the periodic
+    # patterns.
+    for _, row in _runs_to_frame(df[[ba_name]], zscore, runs).iterrows():
+        if row["hours"] > 4:
+            print("Too many zeros near ", row["end"], "! Review data!")
 
     return df
 
 
-def replace_with_shifted_demand(demand, start, end):
+# Shift, in days, of the demand used to fill a missing hour: look_back1day holds the
+# demand of the day before, etc.
+shifted_demand_days = {
+    "look_back1day": 1,
+    "look_forward1day": -1,
+    "look_back2day": 2,
+    "look_forward2day": -2,
+    "look_back1week": 7,
+    "look_forward1week": -7,
+}
+
+# Dicts of weekdays. 0 = Monday, 1 = Tuesday, etc.
+# day_map: attempt to shift the data by only one day if possible
+# Do not fill in Mon-Fri with the weekend days and vice versa
+day_map = {
+    0: ["look_forward1day"],
+    1: ["look_forward1day", "look_back1day"],
+    2: ["look_forward1day", "look_back1day"],
+    3: ["look_forward1day", "look_back1day"],
+    4: ["look_back1day"],
+    5: ["look_forward1day"],
+    6: ["look_back1day"],
+}
+
+# If we are still missing data, look two days
+more_days_map = {
+    0: ["look_forward2day"],
+    1: ["look_forward2day"],
+    2: ["look_back2day", "look_forward2day"],
+    3: ["look_back2day"],
+    4: ["look_back2day"],
+    5: ["look_back1week", "look_forward1week"],
+    6: ["look_back1week", "look_forward1week"],
+}
+
+# Finally, check for data exactly one week ago / one week from date
+more_more_days_map = {day: ["look_back1week", "look_forward1week"] for day in range(7)}
+
+
+def replace_with_shifted_demand(demand, start, end, return_source=False):
     """Replace missing data within overall demand data frame with averages of nearby
     shifted demand.
 
@@ -116,93 +228,67 @@ def replace_with_shifted_demand(demand, start, end):
         of interest.
     :param pandas.Timestamp/numpy.datetime64/datetime.datetime end: end of period
         of interest.
-    :return: (*pandas.DataFrame*) -- data frame with missing demand data filled in.
+    :param bool return_source: whether to also return the shifted demand used to fill
+        each hour.
+    :return: (*pandas.DataFrame* or *tuple*) -- data frame with missing demand data
+        filled in. Hours out of the period of interest are NaN. If ``return_source``
+        is True, tuple whose second element is a data frame with the same index and
+        columns giving, for each filled hour, the '+' separated names of the shifted
+        demand averaged (e.g. *'look_back1day+look_forward1day'*), None elsewhere.
     """
+    index = demand.index.sort_values()
+    index = index[index.slice_indexer(start, end)]
 
-    # Create a data frame where each column is the same demand data,
-    # but shifted by a specific time interval
-    look_back1day = demand.shift(1, freq="D")
-    look_back2day = demand.shift(2, freq="D")
-    look_back1week = demand.shift(7, freq="D")
-    look_forward1day = demand.shift(-1, freq="D")
-    look_forward2day = demand.shift(-2, freq="D")
-    look_forward1week = demand.shift(-7, freq="D")
-
-    shifted_demand = pd.concat(
+    # Build each shifted demand once for all BAs, shape (hours, BAs)
+    names = list(shifted_demand_days)
+    shifted = np.stack(
         [
-            demand,
-            look_back1day,
-            look_forward1day,
-            look_back2day,
-            look_forward2day,
-            look_back1week,
-            look_forward1week,
-        ],
-        axis=1,
+            demand.reindex(index - pd.Timedelta(days=shifted_demand_days[n])).to_numpy(
+                dtype=float
+            )
+            for n in names
+        ]
     )
-
-    # Include only the dates we care about
-    shifted_demand = shifted_demand.loc[start:end]
-    shifted_demand["dayofweek"] = shifted_demand.index.dayofweek
-    column_names = [
-        "look_back1day",
-        "look_forward1day",
-        "look_back2day",
-        "look_forward2day",
-        "look_back1week",
-        "look_forward1week",
-        "dayofweek",
-    ]
-
-    # Dicts of weekdays. 0 = Monday, 1 = Tuesday, etc.
-    # day_map: attempt to shift the data by only one day if possible
-    # Do not fill in Mon-Fri with the weekend days and vice versa
-    day_map = {
-        0: ["look_forward1day"],
-        1: ["look_forward1day", "look_back1day"],
-        2: ["look_forward1day", "look_back1day"],
-        3: ["look_forward1day", "look_back1day"],
-        4: ["look_back1day"],
-        5: ["look_forward1day"],
-        6: ["look_back1day"],
-    }
-
-    # If we are still missing data, look two days
-    more_days_map = {
-        0: ["look_forward2day"],
-        1: ["look_forward2day"],
-        2: ["look_back2day", "look_forward2day"],
-        3: ["look_back2day"],
-        4: ["look_back2day"],
-        5: ["look_back1week", "look_forward1week"],
-        6: ["look_back1week", "look_forward1week"],
-    }
-
-    # Finally, check for data exactly one week ago / one week from date
-    more_more_days_map = {
-        0: ["look_back1week", "look_forward1week"],
-        1: ["look_back1week", "look_forward1week"],
-        2: ["look_back1week", "look_forward1week"],
-        3: ["look_back1week", "look_forward1week"],
-        4: ["look_back1week", "look_forward1week"],
-        5: ["look_back1week", "look_forward1week"],
-        6: ["look_back1week", "look_forward1week"],
-    }
+    available = ~np.isnan(shifted)
+    filled = demand.reindex(index).to_numpy(dtype=float)
+    source = np.zeros(filled.shape, dtype=np.int64)
 
     # Attempt to shift demand data,
     # getting progressively more aggressive if necessary
-    filled_demand = pd.DataFrame(index=demand.index)
-    for ba_name in demand.columns:
-        shifted_demand_ba = shifted_demand.loc[:, [ba_name, "dayofweek"]]
-        shifted_demand_ba.columns = [ba_name] + column_names
-        shifted_demand_ba[ba_name] = fill_ba_demand(shifted_demand_ba, ba_name, day_map)
-        shifted_demand_ba[ba_name] = fill_ba_demand(
-            shifted_demand_ba, ba_name, more_days_map
-        )
-        filled_demand[ba_name] = fill_ba_demand(
-            shifted_demand_ba, ba_name, more_more_days_map
-        )
-    return filled_demand
+    dayofweek = index.dayofweek.to_numpy()
+    for fill_map in [day_map, more_days_map, more_more_days_map]:
+        missing = np.isnan(filled)
+        total = np.zeros(filled.shape)
+        count = np.zeros(filled.shape, dtype=np.int64)
+        used = np.zeros(filled.shape, dtype=np.int64)
+        for i, n in enumerate(names):
+            days = [d for d, shifts in fill_map.items() if n in shifts]
+            contributes = np.isin(dayofweek, days)[:, None] & available[i]
+            total += np.where(contributes, shifted[i], 0)
+            count += contributes
+            used |= contributes.astype(np.int64) << i
+        fill = missing & (count > 0)
+        filled[fill] = total[fill] / count[fill]
+        source[fill] = used[fill]
+
+    filled_demand = pd.DataFrame(filled, index=index, columns=demand.columns).reindex(
+        demand.index
+    )
+    if not return_source:
+        return filled_demand
+
+    labels = np.array(
+        [None]
+        + [
+            "+".join(n for i, n in enumerate(names) if code >> i & 1)
+            for code in range(1, 1 << len(names))
+        ],
+        dtype=object,
+    )
+    fill_source = pd.DataFrame(
+        labels[source], index=index, columns=demand.columns
+    ).reindex(demand.index)
+    return filled_demand, fill_source.where(fill_source.notna(), None)
 
 
 def fill_ba_demand(df_ba, ba_name, day_map):
@@ -0,0 +1,255 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+def _to_utc(timestamps):
+    """Convert timestamps to UTC, naive timestamps being assumed to be in UTC.
+
+    :param pandas.DatetimeIndex/pandas.Timestamp timestamps: timestamps.
+    :return: (*pandas.DatetimeIndex/pandas.Timestamp*) -- UTC timestamps.
+    """
+    if timestamps.tz is None:
+        return timestamps.tz_localize("UTC")
+    return timestamps.tz_convert("UTC")
+
+
+def _year_start(year):
+    return pd.Timestamp(year=year, month=1, day=1, tz="UTC")
+
+
+def _hours_in_year(year):
+    return (_year_start(year + 1) - _year_start(year)) // pd.Timedelta(hours=1)
+
+
+def _write_json(path, obj):
+    """Save an object to a JSON file, atomically.
+
+    :param str path: path of the file.
+    :param object obj: JSON serializable object.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp_path, path)
+
+
+class DemandStore:
+    """Local store of hourly demand partitioned by BA and year. Each partition is a
+    numpy file holding the demand of every hour of the year in UTC, NaN when missing,
+    so that readers only memory-map the BAs and years they need.
+
+    :param str root: directory of the store, created on first write.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, ba, year):
+        return os.path.join(self.root, ba, f"{year}.npy")
+
+    def bas(self):
+        """List the BAs in the store.
+
+        :return: (*list*) -- BA names.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            ba
+            for ba in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, ba))
+        )
+
+    def years(self, ba):
+        """List the years stored for a BA.
+
+        :param str ba: BA name.
+        :return: (*list*) -- years, in chronological order.
+        """
+        directory = os.path.join(self.root, ba)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            int(f[: -len(".npy")])
+            for f in os.listdir(directory)
+            if f.endswith(".npy") and f[: -len(".npy")].isdigit()
+        )
+
+    def __contains__(self, ba):
+        return len(self.years(ba)) > 0
+
+    def last_timestamp(self, ba):
+        """Find the last hour with demand data for a BA.
+
+        :param str ba: BA name.
+        :return: (*pandas.Timestamp*) -- UTC timestamp, None if the BA has no data.
+        """
+        for year in reversed(self.years(ba)):
+            values = np.load(self._path(ba, year), mmap_mode="r")
+            available = np.flatnonzero(~np.isnan(values))
+            if len(available) > 0:
+                return _year_start(year) + pd.Timedelta(hours=int(available[-1]))
+        return None
+
+    def _coverage_path(self, ba):
+        return os.path.join(self.root, ba, "coverage.json")
+
+    def coverage(self, ba):
+        """List the periods covered by the store for a BA. A period is covered once
+        written by :meth:`write`, from the first to the last hour with demand of the
+        written data, hours without demand in between being gaps of the source.
+
+        :param str ba: BA name.
+        :return: (*list*) -- disjoint periods in chronological order, each one a
+            tuple of its first and last UTC timestamps (*pandas.Timestamp*).
+        """
+        path = self._coverage_path(ba)
+        if not os.path.isfile(path):
+            return []
+        with open(path) as f:
+            return [(pd.Timestamp(a), pd.Timestamp(b)) for a, b in json.load(f)]
+
+    def _add_coverage(self, ba, first, last):
+        periods = []
+        for a, b in sorted(self.coverage(ba) + [(first, last)]):
+            if periods and a <= periods[-1][1] + pd.Timedelta(hours=1):
+                periods[-1] = (periods[-1][0], max(periods[-1][1], b))
+            else:
+                periods.append((a, b))
+        _write_json(
+            self._coverage_path(ba),
+            [[a.isoformat(), b.isoformat()] for a, b in periods],
+        )
+
+    def missing_from(self, ba, start, end):
+        """Find the first hour of a period not covered by the store for a BA, see
+        :meth:`coverage`.
+
+        :param str ba: BA name.
+        :param pandas.Timestamp/numpy.datetime64/datetime.datetime start: first
+            hour, assumed to be in UTC if naive.
+        :param pandas.Timestamp/numpy.datetime64/datetime.datetime end: last hour,
+            assumed to be in UTC if naive.
+        :return: (*pandas.Timestamp*) -- UTC timestamp, None if the store covers the
+            period.
+        """
+        start, end = _to_utc(pd.Timestamp(start)), _to_utc(pd.Timestamp(end))
+        for first, last in self.coverage(ba):
+            if start > end:
+                return None
+            if last < start:
+                continue
+            if first > start:
+                return start
+            start = last + pd.Timedelta(hours=1)
+        return start if start <= end else None
+
+    def _sources_path(self, ba):
+        return os.path.join(self.root, ba, "sources.json")
+
+    def source_version(self, ba, source):
+        """Get the version of a source recorded by :meth:`record_source`.
+
+        :param str ba: BA name.
+        :param str source: name of the source, e.g. a file path.
+        :return: (*object*) -- recorded version, None if the source is not recorded.
+        """
+        path = self._sources_path(ba)
+        if not os.path.isfile(path):
+            return None
+        with open(path) as f:
+            return json.load(f).get(source)
+
+    def record_source(self, ba, source, version):
+        """Record that all the demand of a BA held by a source has been added, so
+        that the source is not read again while its version is unchanged.
+
+        :param str ba: BA name.
+        :param str source: name of the source, e.g. a file path.
+        :param object version: JSON serializable version of the source, e.g. its
+            modification time.
+        """
+        path = self._sources_path(ba)
+        sources = {}
+        if os.path.isfile(path):
+            with open(path) as f:
+                sources = json.load(f)
+        sources[source] = version
+        _write_json(path, sources)
+
+    def write(self, demand):
+        """Add demand to the store. Existing values are overwritten by the non-NaN
+        values of ``demand`` and kept elsewhere. The hours from the first to the last
+        non-NaN value of each BA are added to its coverage, see :meth:`coverage`.
+
+        :param pandas.DataFrame demand: hourly demand with timestamps as indices,
+            naive ones being assumed to be in UTC, and BA names as columns.
+        """
+        index = _to_utc(pd.DatetimeIndex(demand.index))
+        values = demand.to_numpy(dtype=float)[index.notna()]
+        index = index[index.notna()]
+        year = index.year.to_numpy()
+        for y in np.unique(year).tolist():
+            rows = np.flatnonzero(year == y)
+            hour = (index[rows] - _year_start(y)) // pd.Timedelta(hours=1)
+            for j, ba in enumerate(demand.columns):
+                new = values[rows, j]
+                given = ~np.isnan(new)
+                if not given.any():
+                    continue
+                path = self._path(ba, y)
+                if os.path.isfile(path):
+                    stored = np.load(path)
+                else:
+                    stored = np.full(_hours_in_year(y), np.nan)
+                stored[hour[given]] = new[given]
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(
+                    dir=os.path.dirname(path), suffix=".tmp"
+                )
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, stored)
+                os.replace(tmp_path, path)
+        for j, ba in enumerate(demand.columns):
+            given = ~np.isnan(values[:, j])
+            if given.any():
+                self._add_coverage(ba, index[given].min(), index[given].max())
+
+    def read(self, start, end, bas=None):
+        """Read the demand of some BAs over a period.
+
+        :param pandas.Timestamp/numpy.datetime64/datetime.datetime start: first
+            hour, assumed to be in UTC if naive.
+        :param pandas.Timestamp/numpy.datetime64/datetime.datetime end: last hour,
+            assumed to be in UTC if naive.
+        :param list bas: BA names. Default to all the BAs in the store.
+        :return: (*pandas.DataFrame*) -- hourly demand with UTC timestamps as
+            indices and BA names as columns, NaN when missing.
+        """
+        index = pd.date_range(
+            _to_utc(pd.Timestamp(start)), _to_utc(pd.Timestamp(end)), freq="H"
+        )
+        bas = self.bas() if bas is None else list(bas)
+        demand = np.full((len(index), len(bas)), np.nan)
+        if len(index) == 0:
+            return pd.DataFrame(demand, index=index, columns=bas)
+
+        first = index[0]
+        for y in range(index[0].year, index[-1].year + 1):
+            # Rows of the output and hours of the year covered by the partition
+            lo = max(first, _year_start(y))
+            hi = min(index[-1], _year_start(y + 1) - pd.Timedelta(hours=1))
+            row = (lo - first) // pd.Timedelta(hours=1)
+            hour = (lo - _year_start(y)) // pd.Timedelta(hours=1)
+            n = (hi - lo) // pd.Timedelta(hours=1) + 1
+            for j, ba in enumerate(bas):
+                path = self._path(ba, y)
+                if os.path.isfile(path):
+                    values = np.load(path, mmap_mode="r")
+                    demand[row : row + n, j] = values[hour : hour + n]
+        return pd.DataFrame(demand, index=index, columns=bas)
@@ -1,13 +1,25 @@
-import json
 import os
-from urllib.error import HTTPError, URLError
-from urllib.request import urlopen
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
+import requests
 from pandas.tseries.offsets import DateOffset
 
+from prereise.gather.request_util import TransientError, retry
 
-def from_download(tok, start_date, end_date, offset_days, series_list):
+
+def from_download(
+    tok,
+    start_date,
+    end_date,
+    offset_days,
+    series_list,
+    cache_dir=None,
+    max_workers=8,
+    store=None,
+):
     """Download and assemble dataset of demand data per balancing authority for desired
     date range.
 
@@ -17,6 +29,14 @@ def from_download(tok, start_date, end_date, offset_days, series_list):
     :param list series_list: list of demand series names provided by EIA, e.g.,
         ['EBA.AVA-ALL.D.H', 'EBA.AZPS-ALL.D.H'].
     :param int offset_days: number of business days for data to stabilize.
+    :param str cache_dir: directory where the series are cached, see
+        :func:`download_series`.
+    :param int max_workers: number of series downloaded concurrently.
+    :param prereise.gather.demanddata.eia.demand_store.DemandStore store: local
+        demand store. If given, series are only downloaded from the first hour the
+        store misses, see
+        :meth:`prereise.gather.demanddata.eia.demand_store.DemandStore.missing_from`,
+        they are added to the store and the data frame is read from the store.
     :return: (*pandas.DataFrame*) -- data frame with UTC timestamp as indices and
         BA series name as column names.
     """
@@ -26,18 +46,143 @@ def from_download(tok, start_date, end_date, offset_days, series_list):
     )
     df_all = pd.DataFrame(index=timespan)
 
-    for ba in series_list:
-        print("Downloading", ba)
-        d = EIAgov(tok, [ba])
-        df = d.get_data()
-        if df is not None:
-            df.index = pd.to_datetime(df["Date"])
-            df.drop(columns=["Date"], inplace=True)
-            df_all = pd.concat([df_all, df], axis=1)
-    return df_all
+    if store is None:
+        series = download_series(
+            tok, series_list, cache_dir=cache_dir, max_workers=max_workers
+        )
+        return pd.concat(
+            [df_all] + [s for s in series.values() if s is not None], axis=1
+        )
+
+    start = {s: store.missing_from(s, timespan[0], timespan[-1]) for s in series_list}
+    outdated = [s for s in series_list if start[s] is not None]
+    series = download_series(
+        tok, outdated, cache_dir=cache_dir, max_workers=max_workers, start=start
+    )
+    downloaded = [s for s in series.values() if s is not None]
+    if downloaded:
+        store.write(pd.concat(downloaded, axis=1))
+    return store.read(timespan[0], timespan[-1], [s for s in series_list if s in store])
+
+
+def parse_series(jso):
+    """Convert the response of the EIA series API into a series.
+
+    :param dict jso: decoded JSON response.
+    :return: (*pandas.Series*) -- values indexed by UTC timestamps in chronological
+        order and named after the series id. None if the series is not found or
+        empty.
+    """
+    series_id = jso.get("request", {}).get("series_id")
+    if "data" in jso.keys() and "error" in jso["data"].keys():
+        e = jso["data"]["error"]
+        print(f"ERROR: {series_id} not found. {e}")
+        return None
+    if len(jso["series"]) == 0:
+        print(f"ERROR: {series_id} was found but has no data")
+        return None
+
+    series = jso["series"][0]
+    data = np.array(series["data"], dtype=object).reshape(-1, 2)
+    index = pd.to_datetime(data[:, 0].astype(str), utc=True)
+    values = data[:, 1].astype(float)
+    order = np.argsort(index.asi8, kind="stable")
+    return pd.Series(values[order], index=index[order], name=series["series_id"])
+
+
+def _cache_path(cache_dir, series_id):
+    return os.path.join(cache_dir, f"{series_id}.csv")
+
+
+def _read_cache(cache_dir, series_id):
+    """Load a series saved by :func:`_write_cache`.
+
+    :param str cache_dir: cache directory.
+    :param str series_id: id of the series.
+    :return: (*pandas.Series*) -- cached series, None if not cached.
+    """
+    path = _cache_path(cache_dir, series_id)
+    if not os.path.isfile(path):
+        return None
+    cached = pd.read_csv(path, index_col=0).iloc[:, 0]
+    cached.index = pd.to_datetime(cached.index, utc=True)
+    return cached.rename(series_id)
+
 
+def _write_cache(cache_dir, series):
+    """Save a series to the cache directory, atomically.
 
-def from_excel(directory, series_list, start_date, end_date):
+    :param str cache_dir: cache directory.
+    :param pandas.Series series: series named after its id.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(cache_dir, series.name)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "w", newline="") as f:
+        series.rename_axis("Date").to_csv(f, date_format="%Y-%m-%dT%H:%M:%SZ")
+    os.replace(tmp_path, path)
+
+
+def download_series(
+    tok, series_list, cache_dir=None, max_workers=8, session=None, start=None
+):
+    """Download EIA series concurrently through a pool of keep-alive connections.
+
+    :param str tok: token obtained by registering with EIA.
+    :param list series_list: list of series names provided by EIA, e.g.,
+        ['EBA.AVA-ALL.D.H', 'EBA.AZPS-ALL.D.H'].
+    :param str cache_dir: directory where each series is saved as a csv file. If a
+        series is cached, only the values from its last cached timestamp onwards are
+        requested and merged with the cached values, the downloaded ones taking
+        precedence. If None, nothing is cached.
+    :param int max_workers: number of series downloaded concurrently.
+    :param requests.Session session: session used to send the requests. If None, a
+        session pooling ``max_workers`` connections is created and closed once the
+        series are downloaded.
+    :param dict start: first timestamp to download, by series name. Cached series
+        are downloaded from their last cached timestamp, or from ``start`` if it
+        precedes their first cached timestamp. Series missing from the dict, or
+        mapped to None, are downloaded in full when they are not cached.
+    :return: (*dict*) -- series name as keys, *pandas.Series* of values indexed by
+        UTC timestamps as values. Values are None for series that are not found.
+    """
+    owned = session is None
+    if owned:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=max_workers
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    client = EIAgov(tok, series_list, session=session)
+
+    def fetch(series_id):
+        cached = None if cache_dir is None else _read_cache(cache_dir, series_id)
+        start_ts = (start or {}).get(series_id)
+        if cached is not None and not cached.empty:
+            if start_ts is None or start_ts >= cached.index[0]:
+                start_ts = cached.index[-1]
+        print("Downloading", series_id, "" if start_ts is None else f"from {start_ts}")
+        jso = client.raw(series_id, start=start_ts)
+        downloaded = None if jso is None else parse_series(jso)
+        if downloaded is None:
+            return cached
+        downloaded = downloaded.rename(series_id)
+        if cached is not None:
+            downloaded = downloaded.combine_first(cached)
+        if cache_dir is not None:
+            _write_cache(cache_dir, downloaded)
+        return downloaded
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(series_list, executor.map(fetch, series_list)))
+    finally:
+        if owned:
+            session.close()
+
+
+def from_excel(directory, series_list, start_date, end_date, store=None):
     """Assemble EIA balancing authority (BA) data from pre-downloaded Excel
     spreadsheets. The spreadsheets contain data from July 2015 to present.
 
@@ -45,29 +190,58 @@ def from_excel(directory, series_list, start_date, end_date):
     :param list series_list: list of BA initials, e.g., ['PSE',BPAT','CISO'].
     :param datetime.datetime start_date: desired start of dataset.
     :param datetime.datetime end_date: desired end of dataset.
+    :param prereise.gather.demanddata.eia.demand_store.DemandStore store: local
+        demand store. If given, a spreadsheet is only read if the store doesn't cover
+        the period for its BA and the spreadsheet has changed since it was last
+        added. Its data are added to the store and the data frame is read from the
+        store, with NaN for the missing hours.
     :return: (*pandas.DataFrame*) -- data frame with UTC timestamp as indices and
         BA series name as column names.
     """
+    if store is not None:
+        for ba in series_list:
+            if store.missing_from(ba, start_date, end_date) is None:
+                continue
+            filename = os.path.abspath(os.path.join(directory, ba + ".xlsx"))
+            mtime = os.path.getmtime(filename)
+            if store.source_version(ba, filename) != mtime:
+                store.write(_read_excel(directory, ba))
+                store.record_source(ba, filename, mtime)
+        df_all = store.read(start_date, end_date, series_list)
+        if pd.Timestamp(start_date).tz is None:
+            df_all.index = df_all.index.tz_localize(None)
+        return df_all
+
     timespan = pd.date_range(start_date, end_date, freq="H")
     df_all = pd.DataFrame(index=timespan)
 
     for ba in series_list:
-        print(ba)
-        filename = ba + ".xlsx"
-        df = pd.read_excel(
-            io=os.path.join(directory, filename), header=0, usecols="B,U"
-        )
-        df.index = pd.to_datetime(df["UTC Time"])
-        # Fill missing times
-        df = df.resample("H").asfreq()
-        df.drop(columns=["UTC Time"], inplace=True)
-        df.rename(columns={"Published D": ba}, inplace=True)
+        df = _read_excel(directory, ba)
         df_all = pd.concat([df_all, df], join="inner", axis=1)
 
     return df_all
 
 
-def get_ba_demand(ba_code_list, start_date, end_date, api_key):
+def _read_excel(directory, ba):
+    """Read the demand of a BA from a pre-downloaded Excel spreadsheet.
+
+    :param str directory: location of Excel files.
+    :param str ba: BA initials.
+    :return: (*pandas.DataFrame*) -- hourly demand with UTC timestamp as indices and
+        BA initials as column name.
+    """
+    print(ba)
+    filename = ba + ".xlsx"
+    df = pd.read_excel(io=os.path.join(directory, filename), header=0, usecols="B,U")
+    df.index = pd.to_datetime(df["UTC Time"])
+    # Fill missing times
+    df = df.resample("H").asfreq()
+    df.drop(columns=["UTC Time"], inplace=True)
+    df.rename(columns={"Published D": ba}, inplace=True)
+    return df
+
+
+def get_ba_demand(ba_code_list, start_date, end_date, api_key, store=None):
     """Download the demand between two dates for a list of balancing authorities.
 
     :param pandas.DataFrame ba_code_list: List of BAs to download from eia.
@@ -76,11 +250,18 @@ def get_ba_demand(ba_code_list, start_date, end_date, api_key):
     :param pandas.Timestamp/numpy.datetime64/datetime.datetime end_date: end bound for
         the demand data frame.
     :param string api_key: api key to fetch data.
+    :param prereise.gather.demanddata.eia.demand_store.DemandStore store: local
+        demand store, see :func:`from_download`.
     :return: (*pandas.DataFrame*) -- data frame with columns of demand by BA.
     """
     series_list = [f"EBA.{ba}-ALL.D.H" for ba in ba_code_list]
     df = from_download(
-        api_key, start_date, end_date, offset_days=0, series_list=series_list
+        api_key,
+        start_date,
+        end_date,
+        offset_days=0,
+        series_list=series_list,
+        store=store,
     )
     df.columns = [ba.replace("EBA.", "").replace("-ALL.D.H", "") for ba in df.columns]
     return df
@@ -92,74 +273,72 @@ class EIAgov(object):
 
     :param str token: EIA token.
     :param list series: id code(s) of the series to be downloaded.
+    :param requests.Session session: session used to send the requests. If None,
+        a new session is created.
     """
 
-    def __init__(self, token, series):
+    base_url = "http://api.eia.gov/series/"
+
+    def __init__(self, token, series, session=None):
         self.token = token
         self.series = series
+        self.session = requests.Session() if session is None else session
 
-    def raw(self, ser):
+    def raw(self, ser, start=None):
         """Download json files from EIA.
 
         :param str ser: list of file names.
-        :raises keyError: when URL or file are either not found or not valid.
+        :param pandas.Timestamp start: first timestamp to download. If None, the
+            whole series is downloaded.
+        :return: (*dict*) -- decoded JSON response, None if the request failed.
         """
-
-        url = (
-            "http://api.eia.gov/series/?api_key="
-            + self.token
-            + "&series_id="
-            + ser.upper()
+        params = {"api_key": self.token, "series_id": ser.upper()}
+        if start is not None:
+            params["start"] = pd.Timestamp(start).strftime("%Y%m%dT%HZ")
+
+        @retry(
+            max_attempts=3,
+            raises=True,
+            allowed_exceptions=(
+                TransientError,
+                requests.ConnectionError,
+                requests.Timeout,
+            ),
+            backoff=1,
         )
+        def get():
+            response = self.session.get(self.base_url, params=params, timeout=60)
+            if response.status_code == 429 or response.status_code >= 500:
+                raise TransientError(f"{response.status_code} for url: {response.url}")
+            response.raise_for_status()
+            return response.json()
 
         try:
-            response = urlopen(url)
-            raw_byte = response.read()
-            raw_string = str(raw_byte, "utf-8-sig")
-            jso = json.loads(raw_string)
-            return jso
+            return get()
 
-        except HTTPError as e:
+        except requests.HTTPError as e:
             print("HTTP error type.")
-            print("Error code: ", e.code)
+            print("Error code: ", e.response.status_code)
 
-        except URLError as e:
+        except (requests.RequestException, TransientError) as e:
             print("URL type error.")
-            print("Reason: ", e.reason)
+            print("Reason: ", e)
 
     def get_data(self):
         """Convert json files into data frame.
 
-        :return: (*pandas.DataFrame*) -- data frame.
+        :return: (*pandas.DataFrame*) -- data frame with the timestamps of the first
+            series in a *'Date'* column and one column per series.
         """
-
-        date_ = self.raw(self.series[0])
-
-        if "data" in date_.keys() and "error" in date_["data"].keys():
-            e = date_["data"]["error"]
-            print(f"ERROR: {self.series[0]} not found. {e}")
-            return None
-        if len(date_["series"]) == 0:
-            print(f"ERROR: {self.series[0]} was found but has no data")
-            return None
-
-        date_series = date_["series"][0]["data"]
-        endi = len(date_series)
-        date = []
-        for i in range(endi):
-            date.append(date_series[i][0])
-
-        df = pd.DataFrame(data=date)
-        df.columns = ["Date"]
-
-        lenj = len(self.series)
-        for j in range(lenj):
-            data_ = self.raw(self.series[j])
-            data_series = data_["series"][0]["data"]
-            data = []
-            endk = len(date_series)
-            for k in range(endk):
-                data.append(data_series[k][1])
-            df[self.series[j]] = data
-
-        return df
+        series = []
+        for ser in self.series:
+            jso = self.raw(ser)
+            s = None if jso is None else parse_series(jso)
+            if s is None:
+                if not series:
+                    return None
+                s = pd.Series(dtype=float)
+            series.append(s.rename(ser))
+
+        df = pd.concat(series, axis=1).reindex(series[0].index)
+        return df.rename_axis("Date").reset_index()
@@ -5,9 +5,15 @@ import os
 import pandas as pd
 import requests
 from powersimdata.utility.distance import find_closest_neighbor
+from scipy import sparse
 from tqdm import tqdm
 
 import prereise
+from prereise.gather.county_lookup import (
+    default_county_shapefile,
+    find_counties,
+    read_counties,
+)
 
 
 def aggregate_ba_demand(demand, mapping):
@@ -37,86 +43,146 @@ def aggregate_ba_demand(demand, mapping):
     return agg_demand
 
 
-def get_demand_in_loadzone(agg_demand, bus_map):
+def get_ba_zone_weights(bus_map):
+    """Get the share of the demand of each BA region allocated to each load zone,
+    using real power demand weighting. The weights can be reused to disaggregate
+    several demand profiles with the same bus map.
+
+    :param pandas.DataFrame bus_map: data frame with *'BA'*, *'zone_name'* and
+        *'Pd'* as columns.
+    :return: (*pandas.DataFrame*) -- sparse data frame of weights, with BA regions as
+        index and load zones as columns.
+    """
+    ba_agg = bus_map[["BA", "Pd"]].groupby("BA").sum().rename(columns={"Pd": "PdTotal"})
+
+    ba_scaling_factor = bus_map.merge(ba_agg, left_on="BA", right_on="BA")
+    ba_scaling_factor = ba_scaling_factor.assign(
+        zone_scaling=lambda x: x["Pd"] / x["PdTotal"]
+    )
+    zone_scaling = ba_scaling_factor.groupby(["BA", "zone_name"])["zone_scaling"].sum()
+
+    ba_codes, ba_names = pd.factorize(zone_scaling.index.get_level_values("BA"))
+    zone_codes, zone_names = pd.factorize(
+        zone_scaling.index.get_level_values("zone_name")
+    )
+    weights = sparse.csc_matrix(
+        (zone_scaling.to_numpy(dtype=float), (ba_codes, zone_codes)),
+        shape=(len(ba_names), len(zone_names)),
+    )
+    return pd.DataFrame.sparse.from_spmatrix(
+        weights, index=ba_names, columns=zone_names
+    )
+
+
+def get_demand_in_loadzone(agg_demand, bus_map=None, weights=None):
     """Get demand in loadzones from aggregated demand of BA regions.
 
     :param pandas.DataFrame agg_demand: demand profiles as returned by
         :py:func:`aggregate_ba_demand`
     :param pandas.DataFrame bus_map: data frame used to map BA regions to
         load zones using real power demand weighting.
+    :param pandas.DataFrame weights: weights as returned by
+        :py:func:`get_ba_zone_weights`, used instead of ``bus_map``.
     :return: (*pandas.DataFrame*) -- data frame with demand columns according
         to load zone.
+    :raises ValueError: if neither or both of ``bus_map`` and ``weights`` are given.
     """
-    ba_agg = bus_map[["BA", "Pd"]].groupby("BA").sum().rename(columns={"Pd": "PdTotal"})
-
-    ba_scaling_factor = bus_map.merge(ba_agg, left_on="BA", right_on="BA")
-    ba_scaling_factor = ba_scaling_factor.assign(
-        zone_scaling=lambda x: x["Pd"] / x["PdTotal"]
+    if (bus_map is None) == (weights is None):
+        raise ValueError("Either bus_map or weights must be given")
+    if weights is None:
+        weights = get_ba_zone_weights(bus_map)
+    demand = agg_demand[weights.index].to_numpy(dtype=float)
+    # Zones x BA sparse matrix applied to the BA x hours demand matrix
+    zone_demand = weights.sparse.to_coo().T.tocsr() @ demand.T
+    return pd.DataFrame(
+        zone_demand.T, index=agg_demand.index, columns=weights.columns.copy()
     )
-    ba_grouped_scaling = ba_scaling_factor.groupby(["BA", "zone_name"]).sum()
-
-    zone_demand = pd.DataFrame(index=agg_demand.index)
-    for ba_name in ba_grouped_scaling.index.unique(level="BA").to_list():
-        zone_scaling_df = ba_grouped_scaling.loc[ba_name]
-        for zone_name in zone_scaling_df.index.get_level_values(0).to_list():
-            if zone_name in zone_demand.columns.to_list():
-                zone_demand[zone_name] += (
-                    zone_scaling_df.loc[zone_name, "zone_scaling"] * agg_demand[ba_name]
-                )
-            else:
-                zone_demand[zone_name] = (
-                    zone_scaling_df.loc[zone_name, "zone_scaling"] * agg_demand[ba_name]
-                )
-    return zone_demand
-
-
-def map_buses_to_county(bus_county_map):
+
+
+def _get_county_from_api(lat, lon):
+    """Find the county of a point with the FCC census API.
+
+    :param float lat: latitude.
+    :param float lon: longitude.
+    :return: (*str*) -- county name and state abbreviation joined by a double
+        underscore, or None if no county matches.
+    """
+    # api-endpoint
+    url = "https://geo.fcc.gov/api/census/block/find"
+    # defining a params dict for the parameters to be sent to the API
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "format": "json",
+        "showall": True,
+    }
+    # sending get request and saving the response as response object
+    r = requests.get(url=url, params=params).json()
+    try:
+        return r["County"]["name"] + "__" + r["State"]["code"]
+    except TypeError:
+        return None
+
+
+def map_buses_to_county(bus_county_map, county_shapefile=None, api_fallback=True):
     """Find the county in the U.S. territory that each bus in the query grid
-    belongs to.
+    belongs to. Buses are first located in the county boundaries of a shapefile,
+    all at once, and only the buses left unmatched are looked up with the FCC
+    census API.
 
     :param pandas.DataFrame bus_county_map: data frame contains a list of
         entries with lat and long.
+    :param str county_shapefile: path to the county shapefile, see
+        :func:`prereise.gather.county_lookup.read_counties`. If None, the default
+        county shapefile is used when present, otherwise all buses are looked up
+        with the API.
+    :param bool api_fallback: look up the buses not matched with the shapefile with
+        the API.
     :return: (*tuple*) -- first element is a data frame of counties that buses
         locate. Second element is a list of bus indices that no county matches.
     """
-
-    # api-endpoint
-    url = "https://geo.fcc.gov/api/census/block/find"
-    # defining a params dict for the parameters to be sent to the API
-
     bus_county_map.loc[:, "County"] = None
     bus_county_map.loc[:, "BA"] = None
+
+    if county_shapefile is not None or os.path.isfile(default_county_shapefile):
+        counties = read_counties(county_shapefile)
+        found = find_counties(bus_county_map["lat"], bus_county_map["lon"], counties)
+        matched = found["county"].notna().to_numpy()
+        bus_county_map.loc[matched, "County"] = (
+            found.loc[matched, "county"] + "__" + found.loc[matched, "state"]
+        ).to_numpy()
+        print(f"{matched.sum()} out of {len(matched)} buses located with shapefile")
+
     bus_no_county_match = []
-    for index, row in tqdm(bus_county_map.iterrows(), total=len(bus_county_map)):
-        params = {
-            "latitude": row["lat"],
-            "longitude": row["lon"],
-            "format": "json",
-            "showall": True,
-        }
-        # sending get request and saving the response as response object
-        r = requests.get(url=url, params=params).json()
-        try:
-            county_name = r["County"]["name"] + "__" + r["State"]["code"]
-            bus_county_map.loc[index, "County"] = county_name
-        except TypeError:
+    unmatched = bus_county_map.index[bus_county_map["County"].isna()]
+    if not api_fallback:
+        return bus_county_map, unmatched.tolist()
+    for index in tqdm(unmatched, total=len(unmatched)):
+        county_name = _get_county_from_api(
+            bus_county_map.loc[index, "lat"], bus_county_map.loc[index, "lon"]
+        )
+        if county_name is None:
             bus_no_county_match.append(index)
+        else:
+            bus_county_map.loc[index, "County"] = county_name
     return bus_county_map, bus_no_county_match
 
 
-def map_buses_to_ba(bus_df):
+def map_buses_to_ba(bus_df, county_shapefile=None):
     """Find the Balancing Authority in the U.S. territory that each query bus belongs to
     based on GIS information.
 
     :param (*pandas.DataFrame*) bus_df: data frame contains a list of entries with
         lat and long of buses.
+    :param str county_shapefile: path to the county shapefile, see
+        :func:`map_buses_to_county`.
     :return: (*tuple*) -- the first entry is the input data frame with two columns,
         "County" and "BA", added for each bus and the second entry is the list of bus
         indices that no county matches based on Census API (counties of such buses are
         assigned based on its nearest neighbour).
     """
 
-    bus_ba_map, bus_no_county_match = map_buses_to_county(bus_df)
+    bus_ba_map, bus_no_county_match = map_buses_to_county(bus_df, county_shapefile)
     # hard coded fix for county name mismatch between the returns from census API and
     # BA_County_map.json
     bus_ba_map.County.replace(
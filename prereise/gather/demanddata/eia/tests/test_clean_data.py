@@ -3,7 +3,13 @@ from random import random
 import numpy as np
 import pandas as pd
 
-from prereise.gather.demanddata.eia.clean_data import slope_interpolate
+from prereise.gather.demanddata.eia.clean_data import (
+    fill_ba_demand,
+    find_outlier_runs,
+    fix_dataframe_outliers,
+    replace_with_shifted_demand,
+    slope_interpolate,
+)
 
 
 def test_slope_interpolate():
@@ -20,3 +26,131 @@ def test_slope_interpolate():
 
     assert r_dict[4] == (r_dict[3] + r_dict[5]) / 2
     assert r_dict[100] == (r_dict[99] + r_dict[101]) / 2
+
+
+def _demand_with_outliers():
+    t = np.arange(500)
+    index = pd.date_range("2020-01-01", periods=len(t), freq="H", tz="UTC")
+    demand = pd.DataFrame(
+        {
+            "A": 100 + 10 * np.sin(np.pi * t / 12),
+            "B": 50 + 5 * np.cos(np.pi * t / 12),
+        },
+        index=index,
+    )
+    demand.iloc[40, 0] = 150
+    demand.iloc[200:203, 0] = 0
+    demand.iloc[300, 1] = 500
+    return demand
+
+
+def test_fix_dataframe_outliers():
+    demand = _demand_with_outliers()
+    fixed = fix_dataframe_outliers(demand)
+    assert fixed.index.equals(demand.index)
+    assert fixed.columns.equals(demand.columns)
+    assert fixed.iloc[40, 0] == (fixed.iloc[39, 0] + fixed.iloc[41, 0]) / 2
+    assert np.allclose(
+        fixed.iloc[199:204, 0], np.linspace(demand.iloc[199, 0], demand.iloc[203, 0], 5)
+    )
+    assert np.allclose(
+        fixed.iloc[299:302, 1], np.linspace(demand.iloc[299, 1], demand.iloc[301, 1], 3)
+    )
+    assert demand.iloc[40, 0] == 150
+
+
+def test_fix_dataframe_outliers_matches_slope_interpolate():
+    demand = _demand_with_outliers()
+    fixed = fix_dataframe_outliers(demand)
+    for ba in demand.columns:
+        expected = slope_interpolate(demand[[ba]])[ba]
+        assert np.array_equal(fixed[ba], expected)
+
+
+def test_find_outlier_runs():
+    demand = _demand_with_outliers()
+    fixed, report = fix_dataframe_outliers(demand, report=True)
+    assert report.equals(find_outlier_runs(demand))
+    assert report.columns.tolist() == ["ba", "start", "end", "hours", "max_zscore"]
+    assert report["ba"].tolist() == ["A", "A", "B"]
+    assert report["start"].tolist() == demand.index[[40, 200, 300]].tolist()
+    assert report["end"].tolist() == demand.index[[41, 203, 301]].tolist()
+    assert report["hours"].tolist() == [2, 4, 2]
+    assert (report["max_zscore"] > 5).all()
+
+
+def test_find_outlier_runs_no_outlier():
+    demand = _demand_with_outliers()
+    report = find_outlier_runs(demand, threshold=np.inf)
+    assert report.empty
+    assert fix_dataframe_outliers(demand, threshold=np.inf).equals(demand)
+
+
+def _demand_with_gaps():
+    index = pd.date_range("2016-01-01", periods=24 * 42, freq="H", tz="UTC")
+    demand = pd.DataFrame(
+        {
+            "A": np.arange(len(index), dtype=float),
+            "B": 1000 + np.arange(len(index), dtype=float),
+        },
+        index=index,
+    )
+    return demand
+
+
+def test_replace_with_shifted_demand():
+    expected = _demand_with_gaps()
+    demand = expected.copy()
+    # Wednesday 2016-01-13: one day back and forward
+    demand.loc["2016-01-13 05:00", "A"] = np.nan
+    # Monday 2016-01-18: one day forward only
+    demand.loc["2016-01-18 05:00", "B"] = np.nan
+    # Saturday 2016-01-23 and the following Sunday: one week back and forward
+    demand.loc["2016-01-23 05:00", "A"] = np.nan
+    demand.loc["2016-01-24 05:00", "A"] = np.nan
+    start, end = demand.index[7 * 24], demand.index[-7 * 24]
+
+    filled, source = replace_with_shifted_demand(demand, start, end, True)
+    assert filled.index.equals(demand.index)
+    assert filled.loc[start:end].notna().all().all()
+    assert filled.loc[: start - pd.Timedelta("1H")].isna().all().all()
+    assert filled.loc["2016-01-13 05:00", "A"] == expected.loc["2016-01-13 05:00", "A"]
+    assert filled.loc["2016-01-18 05:00", "B"] == expected.loc["2016-01-19 05:00", "B"]
+    assert filled.loc["2016-01-23 05:00", "A"] == expected.loc["2016-01-23 05:00", "A"]
+
+    assert source.loc["2016-01-13 05:00", "A"] == "look_back1day+look_forward1day"
+    assert source.loc["2016-01-18 05:00", "B"] == "look_forward1day"
+    assert source.loc["2016-01-23 05:00", "A"] == "look_back1week+look_forward1week"
+    assert source.loc["2016-01-24 05:00", "A"] == "look_back1week+look_forward1week"
+    assert source.notna().sum().sum() == 4
+    assert source.loc["2016-01-14 05:00", "A"] is None
+
+
+def test_replace_with_shifted_demand_cascade():
+    demand = _demand_with_gaps()
+    # Thursday 2016-01-14 with the day before and the day after also missing
+    demand.loc["2016-01-13 05:00":"2016-01-15 05:00":24, "A"] = np.nan
+    start, end = demand.index[7 * 24], demand.index[-7 * 24]
+
+    filled, source = replace_with_shifted_demand(demand, start, end, True)
+    assert filled.loc["2016-01-14 05:00", "A"] == demand.loc["2016-01-12 05:00", "A"]
+    assert source.loc["2016-01-14 05:00", "A"] == "look_back2day"
+    assert source.loc["2016-01-13 05:00", "A"] == "look_back1day"
+    assert source.loc["2016-01-15 05:00", "A"] == "look_back1week+look_forward1week"
+    assert replace_with_shifted_demand(demand, start, end).equals(filled)
+
+
+def test_fill_ba_demand():
+    index = pd.date_range("2016-01-11", periods=3, freq="D")
+    df_ba = pd.DataFrame(
+        {
+            "A": [np.nan, np.nan, 3.0],
+            "look_back2day": [1.0, 2.0, 5.0],
+            "look_forward2day": [4.0, 4.0, 6.0],
+            "dayofweek": index.dayofweek,
+        },
+        index=index,
+    )
+    fill_map = {day: ["look_back2day", "look_forward2day"] for day in range(7)}
+    filled = fill_ba_demand(df_ba, "A", fill_map)
+    assert filled.tolist() == [2.5, 3.0, 3.0]
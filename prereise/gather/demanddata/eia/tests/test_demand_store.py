@@ -0,0 +1,169 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from prereise.gather.demanddata.eia.demand_store import DemandStore
+
+
+def _demand(start, periods, bas=("A", "B")):
+    index = pd.date_range(start, periods=periods, freq="H", tz="UTC")
+    values = np.arange(periods * len(bas), dtype=float).reshape(periods, len(bas))
+    return pd.DataFrame(values, index=index, columns=list(bas))
+
+
+def test_write_read(tmp_path):
+    store = DemandStore(tmp_path / "store")
+    assert store.bas() == []
+    assert "A" not in store
+
+    demand = _demand("2015-12-31 20:00", 10)
+    store.write(demand)
+    assert store.bas() == ["A", "B"]
+    assert store.years("A") == [2015, 2016]
+    assert len(np.load(tmp_path / "store" / "A" / "2015.npy")) == 8760
+    assert len(np.load(tmp_path / "store" / "A" / "2016.npy")) == 8784
+
+    read = store.read(demand.index[0], demand.index[-1])
+    pd.testing.assert_frame_equal(read, demand, check_freq=False)
+
+    read = store.read("2015-12-31 18:00", "2016-01-01 08:00", bas=["B", "C"])
+    assert read.columns.tolist() == ["B", "C"]
+    assert len(read) == 15
+    assert read["C"].isna().all()
+    assert read["B"].isna().sum() == 5
+    assert read["B"].loc[demand.index].equals(demand["B"])
+
+
+def test_write_overwrite(tmp_path):
+    store = DemandStore(tmp_path)
+    demand = _demand("2020-03-01", 24)
+    store.write(demand)
+    update = _demand("2020-03-01 20:00", 8) + 1000
+    update.iloc[0, 0] = np.nan
+    store.write(update)
+
+    read = store.read("2020-03-01", "2020-03-02 03:00")
+    assert read["A"].iloc[20] == demand["A"].iloc[20]
+    assert read["A"].iloc[21:].equals(update["A"].iloc[1:])
+    assert read["B"].iloc[20:].equals(update["B"])
+    assert read.iloc[:20].equals(demand.iloc[:20])
+
+
+def test_write_concurrently(tmp_path):
+    store = DemandStore(tmp_path)
+    demand = _demand("2020-03-01", 24)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: store.write(demand), range(16)))
+    assert sorted(os.listdir(tmp_path / "A")) == ["2020.npy", "coverage.json"]
+    pd.testing.assert_frame_equal(
+        store.read("2020-03-01", "2020-03-01 23:00"), demand, check_freq=False
+    )
+
+
+def test_last_timestamp(tmp_path):
+    store = DemandStore(tmp_path)
+    assert store.last_timestamp("A") is None
+    demand = _demand("2019-12-31 22:00", 5)
+    demand.iloc[-2:, 0] = np.nan
+    store.write(demand)
+    assert store.last_timestamp("A") == pd.Timestamp("2020-01-01 00:00", tz="UTC")
+    assert store.last_timestamp("B") == pd.Timestamp("2020-01-01 02:00", tz="UTC")
+
+
+def test_write_naive_index(tmp_path):
+    store = DemandStore(tmp_path)
+    demand = _demand("2018-07-01", 3)
+    store.write(demand.tz_localize(None))
+    assert store.read("2018-07-01", "2018-07-01 02:00").equals(demand)
+
+
+def test_coverage(tmp_path):
+    store = DemandStore(tmp_path)
+    assert store.coverage("A") == []
+    demand = _demand("2020-03-01", 24)
+    demand.iloc[:2, 0] = np.nan
+    demand.iloc[5:8, 0] = np.nan
+    store.write(demand)
+    assert store.coverage("A") == [
+        (
+            pd.Timestamp("2020-03-01 02:00", tz="UTC"),
+            pd.Timestamp("2020-03-01 23:00", tz="UTC"),
+        )
+    ]
+    store.write(_demand("2020-03-02", 2))
+    store.write(_demand("2020-03-05", 2))
+    store.write(_demand("2020-02-29 22:00", 2))
+    assert store.coverage("B") == [
+        (
+            pd.Timestamp("2020-02-29 22:00", tz="UTC"),
+            pd.Timestamp("2020-03-02 01:00", tz="UTC"),
+        ),
+        (
+            pd.Timestamp("2020-03-05 00:00", tz="UTC"),
+            pd.Timestamp("2020-03-05 01:00", tz="UTC"),
+        ),
+    ]
+
+
+def test_missing_from(tmp_path):
+    store = DemandStore(tmp_path)
+    assert store.missing_from("A", "2020-03-01", "2020-03-02") == pd.Timestamp(
+        "2020-03-01", tz="UTC"
+    )
+    store.write(_demand("2020-03-01", 24))
+    assert store.missing_from("A", "2020-03-01", "2020-03-01 23:00") is None
+    assert store.missing_from("A", "2020-03-01 05:00", "2020-03-02") == pd.Timestamp(
+        "2020-03-02", tz="UTC"
+    )
+    assert store.missing_from("A", "2019-06-01", "2020-03-01") == pd.Timestamp(
+        "2019-06-01", tz="UTC"
+    )
+    assert store.missing_from("A", "2018-06-01", "2021-01-01") == pd.Timestamp(
+        "2018-06-01", tz="UTC"
+    )
+    store.write(_demand("2018-12-31 23:00", 1))
+    assert store.missing_from("A", "2018-06-01", "2020-03-01") == pd.Timestamp(
+        "2018-06-01", tz="UTC"
+    )
+    assert store.missing_from("A", "2018-12-31 23:00", "2020-03-01") == pd.Timestamp(
+        "2019-01-01", tz="UTC"
+    )
+
+
+def test_missing_from_partial_year(tmp_path):
+    store = DemandStore(tmp_path)
+    demand = _demand("2020-07-01", 4416, bas=("A",))
+    demand.iloc[100:200] = np.nan
+    store.write(demand)
+    assert store.years("A") == [2020]
+    assert store.missing_from("A", "2020-01-01", "2020-12-31 23:00") == pd.Timestamp(
+        "2020-01-01", tz="UTC"
+    )
+    assert store.missing_from("A", "2020-01-01", "2020-06-30") == pd.Timestamp(
+        "2020-01-01", tz="UTC"
+    )
+    # Gaps between stored values are gaps of the source
+    assert store.missing_from("A", "2020-07-01", "2020-12-31 23:00") is None
+    assert store.missing_from("A", "2020-07-01", "2021-01-01") == pd.Timestamp(
+        "2021-01-01", tz="UTC"
+    )
+
+    store.write(_demand("2020-01-01", 4367, bas=("A",)))
+    assert store.missing_from("A", "2020-01-01", "2020-12-31 23:00") == pd.Timestamp(
+        "2020-06-30 23:00", tz="UTC"
+    )
+    store.write(_demand("2020-06-30 23:00", 1, bas=("A",)))
+    assert store.missing_from("A", "2020-01-01", "2020-12-31 23:00") is None
+
+
+def test_sources(tmp_path):
+    store = DemandStore(tmp_path)
+    assert store.source_version("A", "a.xlsx") is None
+    store.record_source("A", "a.xlsx", 1.5)
+    store.record_source("A", "b.xlsx", 2.0)
+    assert store.source_version("A", "a.xlsx") == 1.5
+    assert store.source_version("A", "b.xlsx") == 2.0
+    assert store.source_version("B", "a.xlsx") is None
+    assert store.years("A") == []
@@ -1,11 +1,15 @@
 import getpass
+import json
 import os
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 import pytest
+import requests
 
 from prereise.gather.demanddata.eia import get_eia_data
+from prereise.gather.demanddata.eia.demand_store import DemandStore
 
 
 @pytest.mark.skip(reason="Need API key")
@@ -52,3 +56,232 @@ def test_from_excel():
 
     ba_from_excel = get_eia_data.from_excel(dir1, ba_list, start, end)
     assert len(ba_from_excel.columns) == len(ba_list)
+
+
+def test_from_excel_store(tmp_path, monkeypatch):
+    dir1 = os.path.join(os.path.dirname(__file__), "data")
+    start = pd.to_datetime("2015-10-01 07:00:00")
+    end = pd.to_datetime("2015-12-31 23:00:00")
+    ba_list = ["BPAT", "CISO", "EPE"]
+    store = DemandStore(tmp_path)
+
+    expected = get_eia_data.from_excel(dir1, ba_list, start, end)
+    ba_from_store = get_eia_data.from_excel(dir1, ba_list, start, end, store=store)
+    assert store.bas() == ba_list
+    assert ba_from_store.index.equals(pd.date_range(start, end, freq="H"))
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(
+        ba_from_store.loc[expected.index], expected, check_dtype=False, check_freq=False
+    )
+
+    # Spreadsheets are not read again when the store covers the period
+    def fail(*args, **kwargs):
+        raise AssertionError("spreadsheet read")
+
+    monkeypatch.setattr(get_eia_data, "_read_excel", fail)
+    assert get_eia_data.from_excel(dir1, ba_list, start, end, store=store).equals(
+        ba_from_store
+    )
+
+    # Nor when they have been added already but end before the period
+    later = get_eia_data.from_excel(
+        dir1, ba_list, start, pd.Timestamp("2016-03-01"), store=store
+    )
+    assert later.loc["2016-01-01":].isna().all().all()
+
+
+class FakeSession:
+    """Serves EIA series API responses from a dict of series."""
+
+    def __init__(self, series):
+        self.series = series
+        self.calls = []
+        self.closed = False
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append(params)
+        series_id = params["series_id"]
+        jso = {"request": {"command": "series", "series_id": series_id}}
+        if series_id not in self.series:
+            jso["data"] = {"error": "invalid series_id"}
+        else:
+            data = self.series[series_id]
+            if "start" in params:
+                data = [d for d in data if d[0] >= params["start"]]
+            jso["series"] = [{"series_id": series_id, "data": data[::-1]}]
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = json.dumps(jso).encode()
+        return response
+
+
+def _eia_data(start, periods, offset=0):
+    dates = pd.date_range(start, periods=periods, freq="H", tz="UTC")
+    return [
+        [d.strftime("%Y%m%dT%HZ"), None if i == 1 else float(offset + i)]
+        for i, d in enumerate(dates)
+    ]
+
+
+def test_parse_series():
+    data = _eia_data("2020-01-01", 4)[::-1]
+    jso = {"request": {}, "series": [{"series_id": "EBA.A-ALL.D.H", "data": data}]}
+    series = get_eia_data.parse_series(jso)
+    assert series.name == "EBA.A-ALL.D.H"
+    assert series.index.equals(
+        pd.date_range("2020-01-01", periods=4, freq="H", tz="UTC")
+    )
+    assert np.array_equal(series, [0, np.nan, 2, 3], equal_nan=True)
+    assert get_eia_data.parse_series({"request": {}, "data": {"error": ""}}) is None
+
+
+def test_get_data():
+    session = FakeSession(
+        {
+            "EBA.A-ALL.D.H": _eia_data("2020-01-01", 5),
+            "EBA.B-ALL.D.H": _eia_data("2020-01-01 02:00", 5, offset=10),
+        }
+    )
+    df = get_eia_data.EIAgov(
+        "tok", ["EBA.A-ALL.D.H", "EBA.B-ALL.D.H"], session
+    ).get_data()
+    assert df.columns.tolist() == ["Date", "EBA.A-ALL.D.H", "EBA.B-ALL.D.H"]
+    assert len(df) == 5
+    assert np.array_equal(
+        df["EBA.B-ALL.D.H"], [np.nan] * 2 + [10, np.nan, 12], equal_nan=True
+    )
+    assert get_eia_data.EIAgov("tok", ["EBA.C-ALL.D.H"], session).get_data() is None
+
+
+def test_download_series_cache(tmp_path):
+    series_list = ["EBA.A-ALL.D.H", "EBA.B-ALL.D.H", "EBA.C-ALL.D.H"]
+    data = {
+        s: _eia_data("2020-01-01", 48, offset=100 * i)
+        for i, s in enumerate(series_list[:2])
+    }
+    session = FakeSession({s: d[:24] for s, d in data.items()})
+    first = get_eia_data.download_series(
+        "tok", series_list, cache_dir=tmp_path, max_workers=2, session=session
+    )
+    assert first["EBA.C-ALL.D.H"] is None
+    assert len(first["EBA.A-ALL.D.H"]) == 24
+    assert all("start" not in params for params in session.calls)
+    assert not session.closed
+
+    # Update the last cached hour and add a day
+    data["EBA.A-ALL.D.H"][23][1] = -1.0
+    session = FakeSession(data)
+    second = get_eia_data.download_series(
+        "tok", series_list, cache_dir=tmp_path, max_workers=2, session=session
+    )
+    starts = {params["series_id"]: params.get("start") for params in session.calls}
+    assert starts["EBA.A-ALL.D.H"] == "20200101T23Z"
+    assert starts["EBA.C-ALL.D.H"] is None
+    for i, s in enumerate(series_list[:2]):
+        expected = get_eia_data.parse_series(
+            {"request": {}, "series": [{"series_id": s, "data": data[s]}]}
+        )
+        assert second[s].equals(expected)
+        assert get_eia_data._read_cache(tmp_path, s).equals(expected)
+    assert second["EBA.A-ALL.D.H"].iloc[23] == -1
+
+
+def test_from_download(monkeypatch):
+    session = FakeSession(
+        {
+            "EBA.A-ALL.D.H": _eia_data("2020-01-01", 48),
+            "EBA.B-ALL.D.H": _eia_data("2020-01-01", 48, offset=10),
+        }
+    )
+    monkeypatch.setattr(get_eia_data.requests, "Session", lambda: session)
+    start = pd.Timestamp("2020-01-01")
+    end = pd.Timestamp("2020-01-03")
+    df = get_eia_data.from_download(
+        "tok", start, end, 1, ["EBA.A-ALL.D.H", "EBA.B-ALL.D.H", "EBA.C-ALL.D.H"]
+    )
+    assert df.columns.tolist() == ["EBA.A-ALL.D.H", "EBA.B-ALL.D.H"]
+    assert df.index.equals(pd.date_range(start, periods=48, freq="H", tz="UTC"))
+    assert df["EBA.B-ALL.D.H"].iloc[2] == 12
+    assert session.closed
+
+
+def test_from_download_store(tmp_path, monkeypatch):
+    data = {
+        "EBA.A-ALL.D.H": _eia_data("2020-01-01", 72),
+        "EBA.B-ALL.D.H": _eia_data("2020-01-01", 72, offset=10),
+    }
+    session = FakeSession({s: d[:24] for s, d in data.items()})
+    monkeypatch.setattr(get_eia_data.requests, "Session", lambda: session)
+    store = DemandStore(tmp_path)
+    series_list = ["EBA.A-ALL.D.H", "EBA.B-ALL.D.H", "EBA.C-ALL.D.H"]
+    start = pd.Timestamp("2020-01-01")
+
+    df = get_eia_data.from_download(
+        "tok", start, pd.Timestamp("2020-01-02"), 0, series_list, store=store
+    )
+    assert df.columns.tolist() == ["EBA.A-ALL.D.H", "EBA.B-ALL.D.H"]
+    assert len(df) == 25
+    assert df.iloc[24].isna().all()
+
+    session.series = data
+    session.calls = []
+    df = get_eia_data.from_download(
+        "tok", start, pd.Timestamp("2020-01-03"), 0, series_list, store=store
+    )
+    starts = {params["series_id"]: params.get("start") for params in session.calls}
+    assert starts == {
+        "EBA.A-ALL.D.H": "20200102T00Z",
+        "EBA.B-ALL.D.H": "20200102T00Z",
+        "EBA.C-ALL.D.H": "20200101T00Z",
+    }
+    assert len(df) == 49
+    assert df["EBA.B-ALL.D.H"].iloc[48] == 58
+    assert store.last_timestamp("EBA.A-ALL.D.H") == pd.Timestamp(
+        "2020-01-03 23:00", tz="UTC"
+    )
+
+    # Series up to date are not downloaded
+    session.calls = []
+    get_eia_data.from_download(
+        "tok", start, pd.Timestamp("2020-01-03"), 0, series_list, store=store
+    )
+    assert [params["series_id"] for params in session.calls] == ["EBA.C-ALL.D.H"]
+
+
+def test_from_download_store_earlier_years(tmp_path, monkeypatch):
+    series_id = "EBA.A-ALL.D.H"
+    data = _eia_data("2019-12-31", 72)
+    session = FakeSession({series_id: data[24:]})
+    monkeypatch.setattr(get_eia_data.requests, "Session", lambda: session)
+    store = DemandStore(tmp_path)
+
+    get_eia_data.from_download(
+        "tok",
+        pd.Timestamp("2020-01-01"),
+        pd.Timestamp("2020-01-02"),
+        0,
+        [series_id],
+        store=store,
+    )
+    assert store.years(series_id) == [2020]
+
+    # The store holds a later range: the missing year is downloaded
+    session.series = {series_id: data}
+    session.calls = []
+    start = pd.Timestamp("2019-12-31")
+    df = get_eia_data.from_download(
+        "tok", start, pd.Timestamp("2020-01-02"), 0, [series_id], store=store
+    )
+    assert [params.get("start") for params in session.calls] == ["20191231T00Z"]
+    assert store.years(series_id) == [2019, 2020]
+    assert df.index[0] == pd.Timestamp(start, tz="UTC")
+    np.testing.assert_array_equal(
+        df[series_id].iloc[:24], [np.nan if v is None else v for _, v in data[:24]]
+    )
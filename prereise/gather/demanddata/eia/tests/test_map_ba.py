@@ -1,13 +1,17 @@
+from unittest.mock import patch
+
 import pandas as pd
 import pytest
 from pandas.testing import assert_series_equal
 
 from prereise.gather.demanddata.eia.map_ba import (
     aggregate_ba_demand,
+    get_ba_zone_weights,
     get_demand_in_loadzone,
     map_buses_to_ba,
     map_buses_to_county,
 )
+from prereise.gather.tests.mock_counties import write_county_shapefile
 
 
 def test_get_demand_in_loadzone_case():
@@ -27,6 +31,38 @@ def test_get_demand_in_loadzone_has_equal_total_demand():
     )
 
 
+def test_get_ba_zone_weights():
+    bus_map, _ = create_loadzone_dataframe()
+    weights = get_ba_zone_weights(bus_map)
+    assert weights.index.tolist() == ["A", "B", "C"]
+    assert weights.columns.tolist() == ["X", "Y"]
+    assert weights.sparse.density == pytest.approx(5 / 6)
+    assert weights.sparse.to_dense().values.tolist() == [
+        [1 / 4, 3 / 4],
+        [2 / 6, 4 / 6],
+        [0, 1],
+    ]
+
+
+def test_get_demand_in_loadzone_with_weights():
+    bus_map, agg_demand = create_loadzone_dataframe()
+    weights = get_ba_zone_weights(bus_map)
+    zone_demand = get_demand_in_loadzone(agg_demand, weights=weights)
+    assert zone_demand.equals(get_demand_in_loadzone(agg_demand, bus_map))
+    other_year = get_demand_in_loadzone(2 * agg_demand, weights=weights)
+    assert other_year.equals(2 * zone_demand)
+
+
+def test_get_demand_in_loadzone_argument_value():
+    bus_map, agg_demand = create_loadzone_dataframe()
+    with pytest.raises(ValueError):
+        get_demand_in_loadzone(agg_demand)
+    with pytest.raises(ValueError):
+        get_demand_in_loadzone(
+            agg_demand, bus_map, weights=get_ba_zone_weights(bus_map)
+        )
+
+
 def test_aggregate_ba_demand_sums_first_three_columns():
     initial_df = create_ba_to_region_dataframe()
     mapping = {"ABC": ["A", "B", "C"]}
@@ -96,3 +132,39 @@ def test_map_buses_to_ba():
     bus_ba, bus_no_county_match = map_buses_to_ba(bus_df)
     assert bus_ba["BA"].tolist() == expected_res
     assert bus_no_county_match == ["Beijing"]
+
+
+def test_map_buses_to_county_shapefile(tmp_path):
+    county_shapefile = write_county_shapefile(tmp_path / "counties.shp")
+    bus_df = pd.DataFrame(
+        {"lat": [30.5, 40.5, 50.0, 30.2], "lon": [-99.5, -89.5, -89.5, -98.8]},
+        index=[11, 12, 13, 14],
+    )
+    with patch("prereise.gather.demanddata.eia.map_ba.requests.get") as get:
+        get.return_value.json.return_value = {
+            "County": {"name": "Delta"},
+            "State": {"code": "CC"},
+        }
+        bus_county, bus_no_county_match = map_buses_to_county(bus_df, county_shapefile)
+    # Only the bus outside of the shapefile counties is looked up with the API
+    assert get.call_count == 1
+    assert get.call_args.kwargs["params"]["latitude"] == 50.0
+    assert bus_county["County"].tolist() == [
+        "Alpha__AA",
+        "Gamma__BB",
+        "Delta__CC",
+        "Beta__AA",
+    ]
+    assert bus_no_county_match == []
+
+
+def test_map_buses_to_county_no_api_fallback(tmp_path):
+    county_shapefile = write_county_shapefile(tmp_path / "counties.shp")
+    bus_df = pd.DataFrame({"lat": [30.5, 50.0], "lon": [-99.5, -89.5]}, index=[1, 2])
+    with patch("prereise.gather.demanddata.eia.map_ba.requests.get") as get:
+        bus_county, bus_no_county_match = map_buses_to_county(
+            bus_df, county_shapefile, api_fallback=False
+        )
+    get.assert_not_called()
+    assert bus_county.loc[1, "County"] == "Alpha__AA"
+    assert bus_no_county_match == [2]
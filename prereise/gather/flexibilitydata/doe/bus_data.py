@@ -12,6 +12,12 @@ from geopy.extra.rate_limiter import RateLimiter
 from powersimdata.utility.distance import find_closest_neighbor
 from tqdm import tqdm
 
+from prereise.gather.county_lookup import (
+    default_county_shapefile,
+    find_counties,
+    read_counties,
+)
+
 
 def get_bus_pos(network_path):
     """Read raw files of synthetic grid and extract the lat/lon coordinate of all buses
@@ -51,13 +57,19 @@ def get_bus_pos(network_path):
     return bus_pos
 
 
-def get_bus_fips(bus_pos, cache_path, start_idx=0):
-    """Try to get FIPS of each bus in a case mat using FCC AREA API
-    Can take hours to run, save to cache file for future use
+def get_bus_fips(bus_pos, cache_path, start_idx=0, county_shapefile=None):
+    """Try to get FIPS of each bus in a case mat. Buses are first located in the
+    county boundaries of a shapefile, all at once, and the remaining ones are looked
+    up using FCC AREA API, which can take hours to run. Save to cache file for future
+    use
 
     :param pandas.DataFrame bus_pos: a dataframe of (bus, lat, lon)
     :param str cache_path: folder to store processed cache files
     :param int start_idx: pointer to the index of a bus to start query from
+    :param str county_shapefile: path to the county shapefile, see
+        :func:`prereise.gather.county_lookup.read_counties`. If None, the default
+        county shapefile is used when present, otherwise all buses are looked up
+        with the API.
     """
     bus_num = len(bus_pos)
     bus_fips_dict = {
@@ -67,10 +79,19 @@ def get_bus_fips(bus_pos, cache_path, start_idx=0):
         "fips": [0] * bus_num,
     }
 
+    to_query = range(start_idx, bus_num)
+    if county_shapefile is not None or os.path.isfile(default_county_shapefile):
+        counties = read_counties(county_shapefile)
+        found = find_counties(bus_pos["lat"], bus_pos["lon"], counties)["fips"]
+        for i in range(start_idx, bus_num):
+            if not pd.isna(found[i]):
+                bus_fips_dict["fips"][i] = int(found[i])
+        to_query = [i for i in to_query if pd.isna(found[i])]
+
     url = "https://geo.fcc.gov/api/census/area"
 
-    for i in tqdm(range(start_idx, bus_num)):
-        if i % 1000 == 0:
+    for n, i in enumerate(tqdm(to_query)):
+        if n % 1000 == 0:
             with open(os.path.join(cache_path, "bus_fips.pkl"), "wb") as fh:
                 pkl.dump(bus_fips_dict, fh)
 
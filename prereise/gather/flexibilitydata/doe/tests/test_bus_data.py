@@ -1,10 +1,12 @@
 import os
 import pickle as pkl
+from unittest.mock import patch
 
 import pandas as pd
 import pytest
 
 from prereise.gather.flexibilitydata.doe.bus_data import get_bus_fips, get_bus_zip
+from prereise.gather.tests.mock_counties import write_county_shapefile
 
 
 @pytest.mark.skip
@@ -30,7 +32,7 @@ def test_get_bus_fips():
     os.remove("bus_fips.pkl")
 
 
-def test_get_bus_zip():
+def test_get_bus_zip(tmp_path):
     """Test the geopy OSM query using constant dataframe"""
     bus_pos_dict = {
         "bus_id": [1, 2, 3],
@@ -39,14 +41,30 @@ def test_get_bus_zip():
     }
     bus_pos = pd.DataFrame.from_dict(bus_pos_dict)
 
-    # query for fips data, stored in same folder
-    get_bus_zip(bus_pos, "")
+    # query for zip data, stored in a temporary folder
+    get_bus_zip(bus_pos, str(tmp_path))
 
     # check result
-    with open("bus_zip.pkl", "rb") as fh:
+    with open(tmp_path / "bus_zip.pkl", "rb") as fh:
         bus_zip = pkl.load(fh)
 
     assert bus_zip["zip"] == [77004, 20500, 77845]
 
-    # delete file
-    os.remove("bus_zip.pkl")
+
+def test_get_bus_fips_shapefile(tmp_path):
+    """Buses are located with a county shapefile, the API is only queried for the
+    others"""
+    county_shapefile = write_county_shapefile(tmp_path / "counties.shp")
+    bus_pos = pd.DataFrame(
+        {"bus_id": [1, 2, 3], "lat": [30.5, 50.0, 40.5], "lon": [-98.5, -89.5, -89.5]}
+    )
+    with patch("prereise.gather.flexibilitydata.doe.bus_data.requests.get") as get:
+        get.return_value.status_code = 200
+        get.return_value.json.return_value = {"County": {"FIPS": "55001"}}
+        get_bus_fips(bus_pos, str(tmp_path), county_shapefile=county_shapefile)
+
+    assert get.call_count == 1
+    assert get.call_args.kwargs["params"]["latitude"] == 50.0
+    with open(tmp_path / "bus_fips.pkl", "rb") as fh:
+        bus_fips = pkl.load(fh)
+    assert bus_fips["fips"] == [1003, 55001, 2001]
@@ -97,3 +97,42 @@ def get_monthly_net_generation(state, eia_form_923, resource, hps=True):
     eia_net_generation = list(np.nan_to_num(eia_net_generation))
 
     return eia_net_generation
+
+
+def long_to_wide(data, value="Pout"):
+    """Reshape a long format profile into a wide data frame in a single pass.
+
+    :param pandas.DataFrame data: data frame with *'plant_id'*, *'ts'*, *'ts_id'* and
+        ``value`` among its columns, holding one row per (ts_id, plant_id) pair.
+    :param str value: name of the column holding the profile values.
+    :return: (*pandas.DataFrame*) -- data frame of ``value`` indexed by timestamp
+        (in *'ts_id'* order) with plant id as columns, in the order the plants are
+        listed for the first *'ts_id'*. The dtype of ``value`` is kept.
+    :raises ValueError: if a timestamp doesn't hold exactly one row per plant of
+        the first timestamp.
+    """
+    ts_codes, ts_ids = pd.factorize(data["ts_id"], sort=True)
+    first = ts_codes == 0
+    plant_id = pd.Index(data["plant_id"].to_numpy()[first])
+    plant_codes = plant_id.get_indexer(data["plant_id"])
+    n_ts, n_plant = len(ts_ids), len(plant_id)
+
+    # Check the plant order once: each timestamp must cover all plants exactly once
+    cell = ts_codes.astype(np.int64) * n_plant + plant_codes
+    if (
+        not plant_id.is_unique
+        or (plant_codes == -1).any()
+        or len(data) != n_ts * n_plant
+        or (np.bincount(cell, minlength=n_ts * n_plant) != 1).any()
+    ):
+        raise ValueError("each ts_id must have exactly one row per plant_id")
+
+    values = data[value].to_numpy()
+    profile = np.empty(n_ts * n_plant, dtype=values.dtype)
+    profile[cell] = values
+    _, first_row = np.unique(ts_codes, return_index=True)
+    return pd.DataFrame(
+        profile.reshape(n_ts, n_plant),
+        index=pd.Index(data["ts"].to_numpy()[first_row]),
+        columns=plant_id,
+    )
@@ -1,3 +1,4 @@
+import asyncio
 import functools
 import time
 from urllib.error import HTTPError
@@ -36,6 +37,63 @@ class RateLimit:
         return result
 
 
+class TokenBucket:
+    """Asynchronous rate limiter allowing bursts of up to ``capacity`` calls, with
+    tokens refilled at ``rate`` per second. Meant to be used from a single event
+    loop.
+
+    :param int/float rate: tokens added per second. If None, calls are only limited
+        during pauses.
+    :param int capacity: maximum number of tokens held by the bucket.
+    """
+
+    def __init__(self, rate, capacity=1):
+        """Constructor"""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = self.updated
+
+    def _refill(self):
+        now = time.monotonic()
+        start = max(self.updated, self.paused_until)
+        if self.rate is None:
+            self.tokens = self.capacity
+        elif now > start:
+            self.tokens = min(self.capacity, self.tokens + (now - start) * self.rate)
+            self.updated = now
+        return now
+
+    def delay(self):
+        """Time to wait until a token is available.
+
+        :return: (*float*) -- delay in seconds.
+        """
+        now = self._refill()
+        wait = max(0.0, self.paused_until - now)
+        if self.rate is not None and self.tokens < 1:
+            wait += (1 - self.tokens) / self.rate
+        return wait
+
+    async def acquire(self):
+        """Wait until a token is available and consume it."""
+        while (wait := self.delay()) > 0:
+            await asyncio.sleep(wait)
+        if self.rate is not None:
+            self.tokens -= 1
+
+    def pause(self, seconds):
+        """Empty the bucket and stop refilling it for some time, e.g. after the
+        server asked to slow down.
+
+        :param int/float seconds: duration of the pause.
+        """
+        self._refill()
+        self.tokens = min(self.tokens, 0)
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
 def rate_limit(_func=None, interval=None):
     def decorator(func):
         limiter = RateLimit(interval)
@@ -55,6 +113,7 @@ def retry(
     interval=None,
     raises=False,
     allowed_exceptions=(HTTPError),
+    backoff=None,
 ):
     """Creates a decorator to handle retry logic.
 
@@ -62,6 +121,8 @@ def retry(
     :param int/float interval: minimum spacing between retries
     :param bool raises: whether to re-raise the error after max_attempts is reached
     :param tuple allowed_exceptions: exceptions for which the function will be retried, all others will be surfaced to the caller
+    :param int/float backoff: if given, seconds to wait after the first failed
+        attempt, doubling after each subsequent failure (exponential backoff)
 
     :return: (*Any*) -- the return value of the decorated function, or None if
         raises is False and all attempts failed
@@ -82,6 +143,8 @@ def retry(
                         print("Max retries reached!!")
                         if raises:
                             raise e
+                    elif backoff is not None:
+                        time.sleep(backoff * 2**i)
 
         return wrapper
 
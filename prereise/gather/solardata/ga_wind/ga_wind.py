@@ -1,4 +1,3 @@
-import dateutil
 import h5pyd
 import numpy as np
 import pandas as pd
@@ -6,27 +5,20 @@ from pyproj import Transformer
 from tqdm import tqdm
 
 from prereise.gather.solardata.ga_wind.helpers import ll2ij, proj_string
-from prereise.gather.solardata.helpers import get_plant_id_unique_location
+from prereise.gather.solardata.helpers import (
+    broadcast_locations,
+    get_plant_id_unique_location,
+)
 
 
-def retrieve_data(
-    solar_plant, hs_api_key, start_date="2007-01-01", end_date="2014-01-01"
-):
-    """Retrieves irradiance data from Gridded Atmospheric Wind Integration
-    National dataset.
+def open_hsds_file(hs_api_key, domain="/nrel/wtk-us.h5"):
+    """Open the Gridded Atmospheric Wind Integration National dataset on the NREL
+    HSDS service.
 
-    :param pandas.DataFrame solar_plant: plant data frame.
     :param str hs_api_key: API key.
-    :param str start_date: start date.
-    :param str end_date: end date.
-    :return: (*pandas.DataFrame*) -- data frame with *'Pout'*, *'plant_id'*, *'ts'* and
-        *'ts_id'* as columns. Values are power output for a 1MW generator.
+    :param str domain: HSDS domain of the dataset.
+    :return: (*h5pyd.File*) -- remote file handle.
     """
-
-    # Identify unique location
-    coord = get_plant_id_unique_location(solar_plant)
-
-    # Build query
     hs_endpoint = "https://developer.nrel.gov/api/hsds"
     hs_endpoint_fallback = "https://developer.nrel.gov/api/hsds/"
     hs_username = None
@@ -34,7 +26,7 @@ def retrieve_data(
 
     try:
         f = h5pyd.File(
-            "/nrel/wtk-us.h5",
+            domain,
             "r",
             username=hs_username,
             password=hs_password,
@@ -43,45 +35,109 @@ def retrieve_data(
         )
     except OSError:
         f = h5pyd.File(
-            "/nrel/wtk-us.h5",
+            domain,
             "r",
             username=hs_username,
             password=hs_password,
             endpoint=hs_endpoint_fallback,
             api_key=hs_api_key,
         )
+    return f
 
-    # Get coordinates of nearest location
-    lat_origin, lon_origin = f["coordinates"][0][0]
-    transformer = Transformer.from_pipeline(proj_string)
-    ij = {key: ll2ij(transformer, lon_origin, lat_origin, *key) for key in coord.keys()}
 
-    # Extract time series
-    dt = f["datetime"]
-    dt = pd.DataFrame({"datetime": dt[:]})
-    dt["datetime"] = dt["datetime"].apply(dateutil.parser.parse)
+def decode_datetime(values):
+    """Decode the timestamps stored in the *'datetime'* dataset in one call.
 
-    dt_range = dt.loc[(dt.datetime >= start_date) & (dt.datetime < end_date)]
+    :param numpy.array values: timestamps as bytes or str.
+    :return: (*pandas.DatetimeIndex*) -- decoded timestamps.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in {"S", "O"}:
+        values = np.char.decode(values.astype("S"), "utf-8")
+    return pd.DatetimeIndex(pd.to_datetime(values))
+
+
+def group_cells(cells, box_size=8):
+    """Group grid cells into bounding boxes so that nearby cells can be read in a
+    single hyperslab request.
+
+    :param numpy.ndarray cells: (i, j) indices of the cells, shape (n, 2).
+    :param int box_size: side, in cells, of the tiles used to group cells. Each
+        bounding box spans at most ``box_size`` x ``box_size`` cells.
+    :return: (*list*) -- list of (*slice*, *slice*, *numpy.array*) tuples: the i and j
+        extent of a bounding box and the position in ``cells`` of the cells it
+        covers.
+    :raises ValueError: if ``box_size`` is not a positive integer.
+    """
+    if not isinstance(box_size, int) or box_size < 1:
+        raise ValueError("box_size must be a positive integer")
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    _, tile = np.unique(cells // box_size, axis=0, return_inverse=True)
+    tile = tile.ravel()
+    order = np.argsort(tile, kind="stable")
+    bounds = np.flatnonzero(np.diff(tile[order])) + 1
+
+    boxes = []
+    for members in np.split(order, bounds):
+        lo = cells[members].min(axis=0)
+        hi = cells[members].max(axis=0) + 1
+        boxes.append((slice(lo[0], hi[0]), slice(lo[1], hi[1]), members))
+    return boxes
 
-    data = pd.DataFrame({"Pout": [], "plant_id": [], "ts": [], "ts_id": []})
 
-    for key, val in tqdm(ij.items(), total=len(ij)):
-        ghi = f["GHI"][min(dt_range.index) : max(dt_range.index) + 1, val[0], val[1]]
-        data_loc = pd.DataFrame({"Pout": ghi})
-        data_loc["Pout"] /= max(ghi)
-        data_loc["ts_id"] = range(1, len(ghi) + 1)
-        data_loc["ts"] = pd.date_range(start=start_date, end=end_date, freq="H")[:-1]
+def retrieve_data(
+    solar_plant,
+    hs_api_key,
+    start_date="2007-01-01",
+    end_date="2014-01-01",
+    source=None,
+    box_size=8,
+):
+    """Retrieves irradiance data from Gridded Atmospheric Wind Integration
+    National dataset.
 
-        for i in coord[key]:
-            data_site = data_loc.copy()
-            data_site["plant_id"] = i
+    :param pandas.DataFrame solar_plant: plant data frame.
+    :param str hs_api_key: API key. Not used if ``source`` is given.
+    :param str start_date: start date.
+    :param str end_date: end date.
+    :param source: open file with the layout of the dataset, i.e. with
+        *'coordinates'*, *'datetime'* and *'GHI'* datasets, e.g. a local
+        ``h5py.File``. If None, the dataset is accessed on the NREL HSDS service.
+    :param int box_size: side, in grid cells, of the bounding boxes used to batch the
+        reads of nearby locations.
+    :return: (*pandas.DataFrame*) -- data frame with *'Pout'*, *'plant_id'*, *'ts'* and
+        *'ts_id'* as columns. Values are power output for a 1MW generator.
+    :raises ValueError: if no timestamp of the dataset falls between ``start_date``
+        and ``end_date``.
+    """
 
-            data = data.append(data_site, ignore_index=True, sort=False)
+    # Identify unique location
+    coord = get_plant_id_unique_location(solar_plant)
 
-    data["plant_id"] = data["plant_id"].astype(np.int32)
-    data["ts_id"] = data["ts_id"].astype(np.int32)
+    f = open_hsds_file(hs_api_key) if source is None else source
 
-    data.sort_values(by=["ts_id", "plant_id"], inplace=True)
-    data.reset_index(inplace=True, drop=True)
+    # Get coordinates of nearest location
+    lat_origin, lon_origin = f["coordinates"][0][0]
+    transformer = Transformer.from_pipeline(proj_string)
+    cells = np.array(
+        [ll2ij(transformer, lon_origin, lat_origin, *key) for key in coord.keys()],
+        dtype=np.int64,
+    ).reshape(-1, 2)
 
-    return data
+    # Extract time series
+    dt = decode_datetime(f["datetime"][:])
+    in_range = np.flatnonzero((dt >= start_date) & (dt < end_date))
+    if len(in_range) == 0:
+        raise ValueError("no data between start_date and end_date")
+    t0, t1 = in_range[0], in_range[-1] + 1
+
+    ghi = np.empty((t1 - t0, len(cells)), dtype=float)
+    boxes = group_cells(cells, box_size=box_size)
+    for i_slice, j_slice, members in tqdm(boxes, total=len(boxes)):
+        block = f["GHI"][t0:t1, i_slice, j_slice]
+        ghi[:, members] = block[
+            :, cells[members, 0] - i_slice.start, cells[members, 1] - j_slice.start
+        ]
+    ghi /= ghi.max(axis=0)
+
+    return broadcast_locations(ghi, coord, dt[t0:t1])
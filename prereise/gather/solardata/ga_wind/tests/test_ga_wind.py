@@ -0,0 +1,97 @@
+import h5py
+import numpy as np
+import pandas as pd
+import pytest
+from pyproj import Transformer
+
+from prereise.gather.solardata.ga_wind.ga_wind import (
+    decode_datetime,
+    group_cells,
+    retrieve_data,
+)
+from prereise.gather.solardata.ga_wind.helpers import proj_string
+
+lat_origin, lon_origin = 19.624062, -123.30661
+
+
+def _lon_lat(i, j):
+    transformer = Transformer.from_pipeline(proj_string)
+    x0, y0 = transformer.transform(lon_origin, lat_origin)
+    return transformer.transform(x0 + 2000 * j, y0 + 2000 * i, direction="INVERSE")
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "wtk.h5"
+    dt = pd.date_range("2009-12-31 22:00", periods=30, freq="H")
+    ghi = np.random.default_rng(0).uniform(0, 1000, size=(len(dt), 40, 50))
+    with h5py.File(path, "w") as f:
+        coordinates = np.zeros((40, 50, 2))
+        coordinates[0, 0] = lat_origin, lon_origin
+        f["coordinates"] = coordinates
+        f["datetime"] = dt.strftime("%Y-%m-%d %H:%M:%S").to_numpy().astype("S")
+        f["GHI"] = ghi.astype(np.float32)
+    with h5py.File(path, "r") as f:
+        yield f
+
+
+def test_decode_datetime():
+    values = np.array([b"2010-01-01 00:00:00", b"2010-01-01 01:00:00"])
+    expected = pd.DatetimeIndex(["2010-01-01 00:00", "2010-01-01 01:00"])
+    assert decode_datetime(values).equals(expected)
+    assert decode_datetime(values.astype(str)).equals(expected)
+
+
+def test_group_cells():
+    cells = np.array([[0, 0], [1, 3], [9, 9], [2, 2], [30, 1]])
+    boxes = group_cells(cells, box_size=8)
+    covered = np.sort(np.concatenate([members for _, _, members in boxes]))
+    assert np.array_equal(covered, np.arange(len(cells)))
+    assert len(boxes) == 3
+    for i_slice, j_slice, members in boxes:
+        assert i_slice.stop - i_slice.start <= 8
+        assert j_slice.stop - j_slice.start <= 8
+        for i, j in cells[members]:
+            assert i_slice.start <= i < i_slice.stop
+            assert j_slice.start <= j < j_slice.stop
+
+
+def test_group_cells_argument_value():
+    with pytest.raises(ValueError):
+        group_cells(np.array([[0, 0]]), box_size=0)
+
+
+def test_retrieve_data(dataset):
+    cells = [(3, 4), (5, 6), (3, 4), (20, 45), (12, 1)]
+    lon, lat = zip(*[_lon_lat(i, j) for i, j in cells])
+    plant = pd.DataFrame(
+        {"lat": lat, "lon": lon}, index=pd.Index([12, 3, 7, 40, 5], name="plant_id")
+    )
+
+    data = retrieve_data(
+        plant, None, "2010-01-01", "2010-01-02", source=dataset, box_size=4
+    )
+
+    ghi = dataset["GHI"][2:26]
+    plant_id = plant.index.sort_values()
+    assert data.columns.tolist() == ["Pout", "plant_id", "ts", "ts_id"]
+    assert len(data) == 24 * len(plant)
+    assert data["plant_id"].dtype == np.int32
+    assert data["ts_id"].dtype == np.int32
+    assert np.array_equal(data["plant_id"], np.tile(plant_id, 24))
+    assert np.array_equal(data["ts_id"], np.repeat(np.arange(1, 25), len(plant)))
+    assert pd.DatetimeIndex(data["ts"].unique()).equals(
+        pd.date_range("2010-01-01", periods=24, freq="H")
+    )
+    for p, (i, j) in zip(plant.index, cells):
+        expected = ghi[:, i, j] / ghi[:, i, j].max()
+        assert np.allclose(data.loc[data.plant_id == p, "Pout"], expected)
+
+
+def test_retrieve_data_empty_range(dataset):
+    lon, lat = _lon_lat(1, 1)
+    plant = pd.DataFrame(
+        {"lat": [lat], "lon": [lon]}, index=pd.Index([1], name="plant_id")
+    )
+    with pytest.raises(ValueError):
+        retrieve_data(plant, None, "2011-01-01", "2011-01-02", source=dataset)
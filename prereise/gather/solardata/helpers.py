@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
 
+from prereise.gather.helpers import long_to_wide
+
 
 def to_reise(data):
     """Format data for REISE.
@@ -18,20 +21,7 @@ def to_reise(data):
         raise ValueError(
             "data frame must have Pout, plant_id, ts and ts_id among columns"
         )
-    ts = data["ts"].unique()
-    plant_id = data[data.ts_id == 1].plant_id.values
-
-    profile = None
-    for i in range(1, max(data.ts_id) + 1):
-        data_tmp = pd.DataFrame(
-            {"Pout": data[data.ts_id == i].Pout.values}, index=plant_id
-        )
-        if i == 1:
-            profile = data_tmp.T
-        else:
-            profile = pd.concat([profile, data_tmp.T], sort=False, ignore_index=True)
-
-    profile.set_index(ts, inplace=True)
+    profile = long_to_wide(data)
     profile.index.name = "UTC"
 
     return profile
@@ -53,3 +43,38 @@ def get_plant_id_unique_location(plant):
             "data frame must have plant_id as index and lat and lon among columns"
         )
     return plant.groupby(["lon", "lat"]).groups
+
+
+def broadcast_locations(profile, coord, ts, wide=False):
+    """Broadcast the profiles of unique locations to their plants.
+
+    :param numpy.ndarray profile: profiles of shape (timestamps, locations), the
+        locations being ordered as the keys of ``coord``.
+    :param dict coord: unique locations, as returned by
+        :func:`get_plant_id_unique_location`.
+    :param pandas.DatetimeIndex ts: timestamps.
+    :param bool wide: return a wide data frame instead of the long format one.
+    :return: (*pandas.DataFrame*) -- data frame with *'Pout'*, *'plant_id'*, *'ts'*
+        and *'ts_id'* as columns, sorted by *'ts_id'* then *'plant_id'*. If ``wide``
+        is True, data frame of profiles indexed by timestamp with plant id as
+        columns, sorted, formatted for REISE.
+    """
+    plant_id = np.concatenate([np.asarray(v) for v in coord.values()])
+    location = np.repeat(np.arange(len(coord)), [len(v) for v in coord.values()])
+    order = np.argsort(plant_id, kind="stable")
+    plant_id, location = plant_id[order], location[order]
+
+    if wide:
+        data = pd.DataFrame(profile[:, location], index=ts, columns=plant_id)
+        data.index.name = "UTC"
+        return data
+
+    n_ts, n_plant = len(ts), len(plant_id)
+    return pd.DataFrame(
+        {
+            "Pout": profile[:, location].ravel(),
+            "plant_id": np.tile(plant_id, n_ts).astype(np.int32),
+            "ts": np.repeat(ts.to_numpy(), n_plant),
+            "ts_id": np.repeat(np.arange(1, n_ts + 1, dtype=np.int32), n_plant),
+        }
+    )
@@ -1,14 +1,21 @@
+import asyncio
+import csv
+import hashlib
 import os
 import pickle
+import queue
+import tempfile
+import threading
 from dataclasses import dataclass
 from datetime import timedelta
 from io import BytesIO
 
+import numpy as np
 import pandas as pd
 import requests
-from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectionError, Timeout
 
-from prereise.gather.request_util import TransientError, retry
+from prereise.gather.request_util import TokenBucket, TransientError, retry
 
 
 @dataclass
@@ -72,6 +79,110 @@ class Psm3Data:
         return result
 
 
+class Psm3Cache:
+    """Binary cache of PSM3 data. Each location-year is stored as a typed (float32)
+    array in a memory-mappable .npy file, in a sub-directory per year. An index file
+    maps (lat, lon, attributes, year, leap_day) to the array file, the column names
+    and the location metadata, and is read once per instance.
+
+    :param str cache_dir: directory to store data in.
+    """
+
+    index_columns = [
+        "lat",
+        "lon",
+        "attributes",
+        "year",
+        "leap_day",
+        "tz",
+        "elevation",
+        "columns",
+        "file",
+    ]
+    dtype = np.float32
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, "psm3_index.csv")
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = {}
+        if os.path.isfile(self.index_path):
+            with open(self.index_path, newline="") as f:
+                for row in csv.DictReader(f):
+                    self._index[self._key_from_row(row)] = row
+
+    @staticmethod
+    def _key(lat, lon, attributes, year, leap_day):
+        return (
+            str(float(lat)),
+            str(float(lon)),
+            attributes,
+            str(year),
+            str(leap_day).lower(),
+        )
+
+    def _key_from_row(self, row):
+        return tuple(row[c] for c in self.index_columns[:5])
+
+    def get(self, lat, lon, attributes, year, leap_day):
+        """Load PSM3 data from the cache.
+
+        :param str lat: latitude of the plant
+        :param str lon: longitude of the plant
+        :param str attributes: comma separated list of attributes
+        :param str year: the year
+        :param bool leap_day: whether a leap day is included
+        :return: (*tuple*) -- time zone, elevation and data frame of the time series
+            (backed by a read-only memory-mapped array), or None if not in the cache.
+        """
+        row = self._index.get(self._key(lat, lon, attributes, year, leap_day))
+        if row is None:
+            return None
+        values = np.load(os.path.join(self.cache_dir, row["file"]), mmap_mode="r")
+        data_resource = pd.DataFrame(values, columns=row["columns"].split(","))
+        return float(row["tz"]), float(row["elevation"]), data_resource
+
+    def put(self, lat, lon, attributes, year, leap_day, tz, elevation, data_resource):
+        """Store PSM3 data in the cache.
+
+        :param str lat: latitude of the plant
+        :param str lon: longitude of the plant
+        :param str attributes: comma separated list of attributes
+        :param str year: the year
+        :param bool leap_day: whether a leap day is included
+        :param float tz: local time zone
+        :param float elevation: elevation
+        :param pandas.DataFrame data_resource: time series
+        """
+        key = self._key(lat, lon, attributes, year, leap_day)
+        filename = os.path.join(
+            f"psm3_{year}", f"{hashlib.sha1(repr(key).encode()).hexdigest()}.npy"
+        )
+        path = os.path.join(self.cache_dir, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, data_resource.to_numpy(dtype=self.dtype))
+        os.replace(tmp_path, path)
+
+        row = dict(zip(self.index_columns, key))
+        row.update(
+            {
+                "tz": tz,
+                "elevation": elevation,
+                "columns": ",".join(data_resource.columns),
+                "file": filename,
+            }
+        )
+        new_index = not os.path.isfile(self.index_path)
+        with open(self.index_path, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=self.index_columns)
+            if new_index:
+                writer.writeheader()
+            writer.writerow(row)
+        self._index[key] = {k: str(v) for k, v in row.items()}
+
+
 class NrelApi:
     """Provides an interface to the NREL API for PSM3 data. It supports
     downloading this data in csv format, which we use to calculate solar output
@@ -83,6 +194,8 @@ class NrelApi:
     :param int/float rate_limit: minimum seconds to wait between requests to NREL
     """
 
+    base_url = "https://developer.nrel.gov/api/solar/nsrdb_psm3_download.csv"
+
     def __init__(self, email, api_key, rate_limit=None):
         """Constructor"""
         if email is None:
@@ -93,6 +206,7 @@ class NrelApi:
         self.email = email
         self.api_key = api_key
         self.interval = rate_limit
+        self._psm3_caches = {}
 
     def _build_url(self, lat, lon, attributes, year="2016", leap_day=False):
         """Construct url with formatted query string for downloading psm3
@@ -105,7 +219,6 @@ class NrelApi:
         :param bool leap_day: whether to use a leap day
         :return: (*str*) -- the url to download csv data
         """
-        base_url = "https://developer.nrel.gov/api/solar/nsrdb_psm3_download.csv"
         payload = {
             "api_key": self.api_key,
             "names": year,
@@ -117,7 +230,7 @@ class NrelApi:
             "wkt": f"POINT({lon}%20{lat})",
         }
         query = "&".join([f"{key}={value}" for key, value in payload.items()])
-        return f"{base_url}?{query}"
+        return f"{self.base_url}?{query}"
 
     @staticmethod
     def _build_filename(lat, lon, attributes, year="2016", leap_day=False):
@@ -131,7 +244,15 @@ class NrelApi:
         return f"{filename}.pkl"
 
     def get_psm3_at(
-        self, lat, lon, attributes, year, leap_day, dates=None, cache_dir=None
+        self,
+        lat,
+        lon,
+        attributes,
+        year,
+        leap_day,
+        dates=None,
+        cache_dir=None,
+        cache_format="pickle",
     ):
         """Get PSM3 data at a given point for the specified year.
 
@@ -142,8 +263,13 @@ class NrelApi:
         :param bool leap_day: whether to use a leap day
         :param pd.DatetimeIndex dates: if provided, use to index the downloaded data frame
         :param str cache_dir: directory to cache downloaded data. If None, don't cache.
+        :param str cache_format: format of the cache, either *'pickle'* (one pickled
+            :class:`Psm3Data` per file) or *'npy'* (see :class:`Psm3Cache`). With
+            *'npy'*, values are stored as float32 and data are returned from the
+            stored arrays, so a warm run gets the same values as a cold one.
 
         :return: (*prereise.gather.solardata.nsrdb.nrel_api.Psm3Data*) -- a data class containing metadata and time series for the given year and location
+        :raises ValueError: if ``cache_format`` is unknown.
         """
 
         @retry(
@@ -159,35 +285,289 @@ class NrelApi:
                 raise Exception(f"Request failed: status_code={resp.status_code}")
             return resp
 
-        def format_to_psm3data(resp):
-            info = pd.read_csv(BytesIO(resp.content), nrows=1)
-            data_resource = pd.read_csv(BytesIO(resp.content), dtype=float, skiprows=2)
+        query = (lat, lon, attributes, year, leap_day, dates, cache_dir, cache_format)
+        psm3_data = self._load_psm3(*query)
+        if psm3_data is None:
+            url = self._build_url(lat, lon, attributes, year, leap_day)
+            psm3_data = self._store_psm3(download(url).content, *query)
+        return psm3_data
 
-            tz, elevation = info["Local Time Zone"], info["Elevation"]
+    @staticmethod
+    def _parse_psm3(content):
+        """Parse a PSM3 csv file.
 
-            if dates is not None:
-                data_resource.set_index(
-                    dates + timedelta(hours=int(tz.values[0])), inplace=True
-                )
-            return Psm3Data(
-                float(lat), float(lon), float(tz), float(elevation), data_resource
-            )
+        :param bytes content: content of the csv file.
+        :return: (*tuple*) -- local time zone, elevation and data frame of the time
+            series.
+        """
+        # The first two lines hold metadata, the time series follows
+        header, values, content = content.split(b"\n", 2)
+        lines = [header.decode().rstrip("\r"), values.decode().rstrip("\r")]
+        info = dict(zip(*csv.reader(lines)))
+        data_resource = pd.read_csv(BytesIO(content), dtype=float)
+        return float(info["Local Time Zone"]), float(info["Elevation"]), data_resource
+
+    @staticmethod
+    def _to_psm3data(lat, lon, dates, tz, elevation, data_resource):
+        if dates is not None:
+            data_resource.set_index(dates + timedelta(hours=int(tz)), inplace=True)
+        return Psm3Data(float(lat), float(lon), tz, elevation, data_resource)
+
+    def _get_psm3_cache(self, cache_dir):
+        if cache_dir not in self._psm3_caches:
+            self._psm3_caches[cache_dir] = Psm3Cache(cache_dir)
+        return self._psm3_caches[cache_dir]
+
+    def _load_psm3(
+        self, lat, lon, attributes, year, leap_day, dates, cache_dir, cache_format
+    ):
+        """Load PSM3 data from the cache. See :meth:`get_psm3_at` for the
+        parameters.
 
+        :return: (*prereise.gather.solardata.nsrdb.nrel_api.Psm3Data*) -- cached
+            data, or None if not in the cache.
+        :raises ValueError: if ``attributes`` or ``cache_format`` are unknown.
+        """
         Psm3Data.check_attrs(attributes)
+        if cache_format not in {"pickle", "npy"}:
+            raise ValueError("cache_format must be either 'pickle' or 'npy'")
+        if cache_dir is None:
+            return None
+        if cache_format == "npy":
+            cache = self._get_psm3_cache(cache_dir)
+            cached = cache.get(lat, lon, attributes, year, leap_day)
+            return (
+                None if cached is None else self._to_psm3data(lat, lon, dates, *cached)
+            )
+        os.makedirs(cache_dir, exist_ok=True)
+        filename = self._build_filename(lat, lon, attributes, year, leap_day)
+        try:
+            with open(os.path.join(cache_dir, filename), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _store_psm3(
+        self,
+        content,
+        lat,
+        lon,
+        attributes,
+        year,
+        leap_day,
+        dates,
+        cache_dir,
+        cache_format,
+    ):
+        """Parse downloaded PSM3 data and store it in the cache. See
+        :meth:`get_psm3_at` for the parameters.
+
+        :param bytes content: content of the downloaded csv file.
+        :return: (*prereise.gather.solardata.nsrdb.nrel_api.Psm3Data*) -- data, as
+            loaded from the cache if ``cache_format`` is *'npy'*.
+        """
+        parsed = self._parse_psm3(content)
+        if cache_dir is not None and cache_format == "npy":
+            cache = self._get_psm3_cache(cache_dir)
+            cache.put(lat, lon, attributes, year, leap_day, *parsed)
+            cached = cache.get(lat, lon, attributes, year, leap_day)
+            return self._to_psm3data(lat, lon, dates, *cached)
+        psm3_data = self._to_psm3data(lat, lon, dates, *parsed)
         if cache_dir is not None:
-            os.makedirs(cache_dir, exist_ok=True)
             filename = self._build_filename(lat, lon, attributes, year, leap_day)
-            filepath = os.path.join(cache_dir, filename)
-            try:
-                with open(filepath, "rb") as f:
-                    psm3_data = pickle.load(f)
-                    return psm3_data
-            except FileNotFoundError:
-                pass
-        url = self._build_url(lat, lon, attributes, year, leap_day)
-        resp = download(url)
-        psm3_data = format_to_psm3data(resp)
-        if cache_dir is not None:
-            with open(filepath, "wb") as f:
+            with open(os.path.join(cache_dir, filename), "wb") as f:
                 pickle.dump(psm3_data, f)
         return psm3_data
+
+
+class AsyncPsm3Fetcher:
+    """Downloads PSM3 data for many locations concurrently, using asyncio. Requests
+    are spread over one or several API keys, each one with its own token bucket.
+    When the server answers 429 (too many requests), the bucket of the key is
+    paused with exponential backoff and the request is sent again.
+
+    :param str email: email used for API key
+        `sign up <https://developer.nrel.gov/signup/>`_.
+    :param str/list api_keys: API key(s).
+    :param int/float rate: requests per second allowed for each key. If None,
+        requests are not rate limited.
+    :param int burst: number of requests that can be sent at once with a key.
+    :param int max_in_flight: maximum number of locations being downloaded or
+        waiting to be consumed.
+    :param int max_attempts: maximum number of attempts per request.
+    :param int/float backoff: seconds to wait after the first failed attempt,
+        doubling after each subsequent failure.
+    :param int/float timeout: timeout of a request in seconds.
+    :raises ValueError: if no API key is given or ``max_in_flight`` is not a
+        positive integer.
+    """
+
+    def __init__(
+        self,
+        email,
+        api_keys,
+        rate=2,
+        burst=1,
+        max_in_flight=4,
+        max_attempts=5,
+        backoff=1,
+        timeout=120,
+    ):
+        """Constructor"""
+        if isinstance(api_keys, str):
+            api_keys = [api_keys]
+        if not api_keys:
+            raise ValueError("At least one API key is required")
+        if not isinstance(max_in_flight, int) or max_in_flight < 1:
+            raise ValueError("max_in_flight must be a positive integer")
+        self.apis = [NrelApi(email, key) for key in api_keys]
+        self.buckets = [TokenBucket(rate, burst) for _ in api_keys]
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.timeout = timeout
+        self.stats = {"requests": 0, "throttled": 0}
+        # Cache reads and writes happen in worker threads
+        self._cache_lock = threading.Lock()
+
+    def _load(self, *query):
+        with self._cache_lock:
+            return self.apis[0]._load_psm3(*query)
+
+    def _store(self, content, *query):
+        with self._cache_lock:
+            return self.apis[0]._store_psm3(content, *query)
+
+    async def _download(self, lat, lon, attributes, year, leap_day):
+        """Download a PSM3 csv file with the key available first.
+
+        :return: (*bytes*) -- content of the file.
+        :raises TransientError: if all attempts failed.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_attempts):
+            wait = self.backoff * 2**attempt
+            i = min(range(len(self.buckets)), key=lambda i: self.buckets[i].delay())
+            await self.buckets[i].acquire()
+            url = self.apis[i]._build_url(lat, lon, attributes, year, leap_day)
+            self.stats["requests"] += 1
+            try:
+                resp = await loop.run_in_executor(
+                    None, lambda: requests.get(url, timeout=self.timeout)
+                )
+            except (ConnectionError, Timeout):
+                await asyncio.sleep(wait)
+                continue
+            if resp.status_code == 429:
+                self.stats["throttled"] += 1
+                retry_after = resp.headers.get("Retry-After", "")
+                self.buckets[i].pause(
+                    float(retry_after) if retry_after.isdigit() else wait
+                )
+                continue
+            if resp.status_code != 200:
+                raise Exception(f"Request failed: status_code={resp.status_code}")
+            return resp.content
+        raise TransientError(f"Download failed after {self.max_attempts} attempts")
+
+    async def fetch(
+        self,
+        lat,
+        lon,
+        attributes,
+        year,
+        leap_day,
+        dates=None,
+        cache_dir=None,
+        cache_format="pickle",
+    ):
+        """Get PSM3 data at a given point for the specified year. See
+        :meth:`NrelApi.get_psm3_at` for the parameters.
+
+        :return: (*prereise.gather.solardata.nsrdb.nrel_api.Psm3Data*) -- a data
+            class containing metadata and time series for the given year and
+            location.
+        """
+        loop = asyncio.get_running_loop()
+        query = (lat, lon, attributes, year, leap_day, dates, cache_dir, cache_format)
+        psm3_data = await loop.run_in_executor(None, self._load, *query)
+        if psm3_data is None:
+            content = await self._download(lat, lon, attributes, year, leap_day)
+            psm3_data = await loop.run_in_executor(None, self._store, content, *query)
+        return psm3_data
+
+    def iter_psm3(self, locations, attributes, year, leap_day, **kwargs):
+        """Download PSM3 data for a sequence of locations in a background thread,
+        yielding the data as it arrives. At most ``max_in_flight`` locations are
+        downloaded or held while waiting to be consumed, so a slow consumer (e.g.
+        SAM runs) throttles the downloads.
+
+        :param iterable locations: (key, lat, lon) tuples.
+        :param str attributes: comma separated list of attributes to query.
+        :param str year: the year.
+        :param bool leap_day: whether to use a leap day.
+        :param \\*\\*kwargs: optional arguments of :meth:`fetch`.
+        :return: (*generator*) -- (key, Psm3Data) tuples, in completion order.
+        """
+        results = queue.Queue()
+        stop = threading.Event()
+        done = object()
+        state = {}
+
+        async def produce():
+            # A slot is taken per location and freed once the consumer took it
+            state["loop"] = asyncio.get_running_loop()
+            state["slots"] = slots = asyncio.Semaphore(self.max_in_flight)
+
+            async def fetch_one(key, lat, lon):
+                try:
+                    psm3_data = await self.fetch(
+                        lat, lon, attributes, year, leap_day, **kwargs
+                    )
+                    results.put((key, psm3_data))
+                except Exception as e:
+                    results.put((key, e))
+
+            tasks = []
+            for key, lat, lon in locations:
+                await slots.acquire()
+                if stop.is_set():
+                    break
+                tasks.append(asyncio.ensure_future(fetch_one(key, lat, lon)))
+            if stop.is_set():
+                for task in tasks:
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        def run():
+            try:
+                asyncio.run(produce())
+            except Exception as e:
+                results.put((None, e))
+            finally:
+                results.put(done)
+
+        def release_slot():
+            try:
+                state["loop"].call_soon_threadsafe(state["slots"].release)
+            except (KeyError, RuntimeError):
+                # The producer hasn't started or is already finished
+                pass
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = results.get()
+                if item is done:
+                    break
+                release_slot()
+                key, value = item
+                if isinstance(value, Exception):
+                    raise value
+                yield key, value
+        finally:
+            stop.set()
+            # Wake the producer up if it waits for a slot
+            release_slot()
+            thread.join()
@@ -1,11 +1,19 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
 import numpy as np
 import pandas as pd
+import PySAM
 import PySAM.Pvwattsv7 as PVWatts
 import PySAM.PySSC as pssc  # noqa: N813
 from tqdm import tqdm
 
 from prereise.gather.solardata.helpers import get_plant_id_unique_location
-from prereise.gather.solardata.nsrdb.nrel_api import NrelApi
+from prereise.gather.solardata.nsrdb.nrel_api import AsyncPsm3Fetcher, NrelApi
 from prereise.gather.solardata.pv_tracking import (
     get_pv_tracking_data,
     get_pv_tracking_ratio_state,
@@ -55,6 +63,255 @@ def calculate_power(solar_data, pv_dict):
     return np.array(pv.Outputs.gen)
 
 
+class PowerCache:
+    """Content-addressed store of power output calculated by SAM. Entries are keyed
+    on a digest of the weather data and the PV parameters, so identical simulations
+    are run once, even across plants, tracking types or runs.
+
+    :param str cache_dir: directory where power output is stored as .npy files. If
+        None, power output is only kept in memory.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self._memory = {}
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def weather_digest(solar_data):
+        """Compute a digest of weather data.
+
+        :param dict solar_data: weather data as returned by :meth:`Psm3Data.to_dict`.
+        :return: (*str*) -- hexadecimal digest.
+        """
+        h = hashlib.sha1()
+        for k in sorted(solar_data):
+            h.update(k.encode())
+            h.update(np.asarray(solar_data[k], dtype=float).tobytes())
+        return h.hexdigest()
+
+    @staticmethod
+    def key(weather_digest, pv_dict):
+        """Build the key of a SAM simulation.
+
+        :param str weather_digest: digest of the weather data, see
+            :meth:`weather_digest`.
+        :param dict pv_dict: solar plant attributes.
+        :return: (*str*) -- hexadecimal key.
+        """
+        parameters = {
+            k: float(v) if isinstance(v, (int, float, np.number)) else v
+            for k, v in pv_dict.items()
+        }
+        content = json.dumps(
+            [PySAM.__version__, weather_digest, parameters], sort_keys=True
+        )
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key):
+        """Look up power output, in memory first and then on disk.
+
+        :param str key: key of the SAM simulation, see :meth:`key`.
+        :return: (*numpy.array*) -- hourly power output, or None if not found.
+        """
+        if key in self._memory:
+            return self._memory[key]
+        if self.cache_dir is not None and os.path.isfile(self._path(key)):
+            self._memory[key] = np.load(self._path(key))
+            return self._memory[key]
+        return None
+
+    def put(self, key, power):
+        """Store power output.
+
+        :param str key: key of the SAM simulation, see :meth:`key`.
+        :param numpy.array power: hourly power output.
+        """
+        self._memory[key] = power
+        if self.cache_dir is not None:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, power)
+            os.replace(tmp_path, self._path(key))
+
+
+def _calculate_power_timed(solar_data, pv_dict):
+    """Run :func:`calculate_power` and measure how long it takes.
+
+    :param dict solar_data: weather data as returned by :meth:`Psm3Data.to_dict`.
+    :param dict pv_dict: solar plant attributes.
+    :return: (*tuple*) -- hourly power output and duration in seconds.
+    """
+    start = time.perf_counter()
+    power = calculate_power(solar_data, pv_dict)
+    return power, time.perf_counter() - start
+
+
+def _run_sam_jobs(jobs, n_jobs=1, power_cache=None):
+    """Run SAM for a sequence of jobs, in the current process or in a pool of worker
+    processes. Jobs are consumed lazily, so that weather data downloads overlap with
+    SAM runs when workers are used. Jobs with the same weather data and PV parameters
+    as a previous job are not run again.
+
+    :param iterable jobs: (key, solar_data, pv_dict) tuples, see
+        :func:`calculate_power`. Consecutive jobs for the same location should share
+        the same ``solar_data`` object, so that its digest is computed once.
+    :param int n_jobs: number of worker processes. If 1, run in the current process.
+    :param PowerCache power_cache: store of previously calculated power output. If
+        None, an in-memory store is used.
+    :return: (*tuple*) -- dictionary of hourly power output by job key, and
+        dictionary of time spent in seconds producing jobs (*'download'*) and running
+        SAM (*'sam'*, summed over workers), and of the number of SAM runs (*'runs'*)
+        and of jobs served from the store (*'reused'*).
+    :raises ValueError: if ``n_jobs`` is not a positive integer.
+    """
+    if not isinstance(n_jobs, int) or n_jobs < 1:
+        raise ValueError("n_jobs must be a positive integer")
+    if power_cache is None:
+        power_cache = PowerCache()
+    jobs = iter(jobs)
+    stats = {"download": 0.0, "sam": 0.0, "runs": 0, "reused": 0}
+    results = {}
+    # Keys of the jobs waiting for each SAM simulation being run
+    waiting = {}
+    last_weather = [None, None]
+
+    def next_job():
+        start = time.perf_counter()
+        job = next(jobs, None)
+        stats["download"] += time.perf_counter() - start
+        if job is None:
+            return None
+        key, solar_data, pv_dict = job
+        if solar_data is not last_weather[0]:
+            last_weather[:] = [solar_data, PowerCache.weather_digest(solar_data)]
+        return key, solar_data, pv_dict, PowerCache.key(last_weather[1], pv_dict)
+
+    def is_new(key, sam_key):
+        if sam_key in waiting:
+            waiting[sam_key].append(key)
+            stats["reused"] += 1
+            return False
+        power = power_cache.get(sam_key)
+        if power is not None:
+            results[key] = power
+            stats["reused"] += 1
+            return False
+        waiting[sam_key] = [key]
+        return True
+
+    def collect(sam_key, power, elapsed):
+        power_cache.put(sam_key, power)
+        for key in waiting.pop(sam_key):
+            results[key] = power
+        stats["sam"] += elapsed
+        stats["runs"] += 1
+
+    if n_jobs == 1:
+        job = next_job()
+        while job is not None:
+            key, solar_data, pv_dict, sam_key = job
+            if is_new(key, sam_key):
+                collect(sam_key, *_calculate_power_timed(solar_data, pv_dict))
+            job = next_job()
+        return results, stats
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        pending = {}
+        job = next_job()
+        while job is not None:
+            key, solar_data, pv_dict, sam_key = job
+            if is_new(key, sam_key):
+                future = executor.submit(_calculate_power_timed, solar_data, pv_dict)
+                pending[future] = sam_key
+            # Bound the number of jobs (and weather data) held in memory
+            if len(pending) >= 2 * n_jobs:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(pending.pop(future), *future.result())
+            job = next_job()
+        for future in list(pending):
+            collect(pending.pop(future), *future.result())
+    return results, stats
+
+
+def _print_stats(stats):
+    """Print time spent per stage and number of SAM runs.
+
+    :param dict stats: statistics as returned by :func:`_run_sam_jobs`.
+    """
+    print(
+        f"Download: {stats['download']:.1f} s, SAM: {stats['sam']:.1f} s, "
+        f"SAM runs: {stats['runs']}, reused: {stats['reused']}"
+    )
+
+
+def _iter_weather(
+    email,
+    api_key,
+    coord,
+    year,
+    dates,
+    rate_limit,
+    cache_dir,
+    cache_format,
+    concurrent_downloads,
+):
+    """Download the weather data used by SAM for each unique location.
+
+    :param str email: email used to`sign up <https://developer.nrel.gov/signup/>`_.
+    :param str/list api_key: API key(s).
+    :param dict coord: plant ids by location, see
+        :func:`prereise.gather.solardata.helpers.get_plant_id_unique_location`.
+    :param int/str year: year.
+    :param pandas.DatetimeIndex dates: timestamps used to index the data.
+    :param int/float rate_limit: minimum seconds to wait between requests sent
+        with an API key.
+    :param str cache_dir: directory to cache downloaded data. If None, don't cache.
+    :param str cache_format: format of the downloaded data cache.
+    :param int concurrent_downloads: number of locations downloaded concurrently.
+        If greater than 1, or if several API keys are given, downloads are run by
+        :class:`prereise.gather.solardata.nsrdb.nrel_api.AsyncPsm3Fetcher` in a
+        background thread and locations are yielded in completion order.
+    :return: (*generator*) -- location key and weather data, as returned by
+        :meth:`prereise.gather.solardata.nsrdb.nrel_api.Psm3Data.to_dict`.
+    :raises ValueError: if ``concurrent_downloads`` is not a positive integer.
+    """
+    if not isinstance(concurrent_downloads, int) or concurrent_downloads < 1:
+        raise ValueError("concurrent_downloads must be a positive integer")
+    query = {
+        "attributes": "dhi,dni,wind_speed,air_temperature",
+        "year": year,
+        "leap_day": False,
+        "dates": dates,
+        "cache_dir": cache_dir,
+        "cache_format": cache_format,
+    }
+    if concurrent_downloads == 1 and isinstance(api_key, str):
+        api = NrelApi(email, api_key, rate_limit)
+        for key in tqdm(coord.keys(), total=len(coord)):
+            yield key, api.get_psm3_at(key[1], key[0], **query).to_dict()
+        return
+
+    fetcher = AsyncPsm3Fetcher(
+        email,
+        api_key,
+        rate=None if not rate_limit else 1 / rate_limit,
+        max_in_flight=concurrent_downloads,
+    )
+    locations = [(key, key[1], key[0]) for key in coord.keys()]
+    for key, psm3_data in tqdm(fetcher.iter_psm3(locations, **query), total=len(coord)):
+        yield key, psm3_data.to_dict()
+    print(
+        f"PSM3 requests: {fetcher.stats['requests']}, "
+        f"throttled: {fetcher.stats['throttled']}"
+    )
+
+
 def retrieve_data_blended(
     email,
     api_key,
@@ -64,6 +321,10 @@ def retrieve_data_blended(
     year="2016",
     rate_limit=0.5,
     cache_dir=None,
+    n_jobs=1,
+    sam_cache_dir=None,
+    cache_format="pickle",
+    concurrent_downloads=1,
 ):
     """Retrieves irradiance data from NSRDB and calculate the power output using
     the System Adviser Model (SAM). Either a Grid object needs to be passed to ``grid``,
@@ -71,7 +332,7 @@ def retrieve_data_blended(
     passed to ``interconnect_to_state_abvs``).
 
     :param str email: email used to`sign up <https://developer.nrel.gov/signup/>`_.
-    :param str api_key: API key.
+    :param str/list api_key: API key, or list of API keys to spread requests over.
     :param powersimdata.input.grid.Grid: grid instance.
     :param pandas.DataFrame solar_plant: plant data frame.
     :param dict/pandas.Series interconnect_to_state_abvs: mapping of interconnection
@@ -79,7 +340,19 @@ def retrieve_data_blended(
         when average parameters by state are not available.
     :param int/str year: year.
     :param int/float rate_limit: minimum seconds to wait between requests to NREL
+        sent with an API key.
     :param str cache_dir: directory to cache downloaded data. If None, don't cache.
+    :param int n_jobs: number of worker processes running SAM. If 1, SAM runs in the
+        current process.
+    :param str sam_cache_dir: directory to store power output calculated by SAM,
+        see :class:`PowerCache`. If None, identical SAM runs are only deduplicated
+        within this call.
+    :param str cache_format: format of the downloaded data cache, see
+        :meth:`prereise.gather.solardata.nsrdb.nrel_api.NrelApi.get_psm3_at`.
+    :param int concurrent_downloads: number of locations downloaded concurrently
+        while SAM runs. If greater than 1, or if several API keys are given,
+        downloads are scheduled with a token bucket per API key, see
+        :class:`prereise.gather.solardata.nsrdb.nrel_api.AsyncPsm3Fetcher`.
     :return: (*pandas.DataFrame*) -- data frame with *'Pout'*, *'plant_id'*,
         *'ts'* and *'ts_id'* as columns. Values are power output for a 1MW generator.
     """
@@ -132,50 +405,62 @@ def retrieve_data_blended(
 
     # Inverter Loading Ratio
     ilr = 1.25
-    api = NrelApi(email, api_key, rate_limit)
 
     # Identify unique location
     coord = get_plant_id_unique_location(solar_plant)
+    weather = _iter_weather(
+        email,
+        api_key,
+        coord,
+        year,
+        sam_dates,
+        rate_limit,
+        cache_dir,
+        cache_format,
+        concurrent_downloads,
+    )
+
+    def jobs():
+        for key, solar_data in weather:
+            # Calculate power once per location and array type
+            for j, axis in enumerate([0, 2, 4]):
+                plant_pv_dict = {
+                    "system_capacity": ilr,
+                    "dc_ac_ratio": ilr,
+                    "array_type": axis,
+                }
+                pv_dict = {**default_pv_parameters, **plant_pv_dict}
+                yield (key, j), solar_data, pv_dict
+
+    results, stats = _run_sam_jobs(jobs(), n_jobs, PowerCache(sam_cache_dir))
+    _print_stats(stats)
 
     data = {}
-    for key, plants in tqdm(coord.items(), total=len(coord)):
-        lat, lon = key[1], key[0]
-        solar_data = api.get_psm3_at(
-            lat,
-            lon,
-            attributes="dhi,dni,wind_speed,air_temperature",
-            year=year,
-            leap_day=False,
-            dates=sam_dates,
-            cache_dir=cache_dir,
-        ).to_dict()
-
-        for i, plant_id in enumerate(plants):
-            if i == 0:
-                # Calculate power for the first plant at each location
-                first_plant_id = plant_id
-                tracking_ratios = frac[solar_plant.loc[plant_id].zone_id]
-                power = 0
-                for j, axis in enumerate([0, 2, 4]):
-                    plant_pv_dict = {
-                        "system_capacity": ilr,
-                        "dc_ac_ratio": ilr,
-                        "array_type": axis,
-                    }
-                    pv_dict = {**default_pv_parameters, **plant_pv_dict}
-                    power += tracking_ratios[j] * calculate_power(solar_data, pv_dict)
-                if leap_day is not None:
-                    power = np.insert(power, leap_day, power[leap_day - 24 : leap_day])
-            else:
-                # For every other plant, look up power from first plant at the location
-                power = data[first_plant_id]
+    for key, plants in coord.items():
+        # Every plant at a location uses the tracking ratios of the first plant
+        tracking_ratios = frac[solar_plant.loc[plants[0]].zone_id]
+        power = 0
+        for j in range(3):
+            power += tracking_ratios[j] * results[(key, j)]
+        if leap_day is not None:
+            power = np.insert(power, leap_day, power[leap_day - 24 : leap_day])
+        for plant_id in plants:
             data[plant_id] = power
 
     return pd.DataFrame(data, index=real_dates).sort_index(axis="columns")
 
 
 def retrieve_data_individual(
-    email, api_key, solar_plant, year="2016", rate_limit=0.5, cache_dir=None
+    email,
+    api_key,
+    solar_plant,
+    year="2016",
+    rate_limit=0.5,
+    cache_dir=None,
+    n_jobs=1,
+    sam_cache_dir=None,
+    cache_format="pickle",
+    concurrent_downloads=1,
 ):
     """Retrieves irradiance data from NSRDB and calculate the power output using
     the System Adviser Model (SAM). Either a Grid object needs to be passed to ``grid``,
@@ -183,13 +468,25 @@ def retrieve_data_individual(
     passed to ``grid_model``.
 
     :param str email: email used to`sign up <https://developer.nrel.gov/signup/>`_.
-    :param str api_key: API key.
+    :param str/list api_key: API key, or list of API keys to spread requests over.
     :param pandas.DataFrame solar_plant: plant data frame, plus additional boolean
         columns 'Single-Axis Tracking?', 'Dual-Axis Tracking?', 'Fixed Tilt?', and float
         columns 'Tilt Angle', 'Nameplate Capacity (MW)', and 'DC Net Capacity (MW)'.
     :param int/str year: year.
     :param int/float rate_limit: minimum seconds to wait between requests to NREL
+        sent with an API key.
     :param str cache_dir: directory to cache downloaded data. If None, don't cache.
+    :param int n_jobs: number of worker processes running SAM. If 1, SAM runs in the
+        current process.
+    :param str sam_cache_dir: directory to store power output calculated by SAM,
+        see :class:`PowerCache`. If None, identical SAM runs are only deduplicated
+        within this call.
+    :param str cache_format: format of the downloaded data cache, see
+        :meth:`prereise.gather.solardata.nsrdb.nrel_api.NrelApi.get_psm3_at`.
+    :param int concurrent_downloads: number of locations downloaded concurrently
+        while SAM runs. If greater than 1, or if several API keys are given,
+        downloads are scheduled with a token bucket per API key, see
+        :class:`prereise.gather.solardata.nsrdb.nrel_api.AsyncPsm3Fetcher`.
     :return: (*pandas.DataFrame*) -- data frame with *'Pout'*, *'plant_id'*,
         *'ts'* and *'ts_id'* as columns. Values are power output for a 1MW generator.
     """
@@ -213,38 +510,41 @@ def retrieve_data_individual(
     )
     sam_dates, leap_day = generate_timestamps_without_leap_day(year)
 
-    api = NrelApi(email, api_key, rate_limit)
-
     coord = get_plant_id_unique_location(solar_plant)
+    weather = _iter_weather(
+        email,
+        api_key,
+        coord,
+        year,
+        sam_dates,
+        rate_limit,
+        cache_dir,
+        cache_format,
+        concurrent_downloads,
+    )
 
-    data = {}
-    for key, plants in tqdm(coord.items(), total=len(coord)):
-        lat, lon = key[1], key[0]
-        solar_data = api.get_psm3_at(
-            lat,
-            lon,
-            attributes="dhi,dni,wind_speed,air_temperature",
-            year=year,
-            leap_day=False,
-            dates=sam_dates,
-            cache_dir=cache_dir,
-        ).to_dict()
+    def jobs():
+        for key, solar_data in weather:
+            for plant_id in coord[key]:
+                series = solar_plant.loc[plant_id]
+                ilr = series["DC Net Capacity (MW)"] / series["Nameplate Capacity (MW)"]
+                plant_pv_dict = {
+                    "system_capacity": ilr,
+                    "dc_ac_ratio": ilr,
+                    "array_type": plant_array_types.loc[plant_id],
+                }
+                if plant_pv_dict["array_type"] == 0:
+                    plant_pv_dict["tilt"] = series["Tilt Angle"]
+                pv_dict = {**default_pv_parameters, **plant_pv_dict}
+                yield plant_id, solar_data, pv_dict
 
-        for plant_id in plants:
-            series = solar_plant.loc[plant_id]
-            ilr = series["DC Net Capacity (MW)"] / series["Nameplate Capacity (MW)"]
-            plant_pv_dict = {
-                "system_capacity": ilr,
-                "dc_ac_ratio": ilr,
-                "array_type": plant_array_types.loc[plant_id],
-            }
-            if plant_pv_dict["array_type"] == 0:
-                plant_pv_dict["tilt"] = series["Tilt Angle"]
-            pv_dict = {**default_pv_parameters, **plant_pv_dict}
-            power = calculate_power(solar_data, pv_dict)
-            if leap_day is not None:
-                power = np.insert(power, leap_day, power[leap_day - 24 : leap_day])
+    results, stats = _run_sam_jobs(jobs(), n_jobs, PowerCache(sam_cache_dir))
+    _print_stats(stats)
 
-            data[plant_id] = power
+    data = {}
+    for plant_id, power in results.items():
+        if leap_day is not None:
+            power = np.insert(power, leap_day, power[leap_day - 24 : leap_day])
+        data[plant_id] = power
 
     return pd.DataFrame(data, index=real_dates).sort_index(axis="columns")
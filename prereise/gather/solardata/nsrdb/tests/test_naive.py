@@ -0,0 +1,54 @@
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from prereise.gather.solardata.helpers import to_reise
+from prereise.gather.solardata.nsrdb.naive import retrieve_data
+from prereise.gather.solardata.nsrdb.nrel_api import Psm3Data
+
+
+def _psm3_data(lat, lon, attributes, year, leap_day):
+    dates = pd.date_range(start=year, end=str(int(year) + 1), freq="H")[:-1]
+    hour = dates.hour.to_numpy()
+    ghi = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None) * (900 + lat)
+    data_resource = pd.DataFrame({"GHI": ghi.round()}, index=dates)
+    return Psm3Data(lat, lon, -7.0, 1000.0, data_resource)
+
+
+@pytest.fixture
+def nrel_api():
+    with patch("prereise.gather.solardata.nsrdb.naive.NrelApi") as api:
+        api.return_value.get_psm3_at.side_effect = _psm3_data
+        yield api
+
+
+@pytest.fixture
+def solar_plant():
+    return pd.DataFrame(
+        {"lat": [35.0, 40.0, 35.0, 45.0], "lon": [-110.0, -105.0, -110.0, -100.0]},
+        index=pd.Index([14, 3, 8, 5], name="plant_id"),
+    )
+
+
+def test_retrieve_data(nrel_api, solar_plant):
+    data = retrieve_data(solar_plant, "email", "key", year="2016")
+
+    assert nrel_api.return_value.get_psm3_at.call_count == 3
+    assert data.columns.tolist() == ["Pout", "plant_id", "ts", "ts_id"]
+    assert data["plant_id"].dtype == np.int32
+    assert data["ts_id"].dtype == np.int32
+    assert len(data) == 8784 * 4
+    assert np.array_equal(data["plant_id"], np.tile([3, 5, 8, 14], 8784))
+    assert np.array_equal(data["ts_id"], np.repeat(np.arange(1, 8785), 4))
+    for plant_id, plant in solar_plant.iterrows():
+        ghi = _psm3_data(plant.lat, plant.lon, "ghi", "2016", True).data_resource.GHI
+        pout = data.loc[data.plant_id == plant_id, "Pout"].to_numpy()
+        assert np.array_equal(pout, ghi.to_numpy() / ghi.max())
+
+
+def test_retrieve_data_wide(nrel_api, solar_plant):
+    data = retrieve_data(solar_plant, "email", "key", year="2016", wide=True)
+    expected = to_reise(retrieve_data(solar_plant, "email", "key", year="2016"))
+    pd.testing.assert_frame_equal(data, expected, check_freq=False)
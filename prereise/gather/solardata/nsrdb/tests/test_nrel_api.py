@@ -1,9 +1,17 @@
+import time
 from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pandas as pd
 import pytest
 
-from prereise.gather.solardata.nsrdb.nrel_api import Psm3Data
+from prereise.gather.request_util import TransientError
+from prereise.gather.solardata.nsrdb.nrel_api import (
+    AsyncPsm3Fetcher,
+    NrelApi,
+    Psm3Data,
+)
 
 
 def test_check_attrs():
@@ -27,3 +35,147 @@ def test_psm3_to_dict():
     psm3_dict = psm3.to_dict()
     for k in ("tz", "elev", "day", "month", "year", "dn", "wspd"):
         assert k in psm3_dict.keys()
+
+
+PSM3_CSV = (
+    "Source,Location ID,City,State,Country,Latitude,Longitude,Time Zone,Elevation,"
+    "Local Time Zone\r\n"
+    "NSRDB,123,-,-,-,35.01,-110.02,0,1234,-7\r\n"
+    "Year,Month,Day,Hour,Minute,DHI,DNI,Wind Speed,Temperature\r\n"
+    "2016,1,1,0,30,0,0,2.1,-3.2\r\n"
+    "2016,1,1,1,30,15,120,2.3,-1.7\r\n"
+    "2016,1,1,2,30,40,410,2.6,0.4\r\n"
+).encode()
+
+
+@pytest.fixture
+def psm3_get():
+    with patch("prereise.gather.solardata.nsrdb.nrel_api.requests.get") as get:
+        get.return_value = MagicMock(status_code=200, content=PSM3_CSV)
+        yield get
+
+
+def _get_psm3_at(api, cache_dir, cache_format):
+    return api.get_psm3_at(
+        35.01,
+        -110.02,
+        attributes="dhi,dni,wind_speed,air_temperature",
+        year="2016",
+        leap_day=False,
+        dates=pd.date_range("2016-01-01", periods=3, freq="H"),
+        cache_dir=cache_dir,
+        cache_format=cache_format,
+    )
+
+
+def test_get_psm3_at(psm3_get):
+    psm3 = _get_psm3_at(NrelApi("email", "key"), None, "pickle")
+    assert (psm3.tz, psm3.elevation) == (-7, 1234)
+    assert psm3.data_resource.index[0] == pd.Timestamp("2015-12-31 17:00")
+    assert psm3.data_resource["Temperature"].tolist() == [-3.2, -1.7, 0.4]
+    assert psm3_get.call_count == 1
+
+
+@pytest.mark.parametrize("cache_format", ["pickle", "npy"])
+def test_get_psm3_at_cache(psm3_get, tmp_path, cache_format):
+    psm3 = _get_psm3_at(NrelApi("email", "key"), str(tmp_path), cache_format)
+    warm = _get_psm3_at(NrelApi("email", "key"), str(tmp_path), cache_format)
+    assert psm3_get.call_count == 1
+    assert (warm.lat, warm.lon, warm.tz, warm.elevation) == (35.01, -110.02, -7, 1234)
+    assert warm.data_resource.equals(psm3.data_resource)
+    assert warm.to_dict() == psm3.to_dict()
+
+
+def test_get_psm3_at_npy_cache(psm3_get, tmp_path):
+    api = NrelApi("email", "key")
+    psm3 = _get_psm3_at(api, str(tmp_path), "npy")
+    assert psm3.data_resource.dtypes.unique().tolist() == [np.float32]
+    np.testing.assert_allclose(psm3.data_resource["DNI"], [0, 120, 410])
+    assert (tmp_path / "psm3_index.csv").is_file()
+    assert len(list((tmp_path / "psm3_2016").iterdir())) == 1
+
+    # Another year is a different entry
+    api.get_psm3_at(
+        35.01,
+        -110.02,
+        "dhi,dni,wind_speed,air_temperature",
+        "2017",
+        False,
+        cache_dir=str(tmp_path),
+        cache_format="npy",
+    )
+    assert psm3_get.call_count == 2
+    assert (tmp_path / "psm3_2017").is_dir()
+
+
+def test_get_psm3_at_bad_cache_format():
+    with pytest.raises(ValueError):
+        _get_psm3_at(NrelApi("email", "key"), None, "parquet")
+
+
+def _locations(n):
+    return [(i, 35.0 + i, -110.0) for i in range(n)]
+
+
+def _fetcher(**kwargs):
+    return AsyncPsm3Fetcher("email", ["key1", "key2"], backoff=0, **kwargs)
+
+
+def test_fetcher_iter_psm3(psm3_get):
+    fetcher = _fetcher(rate=1000, max_in_flight=2)
+    results = dict(fetcher.iter_psm3(_locations(6), "dhi,dni", "2016", False))
+    assert sorted(results) == list(range(6))
+    for i, psm3 in results.items():
+        assert (psm3.lat, psm3.tz, psm3.elevation) == (35.0 + i, -7, 1234)
+        assert psm3.data_resource["DNI"].tolist() == [0, 120, 410]
+    urls = [c.args[0] for c in psm3_get.call_args_list]
+    assert len(urls) == 6
+    assert {"api_key=key1" in u for u in urls} == {True, False}
+    assert fetcher.stats == {"requests": 6, "throttled": 0}
+
+
+def test_fetcher_throttled(psm3_get):
+    throttled = MagicMock(status_code=429, headers={"Retry-After": "0"})
+    ok = psm3_get.return_value
+    psm3_get.return_value = None
+    psm3_get.side_effect = [throttled, throttled, ok, ok]
+    fetcher = _fetcher(rate=None, max_in_flight=1)
+    results = list(fetcher.iter_psm3(_locations(2), "dhi", "2016", False))
+    assert [key for key, _ in results] == [0, 1]
+    assert fetcher.stats == {"requests": 4, "throttled": 2}
+
+
+def test_fetcher_max_attempts(psm3_get):
+    psm3_get.return_value = MagicMock(status_code=429, headers={})
+    fetcher = _fetcher(rate=None, max_attempts=3)
+    with pytest.raises(TransientError):
+        list(fetcher.iter_psm3(_locations(1), "dhi", "2016", False))
+    assert psm3_get.call_count == 3
+
+
+def test_fetcher_error(psm3_get):
+    psm3_get.return_value = MagicMock(status_code=400)
+    fetcher = _fetcher(rate=None)
+    with pytest.raises(Exception, match="status_code=400"):
+        list(fetcher.iter_psm3(_locations(3), "dhi", "2016", False))
+
+
+def test_fetcher_bounded_in_flight(psm3_get):
+    fetcher = _fetcher(rate=None, max_in_flight=2)
+    results = fetcher.iter_psm3(_locations(20), "dhi", "2016", False)
+    next(results)
+    # The producer waits for the consumer once two locations are held
+    time.sleep(0.2)
+    assert psm3_get.call_count <= 3
+    results.close()
+    assert psm3_get.call_count <= 3
+
+
+def test_fetcher_cache(psm3_get, tmp_path):
+    fetcher = _fetcher(rate=None)
+    kwargs = {"cache_dir": str(tmp_path), "cache_format": "npy"}
+    cold = dict(fetcher.iter_psm3(_locations(3), "dhi", "2016", False, **kwargs))
+    warm = dict(fetcher.iter_psm3(_locations(3), "dhi", "2016", False, **kwargs))
+    assert psm3_get.call_count == 3
+    for i in range(3):
+        assert warm[i].data_resource.equals(cold[i].data_resource)
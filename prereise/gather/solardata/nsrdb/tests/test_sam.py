@@ -0,0 +1,199 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from prereise.gather.solardata.nsrdb.nrel_api import Psm3Data
+from prereise.gather.solardata.nsrdb.sam import (
+    PowerCache,
+    _run_sam_jobs,
+    calculate_power,
+    default_pv_parameters,
+    generate_timestamps_without_leap_day,
+    retrieve_data_blended,
+    retrieve_data_individual,
+)
+
+
+def _psm3_data(
+    lat, lon, attributes, year, leap_day, dates, cache_dir, cache_format="pickle"
+):
+    hour = dates.hour.to_numpy()
+    sun = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None) * (1 + float(lat) / 100)
+    data_resource = pd.DataFrame(
+        {"DHI": 100 * sun, "DNI": 800 * sun, "Wind Speed": 3.0, "Temperature": 20.0},
+        index=dates,
+    )
+    return Psm3Data(float(lat), float(lon), -7.0, 1000.0, data_resource)
+
+
+@pytest.fixture
+def nrel_api():
+    with patch("prereise.gather.solardata.nsrdb.sam.NrelApi") as api:
+        api.return_value.get_psm3_at.side_effect = _psm3_data
+        yield api
+
+
+@pytest.fixture
+def solar_plant():
+    return pd.DataFrame(
+        {
+            "lat": [35.0, 40.0, 35.0, 40.0],
+            "lon": [-110.0, -105.0, -110.0, -105.0],
+            "zone_id": [209, 210, 209, 210],
+            "state_abv": ["AZ", "CO", "AZ", "CO"],
+            "interconnect": ["Western"] * 4,
+            "Fixed Tilt?": [True, False, False, True],
+            "Single-Axis Tracking?": [False, True, False, False],
+            "Dual-Axis Tracking?": [False, False, True, False],
+            "Tilt Angle": [25.0, 0.0, 0.0, 35.0],
+            "Nameplate Capacity (MW)": [100.0, 50.0, 20.0, 10.0],
+            "DC Net Capacity (MW)": [125.0, 65.0, 24.0, 13.0],
+        },
+        index=pd.Index([14, 3, 8, 5], name="plant_id"),
+    )
+
+
+def test_run_sam_jobs_bad_n_jobs():
+    with pytest.raises(ValueError):
+        _run_sam_jobs([], n_jobs=0)
+
+
+def test_retrieve_data_individual(nrel_api, solar_plant):
+    data = retrieve_data_individual("email", "key", solar_plant, year="2016")
+    assert list(data.columns) == [3, 5, 8, 14]
+    assert len(data) == 8784
+
+    # Check one plant against a direct SAM run, with the leap day duplicated
+    sam_dates, leap_day = generate_timestamps_without_leap_day("2016")
+    solar_data = _psm3_data(40.0, -105.0, None, None, None, sam_dates, None).to_dict()
+    pv_dict = {
+        **default_pv_parameters,
+        "system_capacity": 1.3,
+        "dc_ac_ratio": 1.3,
+        "array_type": 0,
+        "tilt": 35.0,
+    }
+    power = calculate_power(solar_data, pv_dict)
+    power = np.insert(power, leap_day, power[leap_day - 24 : leap_day])
+    np.testing.assert_allclose(data[5], power)
+
+
+def test_retrieve_data_individual_parallel(nrel_api, solar_plant):
+    serial = retrieve_data_individual("email", "key", solar_plant)
+    parallel = retrieve_data_individual("email", "key", solar_plant, n_jobs=2)
+    assert parallel.equals(serial)
+
+
+def test_retrieve_data_blended_parallel(nrel_api, solar_plant):
+    kwargs = {
+        "solar_plant": solar_plant,
+        "interconnect_to_state_abvs": {"Western": ["AZ", "CO"]},
+    }
+    serial = retrieve_data_blended("email", "key", **kwargs)
+    parallel = retrieve_data_blended("email", "key", n_jobs=3, **kwargs)
+    assert list(serial.columns) == [3, 5, 8, 14]
+    assert parallel.equals(serial)
+    # Plants at the same location share the same profile
+    assert serial[3].equals(serial[5])
+    assert serial[8].equals(serial[14])
+    assert not serial[3].equals(serial[8])
+
+
+def test_power_cache_key():
+    digest = PowerCache.weather_digest({"dn": [1, 2], "tz": -7})
+    assert digest != PowerCache.weather_digest({"dn": [1, 3], "tz": -7})
+    pv_dict = {"array_type": 2, "tilt": 30, "losses": 14.0}
+    same = {"tilt": 30.0, "losses": 14, "array_type": np.int64(2)}
+    assert PowerCache.key(digest, pv_dict) == PowerCache.key(digest, same)
+    assert PowerCache.key(digest, pv_dict) != PowerCache.key(
+        digest, {**pv_dict, "array_type": 0}
+    )
+
+
+def test_power_cache_disk(tmp_path):
+    PowerCache(tmp_path).put("abc", np.arange(3.0))
+    cache = PowerCache(tmp_path)
+    np.testing.assert_array_equal(cache.get("abc"), np.arange(3.0))
+    assert cache.get("def") is None
+    assert PowerCache().get("abc") is None
+
+
+def test_power_cache_disk_concurrently(tmp_path):
+    power = np.arange(8760.0)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: PowerCache(tmp_path).put("abc", power), range(16)))
+    assert os.listdir(tmp_path) == ["abc.npy"]
+    np.testing.assert_array_equal(PowerCache(tmp_path).get("abc"), power)
+
+
+def test_run_sam_jobs_dedupe():
+    sam_dates, _ = generate_timestamps_without_leap_day("2015")
+    weather = [
+        _psm3_data(lat, -110, None, None, None, sam_dates, None).to_dict()
+        for lat in (30, 35)
+    ]
+    pv_dict = {**default_pv_parameters, "array_type": 2}
+    jobs = [
+        (0, weather[0], pv_dict),
+        (1, weather[0], {**pv_dict, "array_type": 4}),
+        (2, weather[0], dict(pv_dict)),
+        (3, weather[1], pv_dict),
+        (4, dict(weather[1]), pv_dict),
+    ]
+    with patch(
+        "prereise.gather.solardata.nsrdb.sam.calculate_power",
+        side_effect=lambda solar_data, pv_dict: np.array(
+            [solar_data["lat"], pv_dict["array_type"]]
+        ),
+    ) as calculate:
+        results, stats = _run_sam_jobs(jobs)
+    assert calculate.call_count == 3
+    assert (stats["runs"], stats["reused"]) == (3, 2)
+    assert results[0] is results[2]
+    assert results[3] is results[4]
+    np.testing.assert_array_equal(results[1], [30, 4])
+    np.testing.assert_array_equal(results[3], [35, 2])
+
+
+def test_retrieve_data_individual_sam_cache(nrel_api, solar_plant, tmp_path):
+    data = retrieve_data_individual("email", "key", solar_plant, sam_cache_dir=tmp_path)
+    assert len(list(tmp_path.iterdir())) == 4
+    with patch("prereise.gather.solardata.nsrdb.sam.calculate_power") as calculate:
+        cached = retrieve_data_individual(
+            "email", "key", solar_plant, sam_cache_dir=tmp_path
+        )
+    calculate.assert_not_called()
+    assert cached.equals(data)
+
+
+def test_retrieve_data_concurrent_downloads(nrel_api, solar_plant):
+    def iter_psm3(locations, attributes, year, leap_day, **kwargs):
+        # Downloads complete in any order
+        for key, lat, lon in reversed(locations):
+            yield key, _psm3_data(
+                lat, lon, attributes, year, leap_day, kwargs["dates"], None
+            )
+
+    kwargs = {
+        "solar_plant": solar_plant,
+        "interconnect_to_state_abvs": {"Western": ["AZ", "CO"]},
+    }
+    serial = retrieve_data_blended("email", "key", **kwargs)
+    with patch("prereise.gather.solardata.nsrdb.sam.AsyncPsm3Fetcher") as fetcher:
+        fetcher.return_value.iter_psm3.side_effect = iter_psm3
+        fetcher.return_value.stats = {"requests": 2, "throttled": 0}
+        concurrent = retrieve_data_blended(
+            "email", ["key1", "key2"], rate_limit=0.25, **kwargs
+        )
+        individual = retrieve_data_individual(
+            "email", "key", solar_plant, concurrent_downloads=2
+        )
+    assert fetcher.call_args_list[0].args == ("email", ["key1", "key2"])
+    assert fetcher.call_args_list[0].kwargs == {"rate": 4, "max_in_flight": 1}
+    assert fetcher.call_args_list[1].kwargs == {"rate": 2, "max_in_flight": 2}
+    assert concurrent.equals(serial)
+    assert individual.equals(retrieve_data_individual("email", "key", solar_plant))
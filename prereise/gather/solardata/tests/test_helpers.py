@@ -1,7 +1,12 @@
+import numpy as np
 import pandas as pd
 import pytest
 
-from prereise.gather.solardata.helpers import get_plant_id_unique_location, to_reise
+from prereise.gather.solardata.helpers import (
+    broadcast_locations,
+    get_plant_id_unique_location,
+    to_reise,
+)
 
 
 def test_plant_id_unique_location_type():
@@ -131,3 +136,25 @@ def test_to_reise():
         index=pd.date_range(start="2/4/2019", periods=3, freq="H"),
     ).rename_axis("UTC", axis=0)
     assert to_reise(data).equals(expected)
+
+
+def test_broadcast_locations():
+    coord = {(-100.0, 40.0): [7, 2], (-90.0, 35.0): [4]}
+    profile = np.array([[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]])
+    ts = pd.date_range("2016-01-01", periods=3, freq="H")
+
+    data = broadcast_locations(profile, coord, ts)
+    assert data.columns.tolist() == ["Pout", "plant_id", "ts", "ts_id"]
+    assert data["plant_id"].tolist() == [2, 4, 7] * 3
+    assert data["ts_id"].tolist() == [1, 1, 1, 2, 2, 2, 3, 3, 3]
+    assert data["plant_id"].dtype == np.int32
+    assert data["ts_id"].dtype == np.int32
+    assert np.array_equal(data["ts"].unique(), ts.to_numpy())
+    assert np.allclose(data["Pout"], [0.1, 0.2, 0.1, 0.3, 0.4, 0.3, 0.5, 0.6, 0.5])
+
+    wide = broadcast_locations(profile, coord, ts, wide=True)
+    assert wide.index.name == "UTC"
+    assert wide.columns.tolist() == [2, 4, 7]
+    pd.testing.assert_frame_equal(
+        wide, to_reise(data), check_column_type=False, check_freq=False
+    )
@@ -0,0 +1,25 @@
+import geopandas as gpd
+from shapely.geometry import box
+
+
+def write_county_shapefile(path):
+    """Write a mock county shapefile with three square counties.
+
+    :param pathlib.Path path: path of the shapefile.
+    :return: (*str*) -- path of the shapefile.
+    """
+    counties = gpd.GeoDataFrame(
+        {
+            "NAME": ["Alpha", "Beta", "Gamma"],
+            "STUSPS": ["AA", "AA", "BB"],
+            "GEOID": ["01001", "01003", "02001"],
+            "geometry": [
+                box(-100, 30, -99, 31),
+                box(-99, 30, -98, 31),
+                box(-90, 40, -89, 41),
+            ],
+        },
+        crs="EPSG:4326",
+    )
+    counties.to_file(path)
+    return str(path)
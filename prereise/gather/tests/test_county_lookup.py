@@ -0,0 +1,40 @@
+import pytest
+
+from prereise.gather.county_lookup import find_counties, read_counties
+from prereise.gather.tests.mock_counties import write_county_shapefile
+
+
+@pytest.fixture
+def county_shapefile(tmp_path):
+    return write_county_shapefile(tmp_path / "counties.shp")
+
+
+def test_read_counties(county_shapefile):
+    counties = read_counties(county_shapefile)
+    assert counties.columns.tolist() == ["county", "state", "fips", "geometry"]
+    assert counties["fips"].tolist() == [1001, 1003, 2001]
+
+
+def test_read_counties_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        read_counties(str(tmp_path / "missing.shp"))
+
+
+def test_find_counties(county_shapefile):
+    counties = read_counties(county_shapefile)
+    found = find_counties(
+        [40.5, 30.5, 50.0, 30.5, 30.5],
+        [-89.5, -99.5, -89.5, -98.5, -99.0],
+        counties,
+    )
+    assert found.loc[[0, 1, 3], "county"].tolist() == ["Gamma", "Alpha", "Beta"]
+    assert found.loc[[0, 1, 3], "state"].tolist() == ["BB", "AA", "AA"]
+    assert found.loc[[0, 1, 3], "fips"].tolist() == [2001, 1001, 1003]
+    assert found.loc[2].isna().all()
+    # A point on a border gets one of the counties
+    assert found.loc[4, "county"] in {"Alpha", "Beta"}
+
+
+def test_find_counties_argument_value(county_shapefile):
+    with pytest.raises(ValueError):
+        find_counties([30.5], [-99.5, -98.5], read_counties(county_shapefile))
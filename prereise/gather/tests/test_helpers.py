@@ -1,6 +1,8 @@
+import numpy as np
+import pandas as pd
 import pytest
 
-from prereise.gather.helpers import get_monthly_net_generation
+from prereise.gather.helpers import get_monthly_net_generation, long_to_wide
 from prereise.gather.tests.mock_generation import create_mock_generation_data_frame
 
 
@@ -44,3 +46,37 @@ def test_get_monthly_net_generation():
 
     for i in range(8):
         assert res[i] == [i + 1] * 12
+
+
+def _long_profile(n_ts, plant_id):
+    ts = pd.date_range(start="2016-01-01", periods=n_ts, freq="H")
+    return pd.DataFrame(
+        {
+            "plant_id": np.tile(plant_id, n_ts),
+            "ts": np.repeat(ts, len(plant_id)),
+            "ts_id": np.repeat(np.arange(1, n_ts + 1), len(plant_id)),
+            "Pout": np.arange(n_ts * len(plant_id), dtype=np.float32),
+        }
+    )
+
+
+def test_long_to_wide():
+    data = _long_profile(4, [7, 3, 5])
+    expected = pd.DataFrame(
+        np.arange(12, dtype=np.float32).reshape(4, 3),
+        index=pd.date_range(start="2016-01-01", periods=4, freq="H"),
+        columns=[7, 3, 5],
+    )
+    assert long_to_wide(data).equals(expected)
+    # Row order within and across timestamps doesn't matter
+    shuffled = data.sample(frac=1, random_state=0)
+    shuffled = pd.concat([data.iloc[:3], shuffled[shuffled.ts_id != 1]])
+    assert long_to_wide(shuffled).equals(expected)
+
+
+def test_long_to_wide_missing_plant():
+    data = _long_profile(3, [7, 3, 5])
+    with pytest.raises(ValueError):
+        long_to_wide(data.drop(index=4))
+    with pytest.raises(ValueError):
+        long_to_wide(pd.concat([data, data.iloc[[4]]]))
@@ -1,8 +1,9 @@
+import asyncio
 import time
 
 import pytest
 
-from prereise.gather.request_util import RateLimit, rate_limit
+from prereise.gather.request_util import RateLimit, TokenBucket, rate_limit
 
 
 class SleepCounter:
@@ -53,3 +54,72 @@ def test_decorator_with_limit(sleepless):
 
     _ = [slow() for _ in range(10)]
     assert sleepless.time_sleeping >= 240 - 24  # no sleep on first iteration
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "monotonic", clock.monotonic)
+    return clock
+
+
+def test_token_bucket_burst(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        assert bucket.delay() == 0
+        asyncio.run(bucket.acquire())
+    assert bucket.delay() == pytest.approx(0.5)
+    clock.now += 0.25
+    assert bucket.delay() == pytest.approx(0.25)
+    clock.now += 10
+    # Refill is capped by the capacity
+    assert bucket.delay() == 0
+    assert bucket.tokens == 3
+
+
+def test_token_bucket_pause(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    bucket.pause(5)
+    assert bucket.delay() == pytest.approx(5.5)
+    clock.now += 5
+    assert bucket.delay() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.delay() == 0
+
+
+def test_token_bucket_acquire_waits(clock, monkeypatch):
+    async def sleep(seconds):
+        clock.now += seconds
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    bucket = TokenBucket(rate=4)
+
+    async def acquire_all():
+        for _ in range(5):
+            await bucket.acquire()
+
+    asyncio.run(acquire_all())
+    assert clock.now == pytest.approx(101)
+
+
+def test_token_bucket_no_limit():
+    bucket = TokenBucket(rate=None)
+    for _ in range(10):
+        asyncio.run(bucket.acquire())
+    assert bucket.delay() == 0
+
+
+def test_token_bucket_no_limit_pause(clock):
+    bucket = TokenBucket(rate=None)
+    bucket.pause(3)
+    assert bucket.delay() == pytest.approx(3)
+    clock.now += 3
+    assert bucket.delay() == 0
@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 import pytest
 
 from prereise.gather.request_util import retry
@@ -63,3 +65,15 @@ def test_counter_attribute():
         return x
 
     assert limit == best_attempt()
+
+
+def test_exponential_backoff():
+    delays = []
+
+    @retry(max_attempts=4, allowed_exceptions=CustomError, backoff=0.5)
+    def fail():
+        raise CustomError
+
+    with patch("prereise.gather.request_util.time.sleep", delays.append):
+        fail()
+    assert delays == [0.5, 1, 2]
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+from scipy.spatial import KDTree
+
+
+def ll2uv(lon, lat):
+    """Convert arrays of (longitude, latitude) to unit vectors.
+
+    :param numpy.array lon: longitudes (in deg.) measured eastward from Greenwich, UK.
+    :param numpy.array lat: latitudes (in deg.). Equator is the zero point.
+    :return: (*numpy.ndarray*) -- array of shape (n, 3) holding the (x, y, z)
+        components of the unit vectors.
+    """
+    lon = np.radians(np.asarray(lon, dtype=float).ravel())
+    lat = np.radians(np.asarray(lat, dtype=float).ravel())
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def _digest(*arrays):
+    """Compute a digest of the content of a sequence of arrays.
+
+    :param numpy.array arrays: arrays to hash.
+    :return: (*str*) -- hexadecimal digest.
+    """
+    h = hashlib.sha1()
+    for a in arrays:
+        a = np.ascontiguousarray(a, dtype=float).ravel()
+        h.update(str(a.shape).encode())
+        h.update(a.tobytes())
+    return h.hexdigest()
+
+
+def find_closest_grid_cells(grid_lon, grid_lat, lon, lat, cache_dir=None):
+    """Find the closest cell of a wind grid to each target location. Proximity is
+    measured by the angular distance between unit vectors.
+
+    :param numpy.array grid_lon: longitude of the grid cells, any shape.
+    :param numpy.array grid_lat: latitude of the grid cells, same shape as
+        ``grid_lon``.
+    :param numpy.array lon: longitude of the targets.
+    :param numpy.array lat: latitude of the targets.
+    :param str cache_dir: directory where the target to cell mapping is saved, keyed
+        by the grid geometry and the target coordinates. If a mapping for the same
+        grid and targets is found there, it is loaded instead of being computed.
+    :return: (*numpy.array*) -- index of the closest cell in the flattened grid for
+        each target.
+    :raises ValueError: if the grid or target coordinates have mismatched lengths.
+    """
+    grid_lon = np.asarray(grid_lon, dtype=float).ravel()
+    grid_lat = np.asarray(grid_lat, dtype=float).ravel()
+    lon = np.asarray(lon, dtype=float).ravel()
+    lat = np.asarray(lat, dtype=float).ravel()
+    if len(grid_lon) != len(grid_lat):
+        raise ValueError("grid longitudes and latitudes must have the same length")
+    if len(lon) != len(lat):
+        raise ValueError("target longitudes and latitudes must have the same length")
+
+    cache_path = None
+    if cache_dir is not None:
+        key = _digest(grid_lon, grid_lat, lon, lat)
+        cache_path = os.path.join(cache_dir, f"closest_grid_cells_{key}.npy")
+        if os.path.isfile(cache_path):
+            return np.load(cache_path)
+
+    tree = KDTree(ll2uv(grid_lon, grid_lat))
+    _, indices = tree.query(ll2uv(lon, lat))
+    indices = np.asarray(indices, dtype=np.int64)
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, indices)
+        os.replace(tmp_path, cache_path)
+    return indices
@@ -1,17 +1,19 @@
 import functools
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import numpy as np
 import pandas as pd
-from powersimdata.utility.distance import ll2uv
-from scipy.spatial import KDTree
 from tqdm import tqdm
 
 from prereise.gather.winddata import const
+from prereise.gather.winddata.grid_index import find_closest_grid_cells
 from prereise.gather.winddata.hrrr.helpers import formatted_filename
 from prereise.gather.winddata.impute import linear
 from prereise.gather.winddata.power_curves import (
     get_power,
+    get_power_by_curve_group,
     get_state_power_curves,
     get_turbine_power_curves,
     shift_turbine_curve,
@@ -41,13 +43,15 @@ def get_wind_data_lat_long(dt, directory):
     return grib.latlons()
 
 
-def find_closest_wind_grids(wind_farms, wind_data_lat_long):
+def find_closest_wind_grids(wind_farms, wind_data_lat_long, cache_dir=None):
     """Uses provided wind farm data and wind grid data to calculate
     the closest wind grid to each wind farm.
 
     :param pandas.DataFrame wind_farms: plant data frame.
     :param tuple wind_data_lat_long: A tuple of 2 same lengthed numpy arrays, first one
         being latitude and second one being longitude.
+    :param str cache_dir: directory where the wind farm to wind grid mapping is
+        cached, see :func:`prereise.gather.winddata.grid_index.find_closest_grid_cells`.
     :return: (*numpy.array*) -- a numpy array that holds in each index i
         the index of the closest wind grid in wind_data_lat_long for wind_farms i
     """
@@ -56,61 +60,190 @@ def find_closest_wind_grids(wind_farms, wind_data_lat_long):
         wind_data_lat_long[1].flatten(),
     )
     assert len(grid_lats) == len(grid_lons)
-    grid_lat_lon_unit_vectors = [ll2uv(i, j) for i, j in zip(grid_lons, grid_lats)]
+    return find_closest_grid_cells(
+        grid_lons,
+        grid_lats,
+        wind_farms.lon.values,
+        wind_farms.lat.values,
+        cache_dir=cache_dir,
+    )
+
+
+def _extract_wind_components(dts, directory, grid_indices):
+    """Read the U and V components of wind at the given grid cells for a range of
+    hours. This is a module-level function so that it can be run in a worker process.
+
+    :param iterable dts: datetimes of the grib files to read.
+    :param str directory: directory where hrrr data is contained.
+    :param numpy.array grid_indices: index of the closest wind grid for each farm.
+    :return: (*numpy.ndarray*) -- float32 array of shape (hours, 2, farms), holding
+        the U component in ``[:, 0]`` and the V component in ``[:, 1]``. Hours whose
+        grib file is empty are filled with NaN.
+    """
+    import pygrib
+
+    components = np.full((len(dts), 2, len(grid_indices)), np.nan, dtype=np.float32)
+    for i, dt in enumerate(dts):
+        gribs = pygrib.open(os.path.join(directory, formatted_filename(dt)))
+        try:
+            u_component = gribs.select(name=U_COMPONENT_SELECTOR)[0].values.flatten()
+            v_component = gribs.select(name=V_COMPONENT_SELECTOR)[0].values.flatten()
+            components[i, 0] = u_component[grid_indices]
+            components[i, 1] = v_component[grid_indices]
+        except ValueError:
+            # If the GRIB file is empty, no wind speed values can be selected
+            pass
+        finally:
+            gribs.close()
+    return components
+
+
+def _load_checkpoint(checkpoint, dts, grid_indices):
+    """Load previously extracted wind components from a checkpoint directory. The
+    directory holds the hours and farms being extracted in *'meta.npz'* and one
+    shard per extracted chunk of hours.
+
+    :param str checkpoint: path to the checkpoint directory, created if missing.
+    :param numpy.array dts: datetimes being extracted, as datetime64 values.
+    :param numpy.array grid_indices: index of the closest wind grid for each farm.
+    :return: (*tuple*) -- wind components array of shape (hours, 2, farms) and
+        boolean array flagging the hours that have already been extracted.
+    :raises ValueError: if the checkpoint was written for different hours or farms.
+    """
+    components = np.full((len(dts), 2, len(grid_indices)), np.nan, dtype=np.float32)
+    done = np.zeros(len(dts), dtype=bool)
+    meta = os.path.join(checkpoint, "meta.npz")
+    if not os.path.isfile(meta):
+        os.makedirs(checkpoint, exist_ok=True)
+        _save_atomically(meta, dts=dts, grid_indices=grid_indices)
+        return components, done
+
+    with np.load(meta) as saved:
+        if not (
+            np.array_equal(saved["dts"], dts)
+            and np.array_equal(saved["grid_indices"], grid_indices)
+        ):
+            raise ValueError(
+                f"checkpoint {checkpoint} was written for different hours or farms"
+            )
+    for name in os.listdir(checkpoint):
+        if name.startswith("shard_") and name.endswith(".npz"):
+            with np.load(os.path.join(checkpoint, name)) as shard:
+                components[shard["hours"]] = shard["components"]
+                done[shard["hours"]] = True
+    return components, done
+
 
-    tree = KDTree(grid_lat_lon_unit_vectors)
+def _save_shard(checkpoint, hours, components):
+    """Write the wind components of a chunk of hours to a checkpoint directory.
 
-    wind_farm_lats = wind_farms.lat.values
-    wind_farm_lons = wind_farms.lon.values
+    :param str checkpoint: path to the checkpoint directory.
+    :param numpy.array hours: position of the hours in the extracted range.
+    :param numpy.ndarray components: wind components, shape (len(hours), 2, farms).
+    """
+    _save_atomically(
+        os.path.join(checkpoint, f"shard_{hours[0]}.npz"),
+        hours=hours,
+        components=components,
+    )
 
-    wind_farm_unit_vectors = [
-        ll2uv(i, j) for i, j in zip(wind_farm_lons, wind_farm_lats)
-    ]
-    _, indices = tree.query(wind_farm_unit_vectors)
 
-    return indices
+def _save_atomically(path, **arrays):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
 
 
-def extract_wind_speed(wind_farms, start_dt, end_dt, directory):
+def extract_wind_speed(
+    wind_farms,
+    start_dt,
+    end_dt,
+    directory,
+    n_jobs=1,
+    chunk_size=24,
+    checkpoint=None,
+    cache_dir=None,
+):
     """Read wind speed from previously-downloaded files, and interpolate any gaps.
 
     :param pandas.DataFrame wind_farms: plant data frame.
     :param str start_dt: start date.
     :param str end_dt: end date (inclusive).
     :param str directory: directory where hrrr data is contained.
+    :param int n_jobs: number of worker processes reading grib files. If 1, files
+        are read in the current process.
+    :param int chunk_size: number of hourly files read per task.
+    :param str checkpoint: path to a directory where each chunk of extracted hours is
+        saved. If the directory exists, hours it already holds are not read again.
+    :param str cache_dir: directory where the wind farm to wind grid mapping is
+        cached, see :func:`find_closest_wind_grids`.
     :return: (*pandas.Dataframe*) -- data frame containing wind speed per wind farm
         on a per hourly basis between ``start_dt`` and ``end_dt`` inclusive.
+    :raises ValueError: if ``n_jobs`` or ``chunk_size`` is not a positive integer.
     """
     try:
-        import pygrib
+        import pygrib  # noqa: F401
     except ImportError:
         print("pygrib is missing but required for this function")
         raise
+    if not isinstance(n_jobs, int) or n_jobs < 1:
+        raise ValueError("n_jobs must be a positive integer")
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
     wind_data_lat_long = get_wind_data_lat_long(start_dt, directory)
-    wind_farm_to_closest_wind_grid_indices = find_closest_wind_grids(
-        wind_farms, wind_data_lat_long
+    wind_farm_to_closest_wind_grid_indices = np.asarray(
+        find_closest_wind_grids(wind_farms, wind_data_lat_long, cache_dir=cache_dir)
     )
     dts = pd.date_range(start=start_dt, end=end_dt, freq="H").to_pydatetime()
-    # Fetch wind speed data for each wind farm (or store NaN as applicable)
-    wind_speed_data = pd.DataFrame(index=dts, columns=wind_farms.index, dtype=float)
-    for dt in tqdm(dts):
-        gribs = pygrib.open(os.path.join(directory, formatted_filename(dt)))
-        try:
-            u_component = gribs.select(name=U_COMPONENT_SELECTOR)[0].values.flatten()
-            v_component = gribs.select(name=V_COMPONENT_SELECTOR)[0].values.flatten()
-            wind_farm_specific_u_component = u_component[
-                wind_farm_to_closest_wind_grid_indices
-            ]
-            wind_farm_specific_v_component = v_component[
-                wind_farm_to_closest_wind_grid_indices
-            ]
-            wind_speed_data.loc[dt] = np.sqrt(
-                pow(wind_farm_specific_u_component, 2)
-                + pow(wind_farm_specific_v_component, 2)
+    dts64 = np.array(dts, dtype="datetime64[ns]")
+
+    # Fetch U/V components for each wind farm (or store NaN as applicable)
+    if checkpoint is None:
+        components = np.full((len(dts), 2, len(wind_farms)), np.nan, dtype=np.float32)
+        done = np.zeros(len(dts), dtype=bool)
+    else:
+        components, done = _load_checkpoint(
+            checkpoint, dts64, wind_farm_to_closest_wind_grid_indices
+        )
+    to_read = np.flatnonzero(~done)
+    chunks = [to_read[i : i + chunk_size] for i in range(0, len(to_read), chunk_size)]
+
+    def store(chunk, chunk_components):
+        components[chunk] = chunk_components
+        done[chunk] = True
+        if checkpoint is not None:
+            _save_shard(checkpoint, chunk, chunk_components)
+
+    if n_jobs == 1:
+        for chunk in tqdm(chunks):
+            store(
+                chunk,
+                _extract_wind_components(
+                    dts[chunk], directory, wind_farm_to_closest_wind_grid_indices
+                ),
             )
-        except ValueError:
-            # If the GRIB file is empty, no wind speed values can be selected
-            wind_speed_data.loc[dt] = np.nan
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = {
+                executor.submit(
+                    _extract_wind_components,
+                    dts[chunk],
+                    directory,
+                    wind_farm_to_closest_wind_grid_indices,
+                ): chunk
+                for chunk in chunks
+            }
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                store(futures[future], future.result())
+
+    u_component = components[:, 0].astype(float)
+    v_component = components[:, 1].astype(float)
+    wind_speed_data = pd.DataFrame(
+        data=np.sqrt(pow(u_component, 2) + pow(v_component, 2)),
+        index=dts,
+        columns=wind_farms.index,
+    )
 
     # For each column, linearly interpolate any NaN values
     linear(wind_speed_data)
@@ -118,7 +251,7 @@ def extract_wind_speed(wind_farms, start_dt, end_dt, directory):
     return wind_speed_data
 
 
-def calculate_pout_blended(wind_farms, start_dt, end_dt, directory):
+def calculate_pout_blended(wind_farms, start_dt, end_dt, directory, **kwargs):
     """Calculate power output for wind farms based on hrrr data. Each wind farm's
     power curve is based on the average power curve for that state, based on EIA data
     on the state's turbines. Function assumes that user has already called
@@ -129,6 +262,7 @@ def calculate_pout_blended(wind_farms, start_dt, end_dt, directory):
     :param str start_dt: start date.
     :param str end_dt: end date (inclusive).
     :param str directory: directory where hrrr data is contained.
+    :param \\*\\*kwargs: keyword arguments passed to :func:`extract_wind_speed`.
     :return: (*pandas.Dataframe*) -- data frame containing power out per wind farm
         on a per hourly basis between ``start_dt`` and ``end_dt`` inclusive.
     :raises ValueError: if ``wind_farms`` is missing the 'state_abv' column.
@@ -144,28 +278,23 @@ def calculate_pout_blended(wind_farms, start_dt, end_dt, directory):
     state_power_curves = get_state_power_curves()
 
     # Read wind speed from previously-downloaded files, and interpolate
-    wind_speed_data = extract_wind_speed(wind_farms, start_dt, end_dt, directory)
+    wind_speed_data = extract_wind_speed(
+        wind_farms, start_dt, end_dt, directory, **kwargs
+    )
     dts = wind_speed_data.index
 
-    # Then calculate wind power based on wind speed
-    wind_power_data = [
-        [
-            get_power(
-                turbine_power_curves,
-                state_power_curves,
-                wind_speed_data.loc[dt, w],
-                turbine_types.loc[w],
-            )
-            for w in wind_farms.index
-        ]
-        for dt in tqdm(dts)
-    ]
+    # Then calculate wind power based on wind speed, one call per power curve
+    wind_power_data = get_power_by_curve_group(
+        wind_speed_data.to_numpy(),
+        [turbine_types.loc[w] for w in wind_farms.index],
+        lambda wspd, t: get_power(turbine_power_curves, state_power_curves, wspd, t),
+    )
     df = pd.DataFrame(data=wind_power_data, index=dts, columns=wind_farms.index)
 
     return df
 
 
-def calculate_pout_individual(wind_farms, start_dt, end_dt, directory):
+def calculate_pout_individual(wind_farms, start_dt, end_dt, directory, **kwargs):
     """Calculate power output for wind farms based on hrrr data. Each wind farm's
     power curve is based on farm-specific attributes. Function assumes that user has
     already called :meth:`prereise.gather.winddata.hrrr.hrrr.retrieve_data` with the
@@ -177,6 +306,7 @@ def calculate_pout_individual(wind_farms, start_dt, end_dt, directory):
     :param str start_dt: start date.
     :param str end_dt: end date (inclusive).
     :param str directory: directory where hrrr data is contained.
+    :param \\*\\*kwargs: keyword arguments passed to :func:`extract_wind_speed`.
     :return: (*pandas.Dataframe*) -- data frame containing power out per wind
         farm on a per hourly basis between start_dt and end_dt inclusive.
     :raises ValueError: if ``wind_farms`` is missing the 'state_abv' column.
@@ -221,25 +351,24 @@ def calculate_pout_individual(wind_farms, start_dt, end_dt, directory):
     cached_func = functools.lru_cache(maxsize=None)(
         functools.partial(get_shifted_curve, reference_curves=turbine_power_curves)
     )
-    # Create dataframe of lookup values
+    # Create lookup values: farms with the same turbine and hub height share a curve
     lookup_names = wind_farms.apply(
         lambda x: get_starting_curve_name(x, turbine_power_curves.columns), axis=1
     )
-    lookup_values = pd.concat([lookup_names, wind_farms[const.hub_height_col]], axis=1)
-    # Use lookup values with cached, curried function
-    shifted_power_curves = lookup_values.apply(lambda x: cached_func(*x), axis=1)
+    lookup_values = list(zip(lookup_names, wind_farms[const.hub_height_col]))
 
     # Read wind speed from previously-downloaded files, and impute as necessary
-    wind_speed_data = extract_wind_speed(wind_farms, start_dt, end_dt, directory)
+    wind_speed_data = extract_wind_speed(
+        wind_farms, start_dt, end_dt, directory, **kwargs
+    )
     dts = wind_speed_data.index
 
-    wind_power_data = [
-        [
-            interpolate(wind_speed_data.loc[dt, w], shifted_power_curves.loc[w])
-            for w in wind_farms.index
-        ]
-        for dt in tqdm(dts)
-    ]
+    # Use lookup values with cached, curried function, one call per shifted curve
+    wind_power_data = get_power_by_curve_group(
+        wind_speed_data.to_numpy(),
+        lookup_values,
+        lambda wspd, key: interpolate(wspd, cached_func(*key)),
+    )
 
     df = pd.DataFrame(data=wind_power_data, index=dts, columns=wind_farms.index)
 
@@ -1,13 +1,44 @@
-import shutil
-
-import requests
+from prereise.gather.winddata.hrrr.transport import HttpTransport
 
 
 class Downloader:
-    """Class that holds downloading functionality"""
+    """Class that holds downloading functionality
+
+    :param transport: object sending the requests, with the interface of
+        :class:`prereise.gather.winddata.hrrr.transport.HttpTransport`, e.g. a
+        :class:`prereise.gather.winddata.hrrr.transport.LocalTransport` to serve
+        local files. If None, an HttpTransport with default settings is used.
+    """
+
+    def __init__(self, transport=None):
+        self.transport = HttpTransport() if transport is None else transport
+
+    @property
+    def metrics(self):
+        """Transfer metrics of the transport.
+
+        :return: (*prereise.gather.winddata.hrrr.transport.TransferMetrics*) --
+            counters of the data transferred so far.
+        """
+        return self.transport.metrics
+
+    def reserve(self, n_connections):
+        """Prepares the transport for concurrent requests.
+
+        :param int n_connections: number of concurrent requests.
+        """
+        self.transport.reserve(n_connections)
+
+    def get_text(self, url):
+        """Downloads a text file from a url.
+
+        :param str url: url to download from
+        :return: (*str*) -- content of the file
+        :raises requests.HTTPError: if the server returns an error status
+        """
+        return self.transport.read(url).decode()
 
-    @staticmethod
-    def download(url, file, headers):
+    def download(self, url, file, headers):
         """Downloads file from a url and stores contents into file.
 
         :param str url: url to download from
@@ -15,6 +46,7 @@ class Downloader:
             binary mode
         :param dict headers: dictionary holding headers to be sent
             to url when attempting to download
+        :return: (*int*) -- number of bytes written
+        :raises requests.HTTPError: if the server returns an error status
         """
-        with requests.get(url, stream=True, headers=headers) as r:
-            shutil.copyfileobj(r.raw, file)
+        return self.transport.copy(url, file, headers=headers)
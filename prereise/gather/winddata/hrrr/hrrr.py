@@ -1,9 +1,10 @@
 from prereise.gather.winddata.hrrr.constants import HRRR_S3_BASE_URL
 from prereise.gather.winddata.hrrr.downloader import Downloader
 from prereise.gather.winddata.hrrr.hrrr_api import HrrrApi
+from prereise.gather.winddata.hrrr.transport import HttpTransport
 
 
-def retrieve_data(start_dt, end_dt, directory):
+def retrieve_data(start_dt, end_dt, directory, max_workers=1, transport=None):
     """Retrieves all HRRR wind data for all hours between start_dt and
     end_dt. (In a future PR) will convert all that wind data to
     Pout in order to be compatible with REISE.
@@ -15,6 +16,18 @@ def retrieve_data(start_dt, end_dt, directory):
     :param datetime.datetime start_dt: datetime to start at
     :param datetime.datetime end_dt: datetime to end at
     :param str directory: file directory to download data into
+    :param int max_workers: number of files downloaded concurrently
+    :param transport: object sending the requests, see
+        :class:`prereise.gather.winddata.hrrr.downloader.Downloader`. If None, an
+        :class:`prereise.gather.winddata.hrrr.transport.HttpTransport` with default
+        timeouts and retries is used, and closed once the data is downloaded.
     """
-    api = HrrrApi(Downloader, HRRR_S3_BASE_URL)
-    api.download_wind_data(start_dt, end_dt, directory)
+    owned = transport is None
+    if owned:
+        transport = HttpTransport()
+    try:
+        api = HrrrApi(Downloader(transport), HRRR_S3_BASE_URL)
+        api.download_wind_data(start_dt, end_dt, directory, max_workers=max_workers)
+    finally:
+        if owned:
+            transport.close()
@@ -1,4 +1,6 @@
-import requests
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from pandas import date_range
 from tqdm import tqdm
 
@@ -16,7 +18,7 @@ class HrrrApi:
     <https://registry.opendata.aws/noaa-hrrr-pds/>`_ and `this link
     <https://www.nco.ncep.noaa.gov/pmb/products/hrrr/>`_
 
-    :param prereise.gather.winddata.hrrr.downloader.Downloader downloader: class
+    :param prereise.gather.winddata.hrrr.downloader.Downloader downloader: object
         that holds helper functions for downloading
     :param str base_url: url to download data from. Should take "dt", "product"
         and "hours_forecasted" as format variables. See
@@ -45,8 +47,68 @@ class HrrrApi:
             url = self.base_url.format(dt=dt, product=product, hours_forecasted=0)
             yield formatted_filename(dt, product), url
 
+    @staticmethod
+    def _get_grib_record_information_list(url, selectors, get_text):
+        """Returns the records of a GRIB file to download, based on its index file.
+
+        :param str url: url of the GRIB file
+        :param list selectors: list of strings used to narrow down the records to
+            download. If empty or None, the whole file is downloaded
+        :param callable get_text: function used to download the index file
+
+        :return: (*list*) -- a list of GribRecordInfo objects
+        """
+        if not selectors:
+            return [GribRecordInfo.full_file()]
+        # first grab index file and figure out which bytes to download
+        index_url = f"{url}.idx"
+        # index files are typically a few kb, so safe to hold in memory
+        raw_record_information_list = get_text(index_url).split("\n")
+        index_list = get_indices_that_contain_selector(
+            raw_record_information_list, selectors
+        )
+        return GribRecordInfo.generate_grib_record_information_list(
+            raw_record_information_list, index_list
+        )
+
+    def _download_file(self, url, path, selectors):
+        """Downloads the records of a GRIB file into path, unless path already exists.
+        Records are written to a temporary file which is renamed to path once all of
+        them have been downloaded, so path only ever holds complete data.
+
+        :param str url: url of the GRIB file
+        :param str path: path of the file to write
+        :param list selectors: list of strings used to narrow down the records to
+            download
+
+        :return: (*bool*) -- whether path holds the complete data
+        """
+        if os.path.isfile(path):
+            return True
+        tmp_path = f"{path}.part"
+        try:
+            grib_record_information_list = self._get_grib_record_information_list(
+                url, selectors, self.downloader.get_text
+            )
+            with open(tmp_path, "wb") as f:
+                for grib_record_information in grib_record_information_list:
+                    self.downloader.download(
+                        url,
+                        f,
+                        headers={
+                            "Range": f"bytes={grib_record_information.byte_range_header_string()}"
+                        },
+                    )
+            os.replace(tmp_path, path)
+            return True
+        except Exception:
+            print(f"Failed to download data from {url}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
     def download_meteorological_data(
-        self, start_dt, end_dt, directory, product, selectors=None
+        self, start_dt, end_dt, directory, product, selectors=None, max_workers=1
     ):
         """Iterates from a start datetime (inclusive) to a end datetime (inclusive)
         at 1 hour steps, downloading data for each intermediary datetime into the
@@ -56,6 +118,29 @@ class HrrrApi:
         product and `this link <https://github.com/blaylockbk/Herbie/blob/18945e4c5103386c98d08dcb2de590e2ac14c3d5/docs/user_guide/grib2.rst#how-grib-subsetting-works-in-herbie>`_ to understand more about what kind of strings can
         be passed into selectors
 
+        :param datetime.datetime start_dt: datetime to start at
+        :param datetime.datetime end_dt: datetime to end at
+        :param str directory: file directory to download data into
+        :param str product: info at `this link
+            <https://www.nco.ncep.noaa.gov/pmb/products/hrrr/>`_
+        :param list selectors: list of strings that can be used to narrow down
+            the amount of data downloaded from a specific GRIB file.
+        :param int max_workers: number of files downloaded concurrently. If greater
+            than 1, each file is written atomically and files already present in
+            ``directory`` are skipped.
+        """
+        if max_workers > 1:
+            self._download_concurrently(
+                start_dt, end_dt, directory, product, selectors, max_workers
+            )
+        else:
+            self._download_serially(start_dt, end_dt, directory, product, selectors)
+        print(f"Transferred {self.downloader.metrics}")
+
+    def _download_serially(self, start_dt, end_dt, directory, product, selectors):
+        """Downloads files one after the other, appending to existing files. See
+        :meth:`download_meteorological_data` for more information.
+
         :param datetime.datetime start_dt: datetime to start at
         :param datetime.datetime end_dt: datetime to end at
         :param str directory: file directory to download data into
@@ -65,22 +150,13 @@ class HrrrApi:
             the amount of data downloaded from a specific GRIB file.
         """
         for filename, url in tqdm(self._filename_url_iter(start_dt, end_dt, product)):
-            grib_record_information_list = [GribRecordInfo.full_file()]
-            # first grab index file and figure out which bytes to download
-            if selectors:
-                index_url = f"{url}.idx"
-                response = requests.get(
-                    index_url
-                )  # index files are typically a few kb, so safe to hold in memory
-                raw_record_information_list = response.text.split("\n")
-                index_list = get_indices_that_contain_selector(
-                    raw_record_information_list, selectors
-                )
-                grib_record_information_list = (
-                    GribRecordInfo.generate_grib_record_information_list(
-                        raw_record_information_list, index_list
-                    )
+            try:
+                grib_record_information_list = self._get_grib_record_information_list(
+                    url, selectors, self.downloader.get_text
                 )
+            except Exception:
+                print(f"Failed to download index of {url}")
+                continue
 
             with open(directory + filename, "ab") as f:
                 for grib_record_information in grib_record_information_list:
@@ -97,7 +173,40 @@ class HrrrApi:
                             f"Failed to download data from {url} with byte range {grib_record_information.byte_range_header_string()}"
                         )
 
-    def download_wind_data(self, start_dt, end_dt, directory):
+    def _download_concurrently(
+        self, start_dt, end_dt, directory, product, selectors, max_workers
+    ):
+        """Downloads files using a pool of threads sharing the transport of the
+        downloader. See :meth:`download_meteorological_data` for more information.
+
+        :param datetime.datetime start_dt: datetime to start at
+        :param datetime.datetime end_dt: datetime to end at
+        :param str directory: file directory to download data into
+        :param str product: info at `this link
+            <https://www.nco.ncep.noaa.gov/pmb/products/hrrr/>`_
+        :param list selectors: list of strings that can be used to narrow down
+            the amount of data downloaded from a specific GRIB file.
+        :param int max_workers: number of files downloaded concurrently.
+        """
+        files = list(self._filename_url_iter(start_dt, end_dt, product))
+        self.downloader.reserve(max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(
+                tqdm(
+                    executor.map(
+                        lambda f: self._download_file(
+                            f[1], directory + f[0], selectors
+                        ),
+                        files,
+                    ),
+                    total=len(files),
+                )
+            )
+        failed = len(results) - sum(results)
+        if failed:
+            print(f"Failed to download {failed} out of {len(files)} files")
+
+    def download_wind_data(self, start_dt, end_dt, directory, max_workers=1):
         """See :meth:`download_meteorological_data` for more information. Default
         product used is "sfc" which represents 2D Surface Levels, and the selectors
         used filter specifically for U component and V component of wind at 80 meters
@@ -106,6 +215,7 @@ class HrrrApi:
         :param datetime.datetime start_dt: datetime to start at
         :param datetime.datetime end_dt: datetime to end at
         :param str directory: file directory to download data into
+        :param int max_workers: number of files downloaded concurrently
         """
         self.download_meteorological_data(
             start_dt,
@@ -113,4 +223,5 @@ class HrrrApi:
             directory,
             product=DEFAULT_PRODUCT,
             selectors=[self.U_COMPONENT_FILTER, self.V_COMPONENT_FILTER],
+            max_workers=max_workers,
         )
@@ -1,13 +1,22 @@
+import os
 from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 import numpy as np
 import pandas as pd
+import pytest
 
+from prereise.gather.winddata import const
 from prereise.gather.winddata.hrrr.calculations import (
     calculate_pout_blended,
+    calculate_pout_individual,
+    extract_wind_speed,
     find_closest_wind_grids,
 )
+from prereise.gather.winddata.power_curves import (
+    get_turbine_power_curves,
+    shift_turbine_curve,
+)
 
 
 def test_find_closest_wind_grids():
@@ -71,3 +80,174 @@ def test_calculate_pout_blended(
         columns=[0, 1],
     )
     assert df.equals(expected_df)
+
+
+@patch("prereise.gather.winddata.hrrr.calculations.extract_wind_speed")
+def test_calculate_pout_individual(extract_wind_speed):
+    wind_farms = pd.DataFrame(
+        {
+            const.mfg_col: ["Vestas", "GE", "Vestas", "Toyota"],
+            const.model_col: ["V80-1.8", "1.5 S", "V80-1.8", "Corolla"],
+            const.hub_height_col: [262.467, 262.467, 300, 262.467],
+        },
+        index=[10, 11, 12, 13],
+    )
+    dts = pd.date_range(start="2016-01-01", periods=24, freq="H")
+    wind_speed = pd.DataFrame(
+        np.random.default_rng(0).uniform(0, 30, size=(24, 4)),
+        index=dts,
+        columns=wind_farms.index,
+    )
+    extract_wind_speed.return_value = wind_speed
+
+    df = calculate_pout_individual(wind_farms, dts[0], dts[-1], "")
+
+    tpc = get_turbine_power_curves()
+    names = ["Vestas V80-1.8", "GE 1.5 S", "Vestas V80-1.8", "IEC class 2"]
+    for w, name in zip(wind_farms.index, names):
+        curve = shift_turbine_curve(
+            tpc[name],
+            wind_farms.loc[w, const.hub_height_col],
+            const.max_wind_speed,
+            const.new_curve_res,
+        )
+        expected = np.interp(
+            wind_speed[w], curve.index.values, curve.values, left=0, right=0
+        )
+        assert np.allclose(df[w].to_numpy(), expected)
+    assert df.index.equals(dts)
+    assert list(df.columns) == list(wind_farms.index)
+
+
+def _mocked_pygrib(values):
+    grib_mock = MagicMock()
+    grib_mock.select.return_value.__getitem__.return_value.values.flatten.return_value = np.array(
+        values
+    )
+    mocked_pygrib = MagicMock()
+    mocked_pygrib.open = MagicMock(return_value=grib_mock)
+    return mocked_pygrib
+
+
+@patch("prereise.gather.winddata.hrrr.calculations.get_wind_data_lat_long")
+@patch("prereise.gather.winddata.hrrr.calculations.find_closest_wind_grids")
+def test_extract_wind_speed_checkpoint(
+    find_closest_wind_grids, get_wind_data_lat_long, tmp_path
+):
+    find_closest_wind_grids.return_value = np.array([1, 2])
+    wind_farms = pd.DataFrame({"lat": [20, 40], "lon": [20, 40]})
+    start_dt = datetime.fromisoformat("2016-01-01")
+    end_dt = datetime.fromisoformat("2016-01-02")
+    checkpoint = str(tmp_path / "checkpoint")
+
+    mocked_pygrib = _mocked_pygrib([0, 3, 4])
+    with patch.dict("sys.modules", {"pygrib": mocked_pygrib}):
+        df = extract_wind_speed(
+            wind_farms, start_dt, end_dt, "", chunk_size=5, checkpoint=checkpoint
+        )
+    assert mocked_pygrib.open.call_count == 25
+    assert df.shape == (25, 2)
+    assert np.allclose(df[0], np.sqrt(18))
+    assert np.allclose(df[1], np.sqrt(32))
+
+    # Every hour is in the checkpoint: a second run reads no grib file
+    mocked_pygrib = _mocked_pygrib([0, 0, 0])
+    with patch.dict("sys.modules", {"pygrib": mocked_pygrib}):
+        resumed = extract_wind_speed(
+            wind_farms, start_dt, end_dt, "", checkpoint=checkpoint
+        )
+    mocked_pygrib.open.assert_not_called()
+    assert resumed.equals(df)
+
+    # The checkpoint doesn't match a different hour range
+    with patch.dict("sys.modules", {"pygrib": mocked_pygrib}):
+        with pytest.raises(ValueError):
+            extract_wind_speed(
+                wind_farms, start_dt, start_dt, "", checkpoint=checkpoint
+            )
+
+
+def _fake_extract_wind_components(dts, directory, grid_indices):
+    # U component is the hour of the day plus the grid index, V component is 1
+    components = np.ones((len(dts), 2, len(grid_indices)), dtype=np.float32)
+    components[:, 0] = np.add.outer([dt.hour for dt in dts], grid_indices)
+    return components
+
+
+def _expected_wind_speed(dts, grid_indices):
+    u_component = np.add.outer(dts.hour, grid_indices)
+    return np.sqrt(u_component**2 + 1)
+
+
+@patch(
+    "prereise.gather.winddata.hrrr.calculations._extract_wind_components",
+    _fake_extract_wind_components,
+)
+@patch("prereise.gather.winddata.hrrr.calculations.get_wind_data_lat_long")
+@patch("prereise.gather.winddata.hrrr.calculations.find_closest_wind_grids")
+def test_extract_wind_speed_n_jobs(
+    find_closest_wind_grids, get_wind_data_lat_long, tmp_path
+):
+    find_closest_wind_grids.return_value = np.array([1, 2, 5])
+    wind_farms = pd.DataFrame({"lat": [20, 40, 30], "lon": [20, 40, 30]})
+    dts = pd.date_range(start="2016-01-01", end="2016-01-03", freq="H")
+    checkpoint = str(tmp_path / "checkpoint")
+
+    with patch.dict("sys.modules", {"pygrib": MagicMock()}):
+        df = extract_wind_speed(
+            wind_farms,
+            dts[0],
+            dts[-1],
+            "",
+            n_jobs=2,
+            chunk_size=7,
+            checkpoint=checkpoint,
+        )
+    assert df.index.equals(dts)
+    assert np.allclose(df.to_numpy(), _expected_wind_speed(dts, [1, 2, 5]))
+    shards = [f for f in os.listdir(checkpoint) if f.startswith("shard_")]
+    assert len(shards) == 7
+
+
+@patch("prereise.gather.winddata.hrrr.calculations._extract_wind_components")
+@patch("prereise.gather.winddata.hrrr.calculations.get_wind_data_lat_long")
+@patch("prereise.gather.winddata.hrrr.calculations.find_closest_wind_grids")
+def test_extract_wind_speed_resume(
+    find_closest_wind_grids, get_wind_data_lat_long, extract_components, tmp_path
+):
+    find_closest_wind_grids.return_value = np.array([1, 2])
+    wind_farms = pd.DataFrame({"lat": [20, 40], "lon": [20, 40]})
+    dts = pd.date_range(start="2016-01-01", end="2016-01-02", freq="H")
+    checkpoint = str(tmp_path / "checkpoint")
+
+    # The run is interrupted when reading hour 10
+    def interrupted(chunk_dts, directory, grid_indices):
+        if any(dt.hour == 10 for dt in chunk_dts):
+            raise KeyboardInterrupt
+        return _fake_extract_wind_components(chunk_dts, directory, grid_indices)
+
+    extract_components.side_effect = interrupted
+    with patch.dict("sys.modules", {"pygrib": MagicMock()}):
+        with pytest.raises(KeyboardInterrupt):
+            extract_wind_speed(
+                wind_farms, dts[0], dts[-1], "", chunk_size=4, checkpoint=checkpoint
+            )
+    assert extract_components.call_count == 3
+
+    # The resumed run only reads the hours missing from the checkpoint
+    extract_components.reset_mock()
+    extract_components.side_effect = _fake_extract_wind_components
+    with patch.dict("sys.modules", {"pygrib": MagicMock()}):
+        df = extract_wind_speed(
+            wind_farms, dts[0], dts[-1], "", chunk_size=4, checkpoint=checkpoint
+        )
+    read = [dt for call in extract_components.call_args_list for dt in call.args[0]]
+    assert pd.DatetimeIndex(read).equals(dts[8:])
+    assert df.index.equals(dts)
+    assert np.allclose(df.to_numpy(), _expected_wind_speed(dts, [1, 2]))
+
+
+def test_extract_wind_speed_bad_n_jobs():
+    with patch.dict("sys.modules", {"pygrib": MagicMock()}):
+        with pytest.raises(ValueError):
+            extract_wind_speed(MagicMock(), None, None, "", n_jobs=0)
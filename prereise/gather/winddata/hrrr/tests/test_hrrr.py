@@ -0,0 +1,28 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from prereise.gather.winddata.hrrr import hrrr
+from prereise.gather.winddata.hrrr.transport import LocalTransport
+
+
+@patch.object(hrrr, "HrrrApi")
+@patch.object(hrrr, "HttpTransport")
+def test_retrieve_data_closes_default_transport(http_transport, hrrr_api):
+    hrrr_api.return_value.download_wind_data.side_effect = KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        hrrr.retrieve_data(datetime(2016, 1, 1), datetime(2016, 1, 1, 2), "./")
+    http_transport.return_value.close.assert_called_once()
+
+
+@patch.object(hrrr, "HrrrApi")
+def test_retrieve_data_keeps_given_transport(hrrr_api, tmp_path):
+    transport = LocalTransport(str(tmp_path))
+    with patch.object(transport, "close") as close:
+        hrrr.retrieve_data(
+            datetime(2016, 1, 1), datetime(2016, 1, 1, 2), "./", transport=transport
+        )
+    close.assert_not_called()
+    downloader = hrrr_api.call_args.args[0]
+    assert downloader.transport is transport
@@ -1,8 +1,15 @@
+import os
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import MagicMock, mock_open, patch
 
 import pytest
 
+from prereise.gather.winddata.hrrr.downloader import Downloader
+from prereise.gather.winddata.hrrr.helpers import formatted_filename
 from prereise.gather.winddata.hrrr.hrrr_api import HrrrApi
+from prereise.gather.winddata.hrrr.transport import LocalTransport
 
 CSNOW_SELECTOR = "CSNOW:surface"
 CICEP_SELECTOR = "CICEP:surface"
@@ -28,15 +35,15 @@ def filename_url_iter_mock(filename, url):
 
 
 @pytest.fixture
-def requests_mock():
-    with patch("prereise.gather.winddata.hrrr.hrrr_api.requests") as r:
-        r.get.return_value.text = (
-            f"60:{CSNOW_BYTE_START}:d=2016010100:{CSNOW_SELECTOR}:anl:\n"
-            f"61:{CICEP_BYTE_START}:d=2016010100:{CICEP_SELECTOR}:anl:\n"
-            f"62:{UGRD_BYTE_START}:d=2016010100:{UGRD_SELECTOR}:anl:\n"
-            f"63:{VGRD_BYTE_START}:d=2016010100:{VGRD_SELECTOR}:anl:"
-        )
-        yield r
+def downloader_mock():
+    downloader = MagicMock()
+    downloader.get_text.return_value = (
+        f"60:{CSNOW_BYTE_START}:d=2016010100:{CSNOW_SELECTOR}:anl:\n"
+        f"61:{CICEP_BYTE_START}:d=2016010100:{CICEP_SELECTOR}:anl:\n"
+        f"62:{UGRD_BYTE_START}:d=2016010100:{UGRD_SELECTOR}:anl:\n"
+        f"63:{VGRD_BYTE_START}:d=2016010100:{VGRD_SELECTOR}:anl:"
+    )
+    return downloader
 
 
 @pytest.fixture
@@ -47,8 +54,8 @@ def open_mock():
 
 
 @pytest.fixture
-def hrrr_api(requests_mock, open_mock):
-    h = HrrrApi(MagicMock(), "")
+def hrrr_api(downloader_mock, open_mock):
+    h = HrrrApi(downloader_mock, "")
     h._filename_url_iter = filename_url_iter_mock(FILENAME, URL)
     return h
 
@@ -92,3 +99,109 @@ def test_download_meteorological_data_with_selectors(open_mock, hrrr_api):
         open_mock(),
         headers={"Range": f"bytes={CICEP_BYTE_START}-{int(UGRD_BYTE_START)-1}"},
     )
+
+
+GRIB_RECORDS = [b"csnow" * 10, b"cicep" * 20, b"ugrd" * 30, b"vgrd" * 40]
+
+
+def _grib_index(records):
+    offsets = [0]
+    for record in records[:-1]:
+        offsets.append(offsets[-1] + len(record))
+    selectors = [CSNOW_SELECTOR, CICEP_SELECTOR, UGRD_SELECTOR, VGRD_SELECTOR]
+    return "\n".join(
+        f"{i + 1}:{offset}:d=2016010100:{selector}:anl:"
+        for i, (offset, selector) in enumerate(zip(offsets, selectors))
+    )
+
+
+class GribRequestHandler(BaseHTTPRequestHandler):
+    """Serves GRIB bytes (honoring Range headers) and their index files. Hours
+    listed in ``missing_hours`` are answered with 404.
+    """
+
+    grib = b"".join(GRIB_RECORDS)
+    index = _grib_index(GRIB_RECORDS).encode()
+    missing_hours = {"02"}
+    requested_paths = []
+
+    def do_GET(self):  # noqa: N802
+        self.requested_paths.append(self.path)
+        if self.path.split(".")[1] in self.missing_hours:
+            self.send_error(404)
+            return
+        if self.path.endswith(".idx"):
+            body, status = self.index, 200
+        else:
+            body, status = self.grib, 200
+            byte_range = self.headers.get("Range")
+            if byte_range:
+                start, end = byte_range.split("=")[1].split("-")
+                end = int(end) + 1 if end else len(self.grib)
+                body, status = self.grib[int(start) : end], 206
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def grib_server():
+    GribRequestHandler.requested_paths = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GribRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_wind_data_concurrently(grib_server, tmp_path):
+    api = HrrrApi(Downloader(), grib_server + "/hrrr.{dt:%H}.grib2")
+    directory = f"{tmp_path}/"
+    start_dt = datetime.fromisoformat("2016-01-01T00")
+    end_dt = datetime.fromisoformat("2016-01-01T04")
+    api.download_wind_data(start_dt, end_dt, directory, max_workers=3)
+
+    for hour in range(5):
+        path = directory + formatted_filename(start_dt.replace(hour=hour))
+        if hour == 2:
+            assert not os.path.exists(path)
+        else:
+            with open(path, "rb") as f:
+                assert f.read() == GRIB_RECORDS[2] + GRIB_RECORDS[3]
+    assert sorted(os.listdir(directory)) == sorted(
+        formatted_filename(start_dt.replace(hour=hour)) for hour in (0, 1, 3, 4)
+    )
+
+    # Complete files are skipped, only the missing hour is requested again
+    GribRequestHandler.requested_paths.clear()
+    api.download_wind_data(start_dt, end_dt, directory, max_workers=3)
+    assert GribRequestHandler.requested_paths == ["/hrrr.02.grib2.idx"]
+
+    # The connection pool grows with the number of threads
+    api.download_wind_data(start_dt, end_dt, directory, max_workers=20)
+    assert api.downloader.transport.pool_size == 20
+
+
+def test_download_wind_data_local_transport(tmp_path):
+    source = tmp_path / "source"
+    source.mkdir()
+    for hour in ("00", "01"):
+        (source / f"hrrr.{hour}.grib2").write_bytes(b"".join(GRIB_RECORDS))
+        (source / f"hrrr.{hour}.grib2.idx").write_bytes(GribRequestHandler.index)
+    transport = LocalTransport(str(source), base_url="s3://hrrr")
+    api = HrrrApi(Downloader(transport), "s3://hrrr/hrrr.{dt:%H}.grib2")
+    directory = f"{tmp_path}/"
+    start_dt = datetime.fromisoformat("2016-01-01T00")
+    api.download_wind_data(start_dt, start_dt.replace(hour=2), directory)
+
+    for hour in range(2):
+        path = directory + formatted_filename(start_dt.replace(hour=hour))
+        with open(path, "rb") as f:
+            assert f.read() == GRIB_RECORDS[2] + GRIB_RECORDS[3]
+    assert not os.path.exists(directory + formatted_filename(start_dt.replace(hour=2)))
+    assert transport.metrics.requests == 6
@@ -0,0 +1,152 @@
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from prereise.gather.winddata.hrrr.transport import (
+    HttpTransport,
+    LocalTransport,
+    parse_byte_range,
+)
+
+CONTENT = bytes(range(256)) * 64
+
+
+class FlakyRequestHandler(BaseHTTPRequestHandler):
+    """Serves ``CONTENT`` honoring Range headers. The n-th request follows the n-th
+    entry of ``script``: *'ok'* answers normally, *'cut'* closes the connection
+    halfway through the body, *'busy'* answers 503 and *'missing'* answers 404.
+    Requests beyond the script are answered normally.
+    """
+
+    protocol_version = "HTTP/1.1"
+    script = []
+    ranges = []
+
+    def do_GET(self):  # noqa: N802
+        n = len(self.ranges)
+        self.ranges.append(self.headers.get("Range"))
+        action = self.script[n] if n < len(self.script) else "ok"
+        if action in {"busy", "missing"}:
+            self.send_response(503 if action == "busy" else 404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body, status = CONTENT, 200
+        if self.headers.get("Range"):
+            start, end = self.headers["Range"].split("=")[1].split("-")
+            end = int(end) + 1 if end else len(CONTENT)
+            body, status = CONTENT[int(start) : end], 206
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if action == "cut":
+            self.wfile.write(body[: len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FlakyRequestHandler.ranges = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/file"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def transport():
+    t = HttpTransport(timeout=5, max_attempts=3, backoff=0, chunk_size=1024)
+    yield t
+    t.close()
+
+
+def test_parse_byte_range():
+    assert parse_byte_range(None) == (0, None)
+    assert parse_byte_range({"Range": "bytes=10-"}) == (10, None)
+    assert parse_byte_range({"Range": "bytes=10-19"}) == (10, 19)
+    with pytest.raises(ValueError):
+        parse_byte_range({"Range": "bytes=-10"})
+    with pytest.raises(ValueError):
+        parse_byte_range({"Range": "bytes=0-1,5-6"})
+
+
+def test_copy_resumes_from_offset(server, transport):
+    FlakyRequestHandler.script = ["cut"]
+    f = io.BytesIO()
+    n = transport.copy(server, f, headers={"Range": "bytes=100-8099"})
+    assert f.getvalue() == CONTENT[100:8100]
+    assert n == 8000
+    assert FlakyRequestHandler.ranges[0] == "bytes=100-8099"
+    # Only the bytes which were not written are requested again
+    resumed = FlakyRequestHandler.ranges[1]
+    assert resumed.endswith("-8099")
+    assert 100 < int(resumed[len("bytes=") : -len("-8099")]) <= 100 + 4000
+    assert transport.metrics.retries == 1
+    assert transport.metrics.bytes == 8000
+
+
+def test_copy_resumes_whole_file(server, transport):
+    FlakyRequestHandler.script = ["cut", "cut"]
+    f = io.BytesIO()
+    transport.copy(server, f)
+    assert f.getvalue() == CONTENT
+    ranges = FlakyRequestHandler.ranges
+    assert len(ranges) == 3
+    assert ranges[0] is None
+    offsets = [int(r[len("bytes=") : -1]) for r in ranges[1:]]
+    assert 0 < offsets[0] < offsets[1] < len(CONTENT)
+
+
+def test_retry_transient_status(server, transport):
+    FlakyRequestHandler.script = ["busy", "busy"]
+    assert transport.read(server) == CONTENT
+    assert len(FlakyRequestHandler.ranges) == 3
+    assert transport.metrics.retries == 2
+
+
+def test_max_attempts(server, transport):
+    FlakyRequestHandler.script = ["busy"] * 3
+    with pytest.raises(Exception):
+        transport.read(server)
+    assert len(FlakyRequestHandler.ranges) == 3
+
+
+def test_client_error_not_retried(server, transport):
+    FlakyRequestHandler.script = ["missing"]
+    with pytest.raises(requests.HTTPError):
+        transport.copy(server, io.BytesIO())
+    assert len(FlakyRequestHandler.ranges) == 1
+
+
+def test_local_transport(tmp_path):
+    (tmp_path / "file").write_bytes(CONTENT)
+    transport = LocalTransport(str(tmp_path), base_url="https://host")
+    assert transport.read("https://host/file") == CONTENT
+    f = io.BytesIO()
+    assert transport.copy("https://host/file", f, {"Range": "bytes=5-9"}) == 5
+    assert f.getvalue() == CONTENT[5:10]
+    with pytest.raises(requests.HTTPError):
+        transport.read("https://host/other")
+    assert transport.metrics.requests == 2
+
+
+def test_reserve():
+    t = HttpTransport(pool_size=4)
+    t.reserve(2)
+    assert t.session.get_adapter("https://host")._pool_maxsize == 4
+    t.reserve(32)
+    assert t.pool_size == 32
+    for prefix in ("http://host", "https://host"):
+        assert t.session.get_adapter(prefix)._pool_maxsize == 32
+    t.close()
@@ -0,0 +1,268 @@
+import os
+import threading
+import time
+
+import requests
+
+from prereise.gather.request_util import TransientError, retry
+
+RETRIABLE_EXCEPTIONS = (
+    TransientError,
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+def parse_byte_range(headers):
+    """Parses the *'Range'* header of a request.
+
+    :param dict headers: request headers, possibly None.
+    :return: (*tuple*) -- first byte and last byte (inclusive) of the range. The last
+        byte is None for open ended ranges. (0, None) if no range is requested.
+    :raises ValueError: if the range is not a single byte range.
+    """
+    byte_range = (headers or {}).get("Range")
+    if byte_range is None:
+        return 0, None
+    unit, _, spec = byte_range.partition("=")
+    start, sep, end = spec.partition("-")
+    if unit.strip() != "bytes" or not sep or not start or "," in spec:
+        raise ValueError(f"unsupported byte range: {byte_range}")
+    return int(start), int(end) if end else None
+
+
+class TransferMetrics:
+    """Thread safe counters of the data transferred by a transport."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def record(self, n_bytes, seconds, retries=0):
+        """Adds a completed transfer.
+
+        :param int n_bytes: number of bytes received.
+        :param float seconds: duration of the transfer, retries included.
+        :param int retries: number of attempts beyond the first one.
+        """
+        with self._lock:
+            self.requests += 1
+            self.retries += retries
+            self.bytes += n_bytes
+            self.seconds += seconds
+
+    @property
+    def rate(self):
+        """Average transfer rate of a request.
+
+        :return: (*float*) -- rate in bytes per second.
+        """
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.requests} requests, {self.retries} retries, "
+            f"{self.bytes / 1e6:.1f} MB at {self.rate / 1e6:.2f} MB/s per request"
+        )
+
+
+class HttpTransport:
+    """Sends HTTP requests through a pooled keep-alive session. Transient failures
+    (connection errors, timeouts, truncated bodies, 429 and 5xx statuses) are
+    retried with exponential backoff and byte range downloads resume from the last
+    byte received.
+
+    :param int/float/tuple timeout: connect and read timeouts in seconds, see
+        :func:`requests.request`. The read timeout bounds the time between two
+        chunks of data, so a stalled transfer fails and is resumed.
+    :param int max_attempts: maximum number of attempts per request.
+    :param int/float backoff: seconds to wait after the first failed attempt,
+        doubling after each subsequent failure.
+    :param int pool_size: maximum number of connections kept alive per host.
+    :param int chunk_size: size in bytes of the chunks written to file.
+    """
+
+    def __init__(
+        self,
+        timeout=(10, 60),
+        max_attempts=5,
+        backoff=1,
+        pool_size=16,
+        chunk_size=1 << 20,
+    ):
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+        self.metrics = TransferMetrics()
+        self.session = requests.Session()
+        self._mount(pool_size)
+
+    def _mount(self, pool_size):
+        self.pool_size = pool_size
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def reserve(self, n_connections):
+        """Grows the connection pool so that ``n_connections`` threads can send
+        requests concurrently without discarding connections. To be called before
+        the threads start.
+
+        :param int n_connections: number of concurrent requests.
+        """
+        if n_connections > self.pool_size:
+            self._mount(n_connections)
+
+    def _retry(self, func):
+        return retry(
+            max_attempts=self.max_attempts,
+            raises=True,
+            allowed_exceptions=RETRIABLE_EXCEPTIONS,
+            backoff=self.backoff,
+        )(func)
+
+    @staticmethod
+    def _raise_for_status(response):
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientError(f"{response.status_code} for url: {response.url}")
+        response.raise_for_status()
+
+    def read(self, url):
+        """Downloads the content of a url in memory.
+
+        :param str url: url to download from.
+        :return: (*bytes*) -- content.
+        :raises requests.HTTPError: if the server returns a non transient error
+            status.
+        """
+        start = time.perf_counter()
+
+        @self._retry
+        def attempt():
+            response = self.session.get(url, timeout=self.timeout)
+            self._raise_for_status(response)
+            return response.content
+
+        content = attempt()
+        self.metrics.record(
+            len(content), time.perf_counter() - start, attempt.retry_count - 1
+        )
+        return content
+
+    def copy(self, url, file, headers=None):
+        """Downloads the content of a url, or of the byte range given by the
+        *'Range'* header, into a file. If an attempt fails after some data has been
+        written, the next one only requests the remaining bytes.
+
+        :param str url: url to download from.
+        :param io.BufferedIOBase file: file to write to, opened in binary mode.
+        :param dict headers: headers sent with the request.
+        :return: (*int*) -- number of bytes written.
+        :raises requests.HTTPError: if the server returns a non transient error
+            status.
+        """
+        first, last = parse_byte_range(headers)
+        headers = dict(headers or {})
+        written = 0
+        start = time.perf_counter()
+
+        @self._retry
+        def attempt():
+            nonlocal written
+            offset = first + written
+            if written or "Range" in headers:
+                end = "" if last is None else last
+                headers["Range"] = f"bytes={offset}-{end}"
+            with self.session.get(
+                url, headers=headers, stream=True, timeout=self.timeout
+            ) as r:
+                self._raise_for_status(r)
+                # Servers ignoring the range send the whole content
+                skip = offset if r.status_code == 200 else 0
+                remaining = None if last is None else last + 1 - offset
+                expected = r.headers.get("Content-Length")
+                expected = None if expected is None else int(expected) - skip
+                received = 0
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
+                    if skip:
+                        dropped = min(skip, len(chunk))
+                        chunk, skip = chunk[dropped:], skip - dropped
+                    if remaining is not None:
+                        chunk = chunk[: remaining - received]
+                    file.write(chunk)
+                    received += len(chunk)
+                    written += len(chunk)
+                    if remaining is not None and received >= remaining:
+                        return
+                if expected is not None and received < expected:
+                    raise TransientError(
+                        f"received {received} out of {expected} bytes from {url}"
+                    )
+
+        attempt()
+        self.metrics.record(
+            written, time.perf_counter() - start, attempt.retry_count - 1
+        )
+        return written
+
+    def close(self):
+        """Closes the connections of the session."""
+        self.session.close()
+
+
+class LocalTransport:
+    """Serves files of a local directory with the interface of
+    :class:`HttpTransport`, e.g. to test downloads or run them offline.
+
+    :param str root: directory holding the files.
+    :param str base_url: prefix of the urls, mapped to ``root``.
+    """
+
+    def __init__(self, root, base_url=""):
+        self.root = root
+        self.base_url = base_url
+        self.metrics = TransferMetrics()
+
+    def _path(self, url):
+        if not url.startswith(self.base_url):
+            raise ValueError(f"{url} does not start with {self.base_url}")
+        return os.path.join(self.root, url[len(self.base_url) :].lstrip("/"))
+
+    def _load(self, url):
+        try:
+            with open(self._path(url), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            response = requests.Response()
+            response.status_code = 404
+            response.url = url
+            raise requests.HTTPError(f"404 for url: {url}", response=response)
+
+    def read(self, url):
+        """See :meth:`HttpTransport.read`."""
+        start = time.perf_counter()
+        content = self._load(url)
+        self.metrics.record(len(content), time.perf_counter() - start)
+        return content
+
+    def copy(self, url, file, headers=None):
+        """See :meth:`HttpTransport.copy`."""
+        start = time.perf_counter()
+        first, last = parse_byte_range(headers)
+        content = self._load(url)[first : None if last is None else last + 1]
+        file.write(content)
+        self.metrics.record(len(content), time.perf_counter() - start)
+        return len(content)
+
+    def reserve(self, n_connections):
+        """Nothing to reserve."""
+
+    def close(self):
+        """Nothing to release."""
@@ -1,6 +1,5 @@
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
 
 from prereise.gather.winddata.power_curves import (
     get_power,
@@ -18,43 +17,62 @@ def _check_curve(curve):
 
 def _find_to_impute(data):
     # Locate missing data
-    to_impute = data[data.U.isna()].index
-    if len(to_impute) == 0:
+    to_impute = data.U.isna().to_numpy()
+    if not to_impute.any():
         print("No missing data")
         return
     else:
         return to_impute
 
 
-def _select_similar(data, dates, j):
-    year = dates[j].year
-    month = dates[j].month
-    hour = dates[j].hour
-    select = data[
-        (dates.year == year)
-        & (dates.month == month)
-        & (dates.hour == hour)
-        & (pd.notna(data.Pout))
-    ]
-    return select
+def _group_similar(data):
+    """Label each entry with a group shared by entries that have the same location,
+    same year, same month and same hour.
 
+    :param pandas.DataFrame data: data frame as returned by
+        :py:func:`prereise.gather.winddata.rap.rap.retrieve_data`.
+    :return: (*tuple*) -- array of group code for each entry and number of groups.
+    """
+    # Timestamp of all entries in data frame
+    if "ts" in data.columns:
+        dates = pd.DatetimeIndex(data["ts"])
+    else:
+        dates = pd.DatetimeIndex(data.index.values)
+    plant_codes, _ = pd.factorize(data.plant_id)
+    month_hour = (dates.year.to_numpy() * 12 + dates.month.to_numpy()) * 24
+    time_codes, time_uniques = pd.factorize(month_hour + dates.hour.to_numpy())
+    codes, uniques = pd.factorize(
+        plant_codes.astype(np.int64) * len(time_uniques) + time_codes
+    )
+    return codes, len(uniques)
+
+
+def _group_mean(values, codes, n_groups):
+    """Mean of values per group, NaN for groups without values.
+
+    :param numpy.array values: values.
+    :param numpy.array codes: group code of each value.
+    :param int n_groups: number of groups.
+    :return: (*numpy.array*) -- mean of each group.
+    """
+    count = np.bincount(codes, minlength=n_groups)
+    total = np.bincount(codes, weights=values, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / count
 
-def simple(data, wind_farm, inplace=True, curve="state"):
-    """Impute missing data using a simple procedure. For each missing entry,
-    the extrema of the U and V components of the wind speed of all non missing
-    entries that have the same location, same month, same hour are first found
-    for each missing entry. Then, a U and V value are randomly generated
-    between the respective derived ranges.
+
+def _impute(data, inplace, seed, sample):
+    """Impute missing U and V values group by group, then power output.
 
     :param pandas.DataFrame data: data frame as returned by
         :py:func:`prereise.gather.winddata.rap.rap.retrieve_data`.
-    :param pandas.DataFrame wind_farm: data frame of wind farms.
     :param bool inplace: should the imputation be done in place.
-    :param str curve: 'state' to use the state average, otherwise named curve.
+    :param int seed: seed of the random number generator.
+    :param callable sample: function taking the random number generator, the U and
+        V values of the non missing entries, their group codes, the group codes of
+        the missing entries and the number of groups. Returns the imputed U and V.
     :return: (*pandas.DataFrame*) -- data frame with missing entries imputed.
     """
-
-    _check_curve(curve)
     data_impute = data if inplace else data.copy()
     to_impute = _find_to_impute(data)
     if to_impute is None:
@@ -64,79 +82,103 @@ def simple(data, wind_farm, inplace=True, curve="state"):
     tpc = get_turbine_power_curves()
     spc = get_state_power_curves()
 
-    # Timestamp of all entries in data frame
-    dates = pd.DatetimeIndex(data.index.values)
-
-    n_target = len(wind_farm)
-    select = None
-    for i, j in tqdm(enumerate(to_impute), total=len(to_impute)):
-        if i % n_target == 0:
-            select = _select_similar(data, dates, j)
-
-        k = data.loc[j].plant_id
-        select_plant = select[select.plant_id == k]
-
-        min_u, max_u = select_plant["U"].min(), select_plant["U"].max()
-        min_v, max_v = select_plant["V"].min(), select_plant["V"].max()
-        data_impute.at[j, "U"] = min_u + (max_u - min_u) * np.random.random()
-        data_impute.at[j, "V"] = min_v + (max_v - min_v) * np.random.random()
-        wspd = np.sqrt(data.loc[j].U ** 2 + data.loc[j].V ** 2)
-        normalized_power = get_power(tpc, spc, wspd, "IEC class 2")
-        data_impute.at[j, "Pout"] = normalized_power
+    codes, n_groups = _group_similar(data)
+    similar = data.Pout.notna().to_numpy()
+    u, v = sample(
+        np.random.default_rng(seed),
+        data.U.to_numpy(dtype=float)[similar],
+        data.V.to_numpy(dtype=float)[similar],
+        codes[similar],
+        codes[to_impute],
+        n_groups,
+    )
+    wspd = np.sqrt(u**2 + v**2)
+    normalized_power = get_power(tpc, spc, wspd, "IEC class 2")
+
+    rows = np.flatnonzero(to_impute)
+    for column, values in (("U", u), ("V", v), ("Pout", normalized_power)):
+        data_impute.iloc[rows, data_impute.columns.get_loc(column)] = values
 
     if not inplace:
         return data_impute
 
 
-def gaussian(data, wind_farm, inplace=True, curve="state"):
-    """Impute missing data using gaussian distributions of U & V. For each
-    missing entry, sample U & V based on mean and covariance of non-missing
-    entries that have the same location, same month, and same hour.
+def _sample_uniform(rng, u, v, codes, target_codes, n_groups):
+    """Draw U and V uniformly between their extrema in each group."""
+    extrema = (
+        pd.DataFrame({"g": codes, "U": u, "V": v}).groupby("g").agg(["min", "max"])
+    )
+    extrema = extrema.reindex(range(n_groups)).to_numpy()[target_codes]
+    min_u, max_u, min_v, max_v = extrema.T
+    n = len(target_codes)
+    return (
+        min_u + (max_u - min_u) * rng.random(n),
+        min_v + (max_v - min_v) * rng.random(n),
+    )
+
+
+def _sample_gaussian(rng, u, v, codes, target_codes, n_groups):
+    """Draw U and V from a bivariate normal distribution fitted to each group."""
+    mean_u = _group_mean(u, codes, n_groups)
+    mean_v = _group_mean(v, codes, n_groups)
+    du, dv = u - mean_u[codes], v - mean_v[codes]
+    count = np.bincount(codes, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = np.stack(
+            [
+                np.bincount(codes, weights=x, minlength=n_groups) / (count - 1)
+                for x in (du * du, du * dv, dv * dv)
+            ],
+            axis=1,
+        )[target_codes]
+    cov = np.stack([cov[:, :2], cov[:, 1:]], axis=1)
+
+    # Factor each covariance matrix as A @ A.T, which handles singular matrices
+    factor = np.full_like(cov, np.nan)
+    valid = np.isfinite(cov).all(axis=(1, 2))
+    eigenvalues, eigenvectors = np.linalg.eigh(cov[valid])
+    factor[valid] = eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))[:, None, :]
+
+    sample = np.einsum("nij,nj->ni", factor, rng.standard_normal((len(cov), 2)))
+    return mean_u[target_codes] + sample[:, 0], mean_v[target_codes] + sample[:, 1]
+
+
+def simple(data, wind_farm, inplace=True, curve="state", seed=None):
+    """Impute missing data using a simple procedure. For each missing entry,
+    the extrema of the U and V components of the wind speed of all non missing
+    entries that have the same location, same month, same hour are first found
+    for each missing entry. Then, a U and V value are randomly generated
+    between the respective derived ranges.
 
     :param pandas.DataFrame data: data frame as returned by
         :py:func:`prereise.gather.winddata.rap.rap.retrieve_data`.
     :param pandas.DataFrame wind_farm: data frame of wind farms.
     :param bool inplace: should the imputation be done in place.
     :param str curve: 'state' to use the state average, otherwise named curve.
+    :param int seed: seed of the random number generator.
     :return: (*pandas.DataFrame*) -- data frame with missing entries imputed.
     """
 
     _check_curve(curve)
-    data_impute = data if inplace else data.copy()
-    to_impute = _find_to_impute(data)
-    if to_impute is None:
-        return
-
-    # Information on wind turbines & state average tubrine curves
-    tpc = get_turbine_power_curves()
-    spc = get_state_power_curves()
-
-    # Timestamp of all entries in data frame
-    dates = pd.DatetimeIndex(data.index.values)
-
-    n_target = len(wind_farm)
-    select = None
-    for i, hour in tqdm(enumerate(to_impute), total=len(to_impute)):
-        # Only run the similar-selection function the first time
-        if i % n_target == 0:
-            select = _select_similar(data, dates, hour)
+    return _impute(data, inplace, seed, _sample_uniform)
 
-        plant_id = data.loc[hour].plant_id
-        select_plant = select[select.plant_id == plant_id]
 
-        uv_data = np.array([select_plant["U"].to_numpy(), select_plant["V"].to_numpy()])
-        cov = np.cov(uv_data)
-        mean = np.mean(uv_data, axis=1)
-        sample = np.random.multivariate_normal(mean=mean, cov=cov, size=1)
-        data_impute.at[hour, "U"] = sample[0][0]
-        data_impute.at[hour, "V"] = sample[0][1]
+def gaussian(data, wind_farm, inplace=True, curve="state", seed=None):
+    """Impute missing data using gaussian distributions of U & V. For each
+    missing entry, sample U & V based on mean and covariance of non-missing
+    entries that have the same location, same month, and same hour.
 
-        wspd = np.sqrt(data.loc[hour].U ** 2 + data.loc[hour].V ** 2)
-        normalized_power = get_power(tpc, spc, wspd, "IEC class 2")
-        data_impute.at[hour, "Pout"] = normalized_power
+    :param pandas.DataFrame data: data frame as returned by
+        :py:func:`prereise.gather.winddata.rap.rap.retrieve_data`.
+    :param pandas.DataFrame wind_farm: data frame of wind farms.
+    :param bool inplace: should the imputation be done in place.
+    :param str curve: 'state' to use the state average, otherwise named curve.
+    :param int seed: seed of the random number generator.
+    :return: (*pandas.DataFrame*) -- data frame with missing entries imputed.
+    """
 
-    if not inplace:
-        return data_impute
+    _check_curve(curve)
+    return _impute(data, inplace, seed, _sample_gaussian)
 
 
 def linear(data, inplace=True):
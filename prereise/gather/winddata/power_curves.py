@@ -155,6 +155,31 @@ def get_power(power_curves, state_power_curves, wspd, turbine, default="IEC clas
     return np.interp(wspd, curve.index.values, curve.values, left=0, right=0)
 
 
+def get_power_by_curve_group(wspd, curve_keys, power_func):
+    """Convert a matrix of wind speeds to power, evaluating each distinct power curve
+    once for all the columns that share it.
+
+    :param numpy.ndarray wspd: wind speed (in m/s), shape (hours, farms).
+    :param iterable curve_keys: hashable curve key for each column of ``wspd``.
+    :param callable power_func: function taking a 2D array of wind speeds and a curve
+        key, returning an array of normalized power with the same shape.
+    :return: (*numpy.ndarray*) -- normalized power, same shape as ``wspd``.
+    :raises ValueError: if the number of curve keys doesn't match the number of
+        columns of ``wspd``.
+    """
+    wspd = np.asarray(wspd, dtype=float)
+    curve_keys = list(curve_keys)
+    if wspd.ndim != 2 or len(curve_keys) != wspd.shape[1]:
+        raise ValueError("curve_keys must have one entry per column of wspd")
+    groups = {}
+    for i, key in enumerate(curve_keys):
+        groups.setdefault(key, []).append(i)
+    power = np.empty_like(wspd)
+    for key, columns in groups.items():
+        power[:, columns] = power_func(wspd[:, columns], key)
+    return power
+
+
 def get_turbine_power_curves(filename="PowerCurves.csv"):
     """Load turbine power curves from csv.
 
@@ -1,15 +1,15 @@
 import datetime
-from collections import OrderedDict
 
 import numpy as np
 import pandas as pd
 from netCDF4 import Dataset
 from powersimdata.network.model import ModelImmutables
-from powersimdata.utility.distance import angular_distance, ll2uv
 from tqdm import tqdm
 
+from prereise.gather.winddata.grid_index import find_closest_grid_cells
 from prereise.gather.winddata.power_curves import (
     get_power,
+    get_power_by_curve_group,
     get_state_power_curves,
     get_turbine_power_curves,
 )
@@ -19,17 +19,29 @@ mi = ModelImmutables("usa_tamu")
 id2abv = mi.zones["id2abv"]
 
 
-def retrieve_data(wind_farm, start_date="2016-01-01", end_date="2016-12-31"):
+def retrieve_data(
+    wind_farm,
+    start_date="2016-01-01",
+    end_date="2016-12-31",
+    cache_dir=None,
+    wide=False,
+):
     """Retrieve wind speed data from NOAA's server.
 
     :param pandas.DataFrame wind_farm: plant data frame.
     :param str start_date: start date.
     :param str end_date: end date (inclusive).
+    :param str cache_dir: directory where the wind farm to grid cell mapping is
+        cached, see :func:`prereise.gather.winddata.grid_index.find_closest_grid_cells`.
+    :param bool wide: return the power output as a wide data frame instead of the
+        long format data frame.
     :return: (*tuple*) -- First element is a pandas data frame with
         *'plant_id'*, *'U'*, *'V'*, *'Pout'*, *'ts'* and *'ts_id'* as columns.
         The power output is given for a 1MW generator and the U and V component of
-        the wind speed 80-m above ground level are in m/s. Second element is a list
-        of missing files.
+        the wind speed 80-m above ground level are in m/s. If ``wide`` is True, the
+        first element is instead a data frame of power output indexed by timestamp
+        with plant id as columns, sorted, formatted for REISE. Missing hours are
+        NaN. Second element is a list of missing files.
     """
 
     # Define query box boundaries using the most northern, southern, eastern
@@ -64,47 +76,13 @@ def retrieve_data(wind_farm, start_date="2016-01-01", end_date="2016-12-31"):
     url_count = len(noaa.get_path_list(start, end))
 
     missing = []
-    target2grid = OrderedDict()
-    size = url_count * n_target
-    data = pd.DataFrame(
-        {
-            "plant_id": [0] * size,
-            "ts": [np.nan] * size,
-            "ts_id": [0] * size,
-            "U": [0] * size,
-            "V": [0] * size,
-            "Pout": [0] * size,
-        }
-    )
-
-    dt = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-    step = datetime.timedelta(hours=1)
+    target2grid = None
+    # U and V components indexed by (hour, farm), missing data are left to NaN
+    u_target = np.full((url_count, n_target), np.nan, dtype=np.float32)
+    v_target = np.full((url_count, n_target), np.nan, dtype=np.float32)
 
-    def calc_angular_dist(lon_grid, lat_grid):
-        n_grid = len(lon_grid)
-        for j in range(n_target):
-            uv_target = ll2uv(lon_target[j], lat_target[j])
-            angle = [
-                angular_distance(uv_target, ll2uv(lon_grid[k], lat_grid[k]))
-                for k in range(n_grid)
-            ]
-            target2grid[id_target[j]] = np.argmin(angle)
-
-    def handle_missing(response, data_tmp):
-        missing.append(response.url)
-
-        # missing data are set to NaN.
-        data_tmp["U"] = [np.nan] * n_target
-        data_tmp["V"] = [np.nan] * n_target
-        data_tmp["Pout"] = [np.nan] * n_target
-
-    first = True
     request_iter = enumerate(noaa.get_hourly_data(start, end))
     for i, response in tqdm(request_iter, total=url_count):
-        data_tmp = pd.DataFrame(
-            {"plant_id": id_target, "ts": [dt] * n_target, "ts_id": [i + 1] * n_target}
-        )
-
         if response.status_code == 200:
             try:
                 # see demo notebook to understand file structure
@@ -114,40 +92,50 @@ def retrieve_data(wind_farm, start_date="2016-01-01", end_date="2016-12-31"):
                 u_wsp = tmp.variables[NoaaApi.var_u][0, 1, :, :].flatten()
                 v_wsp = tmp.variables[NoaaApi.var_v][0, 1, :, :].flatten()
 
-                if first:
-                    # The angular distance is calculated once. The target to grid
-                    # correspondence is stored in a dictionary.
-                    calc_angular_dist(lon_grid, lat_grid)
-                    first = False
-
-                data_tmp["U"] = [
-                    u_wsp[target2grid[id_target[j]]] for j in range(n_target)
-                ]
-                data_tmp["V"] = [
-                    v_wsp[target2grid[id_target[j]]] for j in range(n_target)
-                ]
-                wspd_target = np.sqrt(pow(data_tmp["U"], 2) + pow(data_tmp["V"], 2))
-                power = [
-                    get_power(tpc, spc, wspd_target[j], state_target[j])
-                    for j in range(n_target)
-                ]
-                data_tmp["Pout"] = power
+                if target2grid is None:
+                    # The closest grid cells are found once. The target to grid
+                    # correspondence is stored in an array.
+                    target2grid = find_closest_grid_cells(
+                        lon_grid, lat_grid, lon_target, lat_target, cache_dir=cache_dir
+                    )
+
+                u_target[i] = np.ma.filled(u_wsp[target2grid].astype(float), np.nan)
+                v_target[i] = np.ma.filled(v_wsp[target2grid].astype(float), np.nan)
             except Exception:
                 print(f"Failed to parse response from url={response.url}")
-                handle_missing(response, data_tmp)
+                missing.append(response.url)
+                u_target[i] = np.nan
+                v_target[i] = np.nan
         else:
-            handle_missing(response, data_tmp)
-
-        data.iloc[i * n_target : (i + 1) * n_target, :] = data_tmp.values
-        dt += step
+            missing.append(response.url)
 
-    # Format data frame
-    data["plant_id"] = data["plant_id"].astype(np.int32)
-    data["ts_id"] = data["ts_id"].astype(np.int32)
-    data["U"] = data["U"].astype(np.float32)
-    data["V"] = data["V"].astype(np.float32)
-    data["Pout"] = data["Pout"].astype(np.float32)
-
-    data.sort_values(by=["ts_id", "plant_id"], inplace=True)
-    data.reset_index(inplace=True, drop=True)
+    # Power output is NaN wherever wind speed is missing
+    wspd_target = np.sqrt(
+        pow(u_target.astype(float), 2) + pow(v_target.astype(float), 2)
+    )
+    pout_target = get_power_by_curve_group(
+        wspd_target,
+        state_target,
+        lambda wspd, state: get_power(tpc, spc, wspd, state),
+    ).astype(np.float32)
+
+    ts = pd.date_range(start=start, periods=url_count, freq="H")
+    # Plants are sorted by id in both formats
+    order = np.argsort(id_target, kind="stable")
+    if wide:
+        data = pd.DataFrame(pout_target[:, order], index=ts, columns=id_target[order])
+        data.index.name = "UTC"
+        return data, missing
+
+    # Format data frame, sorted by timestamp then plant id
+    data = pd.DataFrame(
+        {
+            "plant_id": np.tile(id_target[order], url_count).astype(np.int32),
+            "ts": np.repeat(ts.values, n_target),
+            "ts_id": np.repeat(np.arange(1, url_count + 1), n_target).astype(np.int32),
+            "U": u_target[:, order].ravel(),
+            "V": v_target[:, order].ravel(),
+            "Pout": pout_target[:, order].ravel(),
+        }
+    )
     return data, missing
@@ -0,0 +1,118 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from prereise.gather.winddata.power_curves import (
+    get_power,
+    get_state_power_curves,
+    get_turbine_power_curves,
+)
+from prereise.gather.winddata.rap import rap
+from prereise.gather.winddata.rap.helpers import to_reise
+from prereise.gather.winddata.rap.noaa_api import NoaaApi
+
+
+def _response(status_code, u, v):
+    response = MagicMock()
+    response.status_code = status_code
+    response.url = f"url_{status_code}_{u}"
+    response.content = (u, v)
+    return response
+
+
+def _dataset(filename, mode, memory):
+    u, v = memory
+    lat, lon = np.meshgrid([40, 41], [-100, -99])
+    dataset = MagicMock()
+    dataset.variables = {
+        "lon": lon,
+        "lat": lat,
+        NoaaApi.var_u: np.full((1, 2, 2, 2), u, dtype=float),
+        NoaaApi.var_v: np.full((1, 2, 2, 2), v, dtype=float),
+    }
+    return dataset
+
+
+@pytest.fixture
+def wind_farm():
+    return pd.DataFrame(
+        {
+            "lat": [40.1, 40.9],
+            "lon": [-99.1, -100.1],
+            "type": ["wind", "wind_offshore"],
+            "zone_id": [301, 301],
+        },
+        index=[12, 5],
+    )
+
+
+@pytest.fixture
+def noaa():
+    responses = [_response(200, 3, 4), _response(404, 0, 0), _response(200, 6, 8)]
+    with patch.object(rap, "NoaaApi") as noaa_api, patch.object(
+        rap, "Dataset", side_effect=_dataset
+    ):
+        noaa_api.var_u, noaa_api.var_v = NoaaApi.var_u, NoaaApi.var_v
+        noaa_api.return_value.get_path_list.return_value = [None] * 3
+        noaa_api.return_value.get_hourly_data.side_effect = lambda *args: iter(
+            responses
+        )
+        yield
+
+
+def _expected_power(state, wspd):
+    return get_power(get_turbine_power_curves(), get_state_power_curves(), wspd, state)
+
+
+def test_retrieve_data(wind_farm, noaa):
+    data, missing = rap.retrieve_data(wind_farm, "2016-01-01", "2016-01-01")
+
+    assert missing == ["url_404_0"]
+    assert list(data.columns) == ["plant_id", "ts", "ts_id", "U", "V", "Pout"]
+    assert data["plant_id"].tolist() == [5, 12] * 3
+    assert data["ts_id"].tolist() == [1, 1, 2, 2, 3, 3]
+    assert pd.DatetimeIndex(data["ts"].unique()).equals(
+        pd.date_range("2016-01-01", periods=3, freq="H")
+    )
+    assert data["U"].dtype == np.float32
+    assert data["Pout"].dtype == np.float32
+    np.testing.assert_array_equal(data["U"], [3, 3, np.nan, np.nan, 6, 6])
+    np.testing.assert_array_equal(data["V"], [4, 4, np.nan, np.nan, 8, 8])
+    np.testing.assert_allclose(
+        data["Pout"],
+        [
+            _expected_power("Offshore", 5),
+            _expected_power("TX", 5),
+            np.nan,
+            np.nan,
+            _expected_power("Offshore", 10),
+            _expected_power("TX", 10),
+        ],
+        rtol=1e-6,
+    )
+
+
+def test_retrieve_data_wide(wind_farm, noaa):
+    data, missing = rap.retrieve_data(wind_farm, "2016-01-01", "2016-01-01", wide=True)
+
+    assert missing == ["url_404_0"]
+    assert data.index.name == "UTC"
+    assert data.index.equals(pd.date_range("2016-01-01", periods=3, freq="H"))
+    assert list(data.columns) == [5, 12]
+    assert (data.dtypes == np.float32).all()
+    assert data.loc["2016-01-01 01:00"].isna().all()
+    np.testing.assert_allclose(
+        data.loc["2016-01-01 02:00"],
+        [_expected_power("Offshore", 10), _expected_power("TX", 10)],
+        rtol=1e-6,
+    )
+
+
+def test_retrieve_data_wide_matches_to_reise(wind_farm, noaa):
+    wide, _ = rap.retrieve_data(wind_farm, "2016-01-01", "2016-01-01", wide=True)
+    data, _ = rap.retrieve_data(wind_farm, "2016-01-01", "2016-01-01")
+    pd.testing.assert_frame_equal(
+        wide, to_reise(data), check_column_type=False, check_freq=False
+    )
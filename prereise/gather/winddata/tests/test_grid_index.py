@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import numpy as np
+from powersimdata.utility.distance import angular_distance
+from powersimdata.utility.distance import ll2uv as scalar_ll2uv
+
+from prereise.gather.winddata.grid_index import find_closest_grid_cells, ll2uv
+
+
+def _grid():
+    grid_lat, grid_lon = np.meshgrid(
+        np.linspace(25, 50, 26), np.linspace(-125, -65, 31)
+    )
+    return grid_lon, grid_lat
+
+
+def test_ll2uv():
+    lon = np.array([-120.5, 0, 45, 179.9])
+    lat = np.array([35.2, 0, -30, 89])
+    expected = [scalar_ll2uv(i, j) for i, j in zip(lon, lat)]
+    assert np.allclose(ll2uv(lon, lat), expected)
+
+
+def test_find_closest_grid_cells():
+    grid_lon, grid_lat = _grid()
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(-125, -65, 20)
+    lat = rng.uniform(25, 50, 20)
+
+    indices = find_closest_grid_cells(grid_lon, grid_lat, lon, lat)
+
+    grid_uv = [scalar_ll2uv(i, j) for i, j in zip(grid_lon.ravel(), grid_lat.ravel())]
+    expected = [
+        np.argmin([angular_distance(scalar_ll2uv(i, j), uv) for uv in grid_uv])
+        for i, j in zip(lon, lat)
+    ]
+    assert np.array_equal(indices, expected)
+
+
+def test_find_closest_grid_cells_cache(tmp_path):
+    grid_lon, grid_lat = _grid()
+    lon, lat = np.array([-100.2, -80.7]), np.array([30.1, 45.6])
+
+    indices = find_closest_grid_cells(grid_lon, grid_lat, lon, lat, cache_dir=tmp_path)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    with patch("prereise.gather.winddata.grid_index.KDTree") as kdtree:
+        cached = find_closest_grid_cells(
+            grid_lon, grid_lat, lon, lat, cache_dir=tmp_path
+        )
+    kdtree.assert_not_called()
+    assert np.array_equal(cached, indices)
+
+    # Different targets are not served from the cache
+    find_closest_grid_cells(grid_lon, grid_lat, lon[:1], lat[:1], cache_dir=tmp_path)
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_find_closest_grid_cells_cache_concurrently(tmp_path):
+    grid_lon, grid_lat = _grid()
+    lon, lat = np.array([-100.2, -80.7]), np.array([30.1, 45.6])
+    expected = find_closest_grid_cells(grid_lon, grid_lat, lon, lat)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(
+                lambda _: find_closest_grid_cells(
+                    grid_lon, grid_lat, lon, lat, cache_dir=tmp_path
+                ),
+                range(16),
+            )
+        )
+    for indices in results:
+        assert np.array_equal(indices, expected)
+    assert len(list(tmp_path.iterdir())) == 1
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from prereise.gather.winddata.impute import (
+    _sample_gaussian,
+    _sample_uniform,
+    gaussian,
+    linear,
+    simple,
+)
+from prereise.gather.winddata.power_curves import (
+    get_power,
+    get_state_power_curves,
+    get_turbine_power_curves,
+)
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    plant_id = [3, 7]
+    ts = pd.date_range(start="2016-01-01", end="2016-02-29 23:00", freq="H")
+    data = pd.DataFrame(
+        {
+            "plant_id": np.tile(plant_id, len(ts)).astype(np.int32),
+            "ts": np.repeat(ts, len(plant_id)),
+            "ts_id": np.repeat(np.arange(1, len(ts) + 1), len(plant_id)),
+            "U": rng.normal(5, 2, len(ts) * len(plant_id)).astype(np.float32),
+            "V": rng.normal(-3, 1, len(ts) * len(plant_id)).astype(np.float32),
+        }
+    )
+    # Shift plant 7 so that imputed values reveal the plant they were sampled from
+    data.loc[data.plant_id == 7, "U"] += 100
+    data["Pout"] = np.float32(0.5)
+    missing = data.ts.isin(pd.date_range(start="2016-02-10", periods=30, freq="H"))
+    data.loc[missing, ["U", "V", "Pout"]] = np.nan
+    return data
+
+
+def _similar(data, row):
+    ts = data.loc[row, "ts"]
+    return data[
+        (data.plant_id == data.loc[row, "plant_id"])
+        & (data.ts.dt.month == ts.month)
+        & (data.ts.dt.hour == ts.hour)
+        & data.Pout.notna()
+    ]
+
+
+def _check_power(data, rows):
+    wspd = np.sqrt(data.loc[rows, "U"] ** 2 + data.loc[rows, "V"] ** 2)
+    expected = get_power(
+        get_turbine_power_curves(), get_state_power_curves(), wspd, "IEC class 2"
+    )
+    np.testing.assert_allclose(data.loc[rows, "Pout"], expected, rtol=1e-5)
+
+
+def test_simple(data):
+    rows = data.index[data.U.isna()]
+    imputed = simple(data, None, inplace=False, seed=0)
+    assert data.loc[rows, "U"].isna().all()
+    assert not imputed[["U", "V", "Pout"]].isna().any().any()
+    for row in rows:
+        similar = _similar(data, row)
+        for c in ("U", "V"):
+            assert similar[c].min() <= imputed.loc[row, c] <= similar[c].max()
+    _check_power(imputed, rows)
+
+
+def test_gaussian(data):
+    rows = data.index[data.U.isna()]
+    imputed = gaussian(data.copy(), None, inplace=False, seed=0)
+    gaussian(data, None, inplace=True, seed=0)
+    assert data.equals(imputed)
+    assert not data[["U", "V", "Pout"]].isna().any().any()
+    # Plant 7 is shifted by 100 m/s on U
+    assert (data.loc[rows, "U"][data.plant_id == 7] > 50).all()
+    assert (data.loc[rows, "U"][data.plant_id == 3] < 50).all()
+    _check_power(data, rows)
+
+
+def test_no_missing_data(data):
+    data = data.dropna()
+    assert simple(data, None, inplace=False) is None
+
+
+def test_sample_statistics():
+    rng = np.random.default_rng(0)
+    u = rng.normal(2, 3, 40)
+    v = 0.5 * u + rng.normal(-1, 1, 40)
+    codes = np.zeros(40, dtype=int)
+    target_codes = np.zeros(200000, dtype=int)
+
+    u_sample, v_sample = _sample_gaussian(rng, u, v, codes, target_codes, 1)
+    np.testing.assert_allclose(
+        [u_sample.mean(), v_sample.mean()], [u.mean(), v.mean()], atol=0.05
+    )
+    np.testing.assert_allclose(
+        np.cov([u_sample, v_sample]), np.cov([u, v]), rtol=0.03, atol=0.03
+    )
+
+    u_sample, v_sample = _sample_uniform(rng, u, v, codes, target_codes, 1)
+    assert u.min() <= u_sample.min() and u_sample.max() <= u.max()
+    np.testing.assert_allclose(u_sample.mean(), (u.min() + u.max()) / 2, rtol=0.01)
+
+
+def test_linear():
+    data = pd.DataFrame({"a": [1, np.nan, 3], "b": [0, np.nan, 0]})
+    linear(data)
+    assert data.equals(pd.DataFrame({"a": [1.0, 2, 3], "b": [0.0, 0, 0]}))
@@ -10,6 +10,7 @@ from prereise.gather.winddata.power_curves import (
     build_state_curves,
     get_form_860,
     get_power,
+    get_power_by_curve_group,
     get_state_power_curves,
     get_turbine_power_curves,
     shift_turbine_curve,
@@ -184,6 +185,42 @@ class TestGetPower(unittest.TestCase):
         self.assertAlmostEqual(power, 0.971666667)
 
 
+class TestGetPowerByCurveGroup(unittest.TestCase):
+    def setUp(self):
+        self.tpc = get_turbine_power_curves()
+        self.spc = get_state_power_curves()
+        self.wspd = np.random.default_rng(0).uniform(0, 32, size=(48, 6))
+        self.turbines = ["WA", "Offshore", "foo", "WA", "GE 1.5 SLE", "Offshore"]
+
+    def _power_func(self, wspd, turbine):
+        return get_power(self.tpc, self.spc, wspd, turbine)
+
+    def test_matches_scalar_get_power(self):
+        power = get_power_by_curve_group(self.wspd, self.turbines, self._power_func)
+        expected = np.array(
+            [
+                [self._power_func(w, t) for w, t in zip(row, self.turbines)]
+                for row in self.wspd
+            ]
+        )
+        self.assertEqual(power.shape, self.wspd.shape)
+        assert_array_almost_equal(power, expected)
+
+    def test_one_call_per_curve(self):
+        calls = []
+
+        def power_func(wspd, turbine):
+            calls.append(turbine)
+            return self._power_func(wspd, turbine)
+
+        get_power_by_curve_group(self.wspd, self.turbines, power_func)
+        self.assertEqual(sorted(calls), sorted(set(self.turbines)))
+
+    def test_bad_number_of_keys(self):
+        with self.assertRaises(ValueError):
+            get_power_by_curve_group(self.wspd, self.turbines[:-1], self._power_func)
+
+
 class TestGetForm860(unittest.TestCase):
     def test_bad_dir(self):
         bad_dir = path.abspath(path.join(path.dirname(__file__), "..", "foo"))